@@ -0,0 +1,85 @@
+"""
+Certificate factories for the benchmarks.
+"""
+
+from __future__ import annotations
+
+import datetime as dt
+import ipaddress
+
+from cryptography import x509
+from cryptography.hazmat.primitives import hashes, serialization
+from cryptography.hazmat.primitives.asymmetric import ec
+from cryptography.x509.oid import NameOID
+
+
+_KEY = ec.generate_private_key(ec.SECP256R1())
+
+
+def make_certificate(sans: list[x509.GeneralName]) -> x509.Certificate:
+    """
+    Create a self-signed certificate with the GeneralNames *sans*.
+    """
+    now = dt.datetime.now(tz=dt.timezone.utc)
+    name = x509.Name(
+        [x509.NameAttribute(NameOID.COMMON_NAME, "service-identity.invalid")]
+    )
+    builder = (
+        x509.CertificateBuilder()
+        .subject_name(name)
+        .issuer_name(name)
+        .public_key(_KEY.public_key())
+        .serial_number(x509.random_serial_number())
+        .not_valid_before(now - dt.timedelta(days=1))
+        .not_valid_after(now + dt.timedelta(days=1))
+    )
+    if sans:
+        builder = builder.add_extension(
+            x509.SubjectAlternativeName(sans), critical=False
+        )
+
+    return builder.sign(_KEY, hashes.SHA256())
+
+
+def key_pem() -> bytes:
+    """
+    The PEM-encoded private key of all certificates from make_certificate().
+    """
+    return _KEY.private_bytes(
+        serialization.Encoding.PEM,
+        serialization.PrivateFormat.PKCS8,
+        serialization.NoEncryption(),
+    )
+
+
+def dns_names(n: int, domain: str = "example.com") -> list[x509.GeneralName]:
+    """
+    *n* DNS names where every tenth one is a wildcard.
+    """
+    return [
+        x509.DNSName(f"*.h{i}.{domain}" if i % 10 == 0 else f"h{i}.{domain}")
+        for i in range(n)
+    ]
+
+
+def mixed_names(n: int) -> list[x509.GeneralName]:
+    """
+    *n* names of all types that service-identity knows about in equal parts.
+    """
+    srv = x509.ObjectIdentifier("1.3.6.1.5.5.7.8.7")
+    rv: list[x509.GeneralName] = []
+    for i in range(n):
+        kind = i % 4
+        if kind == 0:
+            rv.append(x509.DNSName(f"h{i}.example.com"))
+        elif kind == 1:
+            rv.append(x509.IPAddress(ipaddress.ip_address(0x0A000000 + i)))
+        elif kind == 2:
+            rv.append(x509.UniformResourceIdentifier(f"sip:h{i}.example.com"))
+        else:
+            value = f"_s{i}.example.com".encode()
+            rv.append(
+                x509.OtherName(srv, b"\x16" + bytes([len(value)]) + value)
+            )
+
+    return rv
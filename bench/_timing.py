@@ -0,0 +1,22 @@
+"""
+Timing helpers for the benchmarks.
+"""
+
+from __future__ import annotations
+
+import timeit
+
+from typing import Callable
+
+
+def per_call(func: Callable[[], object], number: int, calls: int = 1) -> float:
+    """
+    Return the best time per call of *func* in µs -- divided by *calls* if
+    *func* does that many calls itself.
+    """
+    return (
+        min(timeit.repeat(func, number=number, repeat=5))
+        / number
+        / calls
+        * 1_000_000
+    )
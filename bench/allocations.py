@@ -0,0 +1,116 @@
+"""
+Measure the memory that the public verify functions allocate per successful
+call using tracemalloc.
+
+Run it from the project root::
+
+    $ python bench/allocations.py
+
+It exits with status 1 if a function allocates more than its budget, so it
+can catch regressions.
+"""
+
+from __future__ import annotations
+
+import argparse
+import sys
+import tracemalloc
+
+from OpenSSL.crypto import X509
+
+from _certificates import dns_names, make_certificate, mixed_names
+from service_identity.cryptography import (
+    verify_certificate_hostname,
+    verify_certificate_ip_address,
+)
+from service_identity.pyopenssl import verify_hostname, verify_ip_address
+
+
+class FakeConnection:
+    def __init__(self, cert):
+        self._cert = X509.from_cryptography(cert)
+
+    def get_peer_certificate(self):
+        return self._cert
+
+
+CERT = make_certificate(dns_names(1) + mixed_names(100))
+CONN = FakeConnection(CERT)
+
+# Peak bytes per call.  Generous enough to be stable across Python versions
+# but tight enough to notice new allocations per pattern.  The pyOpenSSL
+# functions have to convert the certificate to a *cryptography* one first.
+CASES = [
+    (
+        "verify_certificate_hostname",
+        lambda: verify_certificate_hostname(CERT, "www.h0.example.com"),
+        3072,
+    ),
+    (
+        "verify_certificate_ip_address",
+        lambda: verify_certificate_ip_address(CERT, "10.0.0.1"),
+        1024,
+    ),
+    (
+        "pyopenssl.verify_hostname",
+        lambda: verify_hostname(CONN, "www.h0.example.com"),
+        32768,
+    ),
+    (
+        "pyopenssl.verify_ip_address",
+        lambda: verify_ip_address(CONN, "10.0.0.1"),
+        32768,
+    ),
+]
+
+
+def peak_per_call(func, number: int) -> tuple[int, int]:
+    """
+    Return the peak of traced memory and the number of blocks that are
+    still allocated after *number* calls of *func*.
+    """
+    func()  # Warm up caches and lazy imports.
+
+    # Tracing each call separately starts every peak at zero --
+    # tracemalloc.reset_peak() needs Python 3.9.
+    peak = 0
+    for _ in range(number):
+        tracemalloc.start()
+        try:
+            func()
+            peak = max(peak, tracemalloc.get_traced_memory()[1])
+        finally:
+            tracemalloc.stop()
+
+    tracemalloc.start()
+    try:
+        before = tracemalloc.take_snapshot()
+        for _ in range(number):
+            func()
+        after = tracemalloc.take_snapshot()
+    finally:
+        tracemalloc.stop()
+
+    leaked = sum(s.count_diff for s in after.compare_to(before, "filename"))
+
+    return peak, leaked
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--number", type=int, default=100)
+    args = parser.parse_args()
+
+    print(f"{'function':>30}  {'peak':>8}  {'budget':>8}  {'retained':>8}")
+    over = False
+    for name, func, budget in CASES:
+        peak, leaked = peak_per_call(func, args.number)
+        flag = "" if peak <= budget else "  OVER BUDGET"
+        over |= peak > budget
+        print(f"{name:>30}  {peak:>6} B  {budget:>6} B  {leaked:>8}{flag}")
+
+    sys.exit(over)
+
+
+if __name__ == "__main__":
+    main()
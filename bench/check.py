@@ -0,0 +1,96 @@
+"""
+Compare failure-heavy workloads -- like scanners -- using the raising
+``verify_*`` API and the non-raising ``check_*`` API.
+
+Run it from the project root::
+
+    $ python bench/check.py --sizes 1,10,100
+"""
+
+from __future__ import annotations
+
+import argparse
+
+from _certificates import dns_names, make_certificate
+from _timing import per_call
+from service_identity.cryptography import (
+    check_certificate_hostname,
+    extract_patterns,
+    verify_certificate_hostname,
+)
+from service_identity.exceptions import VerificationError
+from service_identity.hazmat import (
+    DNS_ID,
+    check_service_identity,
+    verify_service_identity,
+)
+
+
+HOSTNAMES = [f"host{i}.example.net" for i in range(100)]
+
+
+def verify_all(verify, *args) -> int:
+    failures = 0
+    for hostname in HOSTNAMES:
+        try:
+            verify(*args, hostname)
+        except VerificationError:  # noqa: PERF203
+            failures += 1
+
+    return failures
+
+
+def check_all(check, *args) -> int:
+    return sum(not check(*args, hostname) for hostname in HOSTNAMES)
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--sizes", default="1,10,100")
+    args = parser.parse_args()
+
+    print(
+        f"{'SANs':>6}  {'API':>8}  {'verify':>10}  {'check':>10}  "
+        f"{'speedup':>7}"
+    )
+    for size in (int(s) for s in args.sizes.split(",")):
+        cert = make_certificate(dns_names(size))
+        patterns = extract_patterns(cert)
+        number = max(3, 300 // size)
+
+        for api, verify, check, arg in [
+            (
+                "cert",
+                verify_certificate_hostname,
+                check_certificate_hostname,
+                cert,
+            ),
+            (
+                "hazmat",
+                lambda patterns, hostname: verify_service_identity(
+                    patterns, [DNS_ID(hostname)], [], collect="none"
+                ),
+                lambda patterns, hostname: check_service_identity(
+                    patterns, [DNS_ID(hostname)], []
+                ),
+                patterns,
+            ),
+        ]:
+            old = per_call(
+                lambda verify=verify, arg=arg: verify_all(verify, arg),
+                number,
+                len(HOSTNAMES),
+            )
+            new = per_call(
+                lambda check=check, arg=arg: check_all(check, arg),
+                number,
+                len(HOSTNAMES),
+            )
+            print(
+                f"{size:>6}  {api:>8}  {old:>7.2f} µs  {new:>7.2f} µs  "
+                f"{old / new:>6.2f}x"
+            )
+
+
+if __name__ == "__main__":
+    main()
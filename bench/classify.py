@@ -0,0 +1,108 @@
+"""
+Compare the exception-based host classification with the exception-free one
+on realistic subjectAltName corpora, as well as its effect on extracting
+patterns and creating service IDs.
+
+Run it from the project root::
+
+    $ python bench/classify.py
+"""
+
+from __future__ import annotations
+
+import argparse
+import ipaddress
+
+from _certificates import make_certificate, mixed_names
+from _timing import per_call
+from service_identity.cryptography import extract_patterns
+from service_identity.hazmat import DNS_ID, _classify_host
+
+
+# Names like they show up in the SANs of public web, CDN, and mail server
+# certificates, and in URI-IDs and SRV-IDs.
+CORPORA = {
+    "web": [
+        "example.com",
+        "www.example.com",
+        "*.example.com",
+        "api.example.com",
+        "static-01.cdn.example.net",
+        "mail.example.org",
+        "xn--bcher-kva.example",
+        "a1b2c3d4.cloudfront.net",
+    ],
+    "wildcards": [
+        "*.eu-west-1.compute.amazonaws.com",
+        "*.s3.amazonaws.com",
+        "*.blob.core.windows.net",
+        "*.herokuapp.com",
+    ],
+    "ip": ["10.0.0.1", "192.168.1.254", "2001:db8::1", "fe80::1:2:3:4"],
+    "deadbeef": ["cafe.example", "dead:beef", "feed.face", "add.bad.cab"],
+}
+
+
+def reference_classify(pattern: str | bytes) -> str:
+    if isinstance(pattern, bytes):
+        try:
+            pattern = pattern.decode("ascii")
+        except UnicodeError:
+            return "DNS"
+
+    try:
+        int(pattern)
+    except ValueError:
+        pass
+    else:
+        return "numeric"
+
+    try:
+        ip = ipaddress.ip_address(pattern.replace("*", "1"))
+    except ValueError:
+        return "DNS"
+
+    return f"IPv{ip.version}"
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--number", type=int, default=2_000)
+    args = parser.parse_args()
+
+    print(
+        f"{'corpus':<12} {'reference':>11} {'classifier':>11} {'speedup':>8}"
+    )
+    for name, corpus in CORPORA.items():
+        corpus_bytes = [n.encode("ascii") for n in corpus]
+        names = corpus + corpus_bytes
+        assert [reference_classify(n) for n in names] == [
+            _classify_host(n) for n in names
+        ]
+
+        old = per_call(
+            lambda names=names: [reference_classify(n) for n in names],
+            args.number,
+            len(names),
+        )
+        new = per_call(
+            lambda names=names: [_classify_host(n) for n in names],
+            args.number,
+            len(names),
+        )
+        print(f"{name:<12} {old:>9.2f}µs {new:>9.2f}µs {old / new:>7.1f}x")
+
+    cert = make_certificate(mixed_names(100))
+    print()
+    print(
+        f"extract_patterns(100 mixed SANs): "
+        f"{per_call(lambda: extract_patterns(cert), 200, 1):.1f}µs"
+    )
+    print(
+        f"DNS_ID('www.example.com'):        "
+        f"{per_call(lambda: DNS_ID('www.example.com'), args.number, 1):.2f}µs"
+    )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,82 @@
+"""
+Measure how long it takes to refresh a CertificateDirectory after a few of
+its files have changed compared to loading the whole directory again.
+
+Run it from the project root::
+
+    $ python bench/directory.py --certificates 5000 --changes 10
+"""
+
+from __future__ import annotations
+
+import argparse
+import os
+import pathlib
+import tempfile
+import time
+
+from cryptography import x509
+from cryptography.hazmat.primitives.serialization import Encoding
+
+from _certificates import make_certificate
+from service_identity.cryptography import CertificateDirectory
+
+
+def write(directory: pathlib.Path, i: int, generation: int = 0) -> None:
+    cert = make_certificate(
+        [
+            x509.DNSName(f"*.tenant{i}.example.com"),
+            x509.DNSName(f"tenant{i}.example.com"),
+            x509.DNSName(f"gen{generation}.tenant{i}.example.net"),
+        ]
+    )
+    (directory / f"tenant{i}.pem").write_bytes(cert.public_bytes(Encoding.PEM))
+
+
+def timed(f):
+    start = time.perf_counter()
+    rv = f()
+
+    return (time.perf_counter() - start) * 1000, rv
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--certificates", type=int, default=5000)
+    parser.add_argument("--changes", type=int, default=10)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as d:
+        directory = pathlib.Path(d)
+        for i in range(args.certificates):
+            write(directory, i)
+
+        full, cd = timed(lambda: CertificateDirectory(directory))
+        print(f"{args.certificates} certificates")
+        print(f"         full load: {full:>8.1f} ms")
+
+        unchanged, _ = timed(cd.refresh)
+        print(f" refresh unchanged: {unchanged:>8.1f} ms")
+
+        for i in range(args.changes):
+            path = directory / f"tenant{i}.pem"
+            st = path.stat()
+            os.utime(path, ns=(st.st_atime_ns, st.st_mtime_ns + 10**9))
+        touched, rv = timed(cd.refresh)
+        assert not rv
+        print(
+            f"   refresh touched: {touched:>8.1f} ms  ({args.changes} files)"
+        )
+
+        for i in range(args.changes):
+            write(directory, i, generation=1)
+        changed, rv = timed(cd.refresh)
+        assert len(rv.changed) == args.changes
+        print(
+            f"   refresh changed: {changed:>8.1f} ms  ({args.changes} files)"
+        )
+        print(f"           speedup: {full / changed:>8.1f}x")
+
+
+if __name__ == "__main__":
+    main()
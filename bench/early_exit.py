@@ -0,0 +1,55 @@
+"""
+Compare verifying a hostname that matches the first SAN of certificates with
+many SANs with all patterns extracted and with early exit.
+
+Run it from the project root::
+
+    $ python bench/early_exit.py --sizes 1,10,100,1000,10000
+"""
+
+from __future__ import annotations
+
+import argparse
+
+from _certificates import dns_names, make_certificate
+from _timing import per_call
+from service_identity.cryptography import (
+    extract_patterns,
+    verify_certificate_hostname,
+)
+from service_identity.hazmat import DNS_ID, verify_service_identity
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--sizes", default="1,10,100,1000,10000")
+    args = parser.parse_args()
+
+    print(
+        f"{'SANs':>6}  {'all patterns':>15}  {'early exit':>13}  {'speedup':>7}"
+    )
+    for size in (int(s) for s in args.sizes.split(",")):
+        cert = make_certificate(dns_names(size))
+        hostname = "www.h0.example.com"  # The first name is *.h0.example.com
+        number = max(1, 10_000 // size)
+
+        old = per_call(
+            lambda cert=cert, hostname=hostname: verify_service_identity(
+                extract_patterns(cert), [DNS_ID(hostname)], []
+            ),
+            number,
+        )
+        new = per_call(
+            lambda cert=cert, hostname=hostname: verify_certificate_hostname(
+                cert, hostname
+            ),
+            number,
+        )
+
+        print(
+            f"{size:>6}  {old:>12.1f} µs  {new:>10.1f} µs  {old / new:>6.2f}x"
+        )
+
+
+if __name__ == "__main__":
+    main()
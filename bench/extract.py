@@ -0,0 +1,54 @@
+"""
+Compare the extraction of patterns from certificates with many SANs.
+
+Run it from the project root::
+
+    $ python bench/extract.py --sizes 1,10,100,1000,10000
+
+``load + extract_patterns`` includes the parsing of the DER bytes into a
+*cryptography* certificate because that's what you'd have to do with the
+bytes from ``ssl.SSLSocket.getpeercert(binary_form=True)``.
+"""
+
+from __future__ import annotations
+
+import argparse
+
+from cryptography.hazmat.primitives.serialization import Encoding
+from cryptography.x509 import load_der_x509_certificate
+
+from _certificates import dns_names, make_certificate
+from _timing import per_call
+from service_identity.cryptography import (
+    extract_patterns,
+    extract_patterns_from_der,
+)
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--sizes", default="1,10,100,1000,10000")
+    args = parser.parse_args()
+
+    print(
+        f"{'SANs':>6}  {'load + extract_patterns':>24}  "
+        f"{'extract_patterns_from_der':>26}  {'speedup':>7}"
+    )
+    for size in (int(s) for s in args.sizes.split(",")):
+        der = make_certificate(dns_names(size)).public_bytes(Encoding.DER)
+        number = max(1, 10_000 // size)
+
+        classic = per_call(
+            lambda der=der: extract_patterns(load_der_x509_certificate(der)),
+            number,
+        )
+        fast = per_call(lambda der=der: extract_patterns_from_der(der), number)
+
+        print(
+            f"{size:>6}  {classic:>21.1f} µs  {fast:>23.1f} µs  "
+            f"{classic / fast:>6.2f}x"
+        )
+
+
+if __name__ == "__main__":
+    main()
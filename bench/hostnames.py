@@ -0,0 +1,73 @@
+"""
+Compare checking one certificate against many virtual-host names -- like a
+reverse proxy -- by verifying each name and using match_hostnames().
+
+Run it from the project root::
+
+    $ python bench/hostnames.py --sizes 10,100,1000
+"""
+
+from __future__ import annotations
+
+import argparse
+import timeit
+
+from _certificates import dns_names, make_certificate
+from service_identity.cryptography import (
+    match_hostnames,
+    verify_certificate_hostname,
+)
+from service_identity.exceptions import VerificationError
+
+
+def verify_each(cert, hostnames: list[str]) -> list[str]:
+    rv = []
+    for hostname in hostnames:
+        try:
+            verify_certificate_hostname(cert, hostname)
+        except VerificationError:
+            continue
+        rv.append(hostname)
+
+    return rv
+
+
+def best(f, cert, hostnames: list[str], number: int) -> float:
+    """
+    Return the best time of checking all *hostnames* using *f* in ms.
+    """
+    return (
+        min(timeit.repeat(lambda: f(cert, hostnames), number=number, repeat=3))
+        / number
+        * 1000
+    )
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--sizes", default="10,100,1000")
+    args = parser.parse_args()
+
+    print(
+        f"{'SANs':>6}  {'names':>6}  {'verify each':>12}  "
+        f"{'match_hostnames':>15}  {'speedup':>7}"
+    )
+    for size in (int(s) for s in args.sizes.split(",")):
+        cert = make_certificate(dns_names(size))
+        # Half of them match, half of them don't.
+        hostnames = [f"h{i}.example.com" for i in range(1, size, 2)] + [
+            f"h{i}.example.net" for i in range(1, size, 2)
+        ]
+        assert verify_each(cert, hostnames) == match_hostnames(cert, hostnames)
+
+        number = max(1, 1000 // size)
+        old = best(verify_each, cert, hostnames, number)
+        new = best(match_hostnames, cert, hostnames, number)
+        print(
+            f"{size:>6}  {len(hostnames):>6}  {old:>9.2f} ms  "
+            f"{new:>12.2f} ms  {old / new:>6.1f}x"
+        )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,95 @@
+"""
+Measure creating DNS-IDs for sets of hostnames with many internationalized
+domain names with a cold and a warm IDNA cache.
+
+Run it from the project root::
+
+    $ python bench/idn.py --idn-share 0.2,0.7,1.0
+"""
+
+from __future__ import annotations
+
+import argparse
+import random
+
+from _timing import per_call
+from service_identity.hazmat import (
+    DNS_ID,
+    encode_hostnames,
+    idna_cache_clear,
+    idna_cache_info,
+)
+
+
+IDNS = [
+    "bücher.example",
+    "münchen.de",
+    "bäckerei-müller.de",
+    "köln-bonn.example.com",
+    "例え.テスト",
+    "пример.испытание",
+    "παράδειγμα.δοκιμή",
+    "mañana.example.com",
+    "straße.example.net",
+    "zürich.example.ch",
+]
+
+
+def hostnames(n: int, idn_share: float) -> list[str]:
+    """
+    Return *n* hostnames -- *idn_share* of them internationalized -- from a
+    pool of 50 hosts, like a busy client would see them.
+    """
+    rnd = random.Random(42)
+    pool = [f"www{i}.{rnd.choice(IDNS)}" for i in range(25)] + [
+        f"www{i}.example.com" for i in range(25)
+    ]
+    return [
+        rnd.choice(pool[:25] if rnd.random() < idn_share else pool[25:])
+        for _ in range(n)
+    ]
+
+
+def cold(names: list[str]) -> None:
+    for name in names:
+        idna_cache_clear()
+        DNS_ID(name)
+
+
+def warm(names: list[str]) -> None:
+    for name in names:
+        DNS_ID(name)
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--idn-share", default="0.2,0.7,1.0")
+    parser.add_argument("--hostnames", type=int, default=1_000)
+    parser.add_argument("--number", type=int, default=3)
+    args = parser.parse_args()
+
+    print(
+        f"{'IDN share':>9} {'cold':>10} {'warm':>10} {'speedup':>8} "
+        f"{'batch encode':>13}"
+    )
+    for share in (float(s) for s in args.idn_share.split(",")):
+        names = hostnames(args.hostnames, share)
+
+        c = per_call(lambda names=names: cold(names), args.number, len(names))
+        idna_cache_clear()
+        w = per_call(lambda names=names: warm(names), args.number, len(names))
+        b = per_call(
+            lambda names=names: encode_hostnames(names),
+            args.number,
+            len(names),
+        )
+        print(
+            f"{share:>9.0%} {c:>8.1f}µs {w:>8.1f}µs {c / w:>7.1f}x "
+            f"{b:>11.2f}µs"
+        )
+
+    print(f"\n{idna_cache_info()}")
+
+
+if __name__ == "__main__":
+    main()
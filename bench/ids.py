@@ -0,0 +1,45 @@
+"""
+Compare creating service IDs from scratch with looking them up using their
+``cached()`` class methods.
+
+Run it from the project root::
+
+    $ python bench/ids.py
+"""
+
+from __future__ import annotations
+
+import argparse
+
+from _timing import per_call
+from service_identity.hazmat import DNS_ID, SRV_ID, URI_ID, IPAddress_ID
+
+
+VALUES = [
+    (DNS_ID, "www.example.com"),
+    (DNS_ID, "bücher.example.com"),
+    (IPAddress_ID, "2001:db8::1"),
+    (URI_ID, "https://www.example.com/"),
+    (SRV_ID, "_xmpp-client.example.com"),
+]
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--number", type=int, default=10_000)
+    args = parser.parse_args()
+
+    print(f"{'ID':<40} {'new':>10} {'cached':>10} {'speedup':>8}")
+    for cl, value in VALUES:
+        new = per_call(lambda cl=cl, value=value: cl(value), args.number)
+        cached = per_call(
+            lambda cl=cl, value=value: cl.cached(value), args.number
+        )
+        print(
+            f"{cl.__name__ + '(' + repr(value) + ')':<40} "
+            f"{new:>8.2f}µs {cached:>8.2f}µs {new / cached:>7.1f}x"
+        )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,92 @@
+"""
+Measure the memory of the patterns of many certificates that share most of
+their names -- like the certificates of an inventory -- with and without a
+PatternInterner.
+
+Run it from the project root::
+
+    $ python bench/interning.py --certificates 200 --names 50
+"""
+
+from __future__ import annotations
+
+import argparse
+import random
+import timeit
+import tracemalloc
+
+from cryptography import x509
+
+from _certificates import make_certificate
+from service_identity.cryptography import extract_patterns
+from service_identity.hazmat import PatternInterner
+
+
+def certificates(n: int, names: int) -> list[x509.Certificate]:
+    """
+    *n* certificates with *names* DNS names each, drawn from a pool that's
+    only twice as large.
+    """
+    rnd = random.Random(42)
+    pool = [
+        f"*.team{i}.example.com" if i % 2 else f"svc{i}.example.com"
+        for i in range(2 * names)
+    ]
+    return [
+        make_certificate(
+            [x509.DNSName(name) for name in rnd.sample(pool, names)]
+        )
+        for _ in range(n)
+    ]
+
+
+def retained(patterns_of, certs: list[x509.Certificate]) -> tuple[int, list]:
+    """
+    Return the bytes that are still allocated after extracting the patterns
+    of all *certs* using *patterns_of*, and the patterns.
+    """
+    tracemalloc.start()
+    try:
+        before = tracemalloc.get_traced_memory()[0]
+        store = [patterns_of(c) for c in certs]
+        after = tracemalloc.get_traced_memory()[0]
+    finally:
+        tracemalloc.stop()
+
+    return after - before, store
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--certificates", type=int, default=200)
+    parser.add_argument("--names", type=int, default=50)
+    args = parser.parse_args()
+
+    certs = certificates(args.certificates, args.names)
+    extract_patterns(certs[0])  # Warm up caches and lazy imports.
+
+    plain, _ = retained(extract_patterns, certs)
+
+    pi = PatternInterner()
+    interned, store = retained(
+        lambda c: pi.intern_all(extract_patterns(c)), certs
+    )
+
+    print(
+        f"{args.certificates} certificates with {args.names} names from a "
+        f"pool of {2 * args.names}"
+    )
+    print(f"   plain: {plain / 1024:>8.1f} KiB")
+    print(
+        f"interned: {interned / 1024:>8.1f} KiB  ({len(pi)} shared patterns, "
+        f"{plain / interned:.1f}x less)"
+    )
+
+    cost = min(
+        timeit.repeat(lambda: pi.intern_all(store[0]), number=1000, repeat=5)
+    )
+    print(f"interning a certificate's patterns: {cost * 1000:.1f}µs")
+
+
+if __name__ == "__main__":
+    main()
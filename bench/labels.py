@@ -0,0 +1,81 @@
+"""
+Compare matching DNS-IDs by splitting the labels on every comparison with
+matching them using the label structure that's precomputed by `DNSPattern`
+and `DNS_ID`.
+
+Run it from the project root::
+
+    $ python bench/labels.py
+"""
+
+from __future__ import annotations
+
+import argparse
+
+from _timing import per_call
+from service_identity.hazmat import DNS_ID, DNSPattern
+
+
+PATTERNS = [
+    DNSPattern.from_bytes(b"*.example.com"),
+    DNSPattern.from_bytes(b"*.eu-west-1.compute.example.net"),
+    DNSPattern.from_bytes(b"www.example.org"),
+    DNSPattern.from_bytes(b"*.cdn.example.org"),
+]
+
+
+def split_matches(cert_pattern: bytes, actual_hostname: bytes) -> bool:
+    """
+    Match like DNS_ID.verify, but split the labels on every comparison.
+    """
+    if b"*" in cert_pattern:
+        if b"." not in actual_hostname:
+            return False
+        cert_head, cert_tail = cert_pattern.split(b".", 1)
+        actual_head, actual_tail = actual_hostname.split(b".", 1)
+        if cert_tail != actual_tail:
+            return False
+        if actual_head.startswith(b"xn--"):
+            return False
+
+        return cert_head in (b"*", actual_head)
+
+    return cert_pattern == actual_hostname
+
+
+IDS = {
+    "wildcard match": DNS_ID("www.example.com"),
+    "tail mismatch": DNS_ID("www.example.info"),
+    "idna head": DNS_ID("xn--bcher-kva.example.com"),
+    "single label": DNS_ID("localhost"),
+}
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--number", type=int, default=50_000)
+    args = parser.parse_args()
+
+    print(f"{'hostname':<16} {'split':>9} {'precomputed':>12} {'speedup':>8}")
+    for name, dns_id in IDS.items():
+        # In ns per comparison.
+        split = 1000 * per_call(
+            lambda dns_id=dns_id: [
+                split_matches(p.pattern, dns_id.hostname) for p in PATTERNS
+            ],
+            args.number,
+            len(PATTERNS),
+        )
+        precomputed = 1000 * per_call(
+            lambda dns_id=dns_id: [dns_id.verify(p) for p in PATTERNS],
+            args.number,
+            len(PATTERNS),
+        )
+        print(
+            f"{name:<16} {split:>7.0f}ns {precomputed:>10.0f}ns "
+            f"{split / precomputed:>7.1f}x"
+        )
+
+
+if __name__ == "__main__":
+    main()
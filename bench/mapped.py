@@ -0,0 +1,122 @@
+"""
+Measure how long it takes a process to get a usable index by opening a
+file written by write_identity_index() -- compared to building an
+IdentityIndex from the patterns -- how fast lookups are, and how much private
+memory each costs, for growing numbers of certificates.
+
+Run it from the project root::
+
+    $ python bench/mapped.py --sizes 1000,10000,50000
+"""
+
+from __future__ import annotations
+
+import argparse
+import pathlib
+import tempfile
+import timeit
+import tracemalloc
+
+from typing import Callable
+
+from service_identity.hazmat import (
+    DNS_ID,
+    DNSPattern,
+    IdentityIndex,
+    MappedIdentityIndex,
+    write_identity_index,
+)
+
+
+def patterns(i: int) -> list[DNSPattern]:
+    """
+    The patterns of the *i*-th certificate: a wildcard, its apex, and a few
+    hosts.
+    """
+    return [
+        DNSPattern.from_bytes(f"*.tenant{i}.example.com".encode()),
+        DNSPattern.from_bytes(f"tenant{i}.example.com".encode()),
+    ] + [
+        DNSPattern.from_bytes(f"h{j}.tenant{i}.example.net".encode())
+        for j in range(4)
+    ]
+
+
+def build(certs: dict[str, list[DNSPattern]]) -> IdentityIndex[str]:
+    ii: IdentityIndex[str] = IdentityIndex()
+    for handle, ps in certs.items():
+        ii.insert(handle, ps)
+
+    return ii
+
+
+def private_bytes(make: Callable[[], object]) -> int:
+    """
+    The Python heap that the object returned by *make* keeps alive.
+    """
+    tracemalloc.start()
+    obj = make()
+    size = tracemalloc.get_traced_memory()[0]
+    tracemalloc.stop()
+    del obj
+
+    return size
+
+
+def run(path: pathlib.Path, size: int) -> None:
+    certs = {f"cert{i}.pem": patterns(i) for i in range(size)}
+    sid = DNS_ID(f"www.tenant{size // 2}.example.com")
+
+    write_time = min(
+        timeit.repeat(
+            lambda: write_identity_index(path, certs.items()),
+            number=1,
+            repeat=3,
+        )
+    )
+    ii = build(certs)
+    mii = MappedIdentityIndex(path)
+
+    assert ii.lookup(sid) == mii.lookup(sid)
+
+    def open_unchecked() -> None:
+        MappedIdentityIndex(path, verify_checksum=False).close()
+
+    def open_checked() -> None:
+        MappedIdentityIndex(path).close()
+
+    build_time = min(timeit.repeat(lambda: build(certs), number=1, repeat=3))
+    open_time = min(timeit.repeat(open_unchecked, number=100)) / 100
+    checked_time = min(timeit.repeat(open_checked, number=10)) / 10
+    lookup_time = min(timeit.repeat(lambda: mii.lookup(sid), number=10_000))
+    ii_lookup_time = min(timeit.repeat(lambda: ii.lookup(sid), number=10_000))
+    built = private_bytes(lambda: build(certs))
+    mapped = private_bytes(lambda: MappedIdentityIndex(path))
+    print(
+        f"{size:>6}  {write_time * 1000:>7.1f} ms  "
+        f"{build_time * 1000:>7.1f} ms  {open_time * 1e6:>7.1f} µs  "
+        f"{checked_time * 1000:>7.2f} ms  {lookup_time * 100:>6.2f} µs  "
+        f"{ii_lookup_time * 100:>6.2f} µs  {mii.nbytes / size:>6.0f}  "
+        f"{built / size:>7.0f}  {mapped:>7}"
+    )
+    mii.close()
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--sizes", default="1000,10000,50000")
+    args = parser.parse_args()
+
+    print(
+        f"{'certs':>6}  {'write':>10}  {'build':>10}  {'open':>10}  "
+        f"{'open+crc':>10}  {'lookup':>9}  {'dict':>9}  "
+        f"{'file/c':>6}  {'heap/c':>7}  {'mapped':>7}"
+    )
+    with tempfile.TemporaryDirectory() as d:
+        path = pathlib.Path(d) / "certs.sidx"
+        for size in (int(s) for s in args.sizes.split(",")):
+            run(path, size)
+
+
+if __name__ == "__main__":
+    main()
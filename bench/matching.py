@@ -0,0 +1,121 @@
+"""
+Compare matching service IDs against the patterns of certificates with mixed
+DNS, IP address, URI, and SRV names with and without bucketing the patterns
+by class.
+
+Like in XMPP and SIP deployments, one DNS-ID is obligatory and there are many
+optional URI- and SRV-IDs.
+
+Run it from the project root::
+
+    $ python bench/matching.py --sizes 4,40,400,4000 --optional 2,20
+"""
+
+from __future__ import annotations
+
+import argparse
+import contextlib
+
+from _certificates import make_certificate, mixed_names
+from _timing import per_call
+from service_identity.cryptography import extract_patterns
+from service_identity.exceptions import VerificationError
+from service_identity.hazmat import (
+    DNS_ID,
+    SRV_ID,
+    URI_ID,
+    ServiceMatch,
+    verify_service_identity,
+)
+
+
+def verify_linear(cert_patterns, obligatory_ids, optional_ids):
+    """
+    The implementation of verify_service_identity() up to 26.1.0.
+    """
+    errors = []
+    matches = []
+    for ids in (obligatory_ids, optional_ids):
+        for sid in ids:
+            for cid in cert_patterns:
+                if sid.verify(cid):
+                    matches.append(  # noqa: PERF401
+                        ServiceMatch(cert_pattern=cid, service_id=sid)
+                    )
+
+    matched_ids = [match.service_id for match in matches]
+    for i in obligatory_ids:
+        if i not in matched_ids:
+            errors.append(i.error_on_mismatch(mismatched_id=i))  # noqa: PERF401
+
+    for i in optional_ids:
+        if i not in matched_ids and any(
+            isinstance(p, i.pattern_class) for p in cert_patterns
+        ):
+            errors.append(i.error_on_mismatch(mismatched_id=i))  # noqa: PERF401
+
+    if errors:
+        raise VerificationError(errors=errors)
+
+    return matches
+
+
+OBLIGATORY = [DNS_ID("h0.example.com")]
+
+
+def optional_ids(n: int) -> list[SRV_ID | URI_ID]:
+    """
+    *n* optional IDs that match the last names of `mixed_names`.
+    """
+    rv: list[SRV_ID | URI_ID] = []
+    for i in range(n):
+        if i % 2:
+            rv.append(SRV_ID(f"_s{i}.example.com"))
+        else:
+            rv.append(URI_ID(f"sip:h{i}.example.com"))
+
+    return rv
+
+
+def run(verify, cert_patterns, obligatory_ids, optional_ids) -> None:
+    with contextlib.suppress(VerificationError):
+        verify(cert_patterns, obligatory_ids, optional_ids)
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--sizes", default="4,40,400,4000")
+    parser.add_argument("--optional", default="2,20")
+    args = parser.parse_args()
+
+    print(
+        f"{'SANs':>6}  {'optional':>8}  {'linear':>12}  {'bucketed':>12}  "
+        f"{'speedup':>7}"
+    )
+    for size in (int(s) for s in args.sizes.split(",")):
+        patterns = extract_patterns(make_certificate(mixed_names(size)))
+        for n in (int(o) for o in args.optional.split(",")):
+            optional = optional_ids(n)
+            number = max(1, 20_000 // (size * n))
+
+            old = per_call(
+                lambda p=patterns, o=optional: run(
+                    verify_linear, p, OBLIGATORY, o
+                ),
+                number,
+            )
+            new = per_call(
+                lambda p=patterns, o=optional: run(
+                    verify_service_identity, p, OBLIGATORY, o
+                ),
+                number,
+            )
+
+            print(
+                f"{size:>6}  {n:>8}  {old:>9.1f} µs  {new:>9.1f} µs  "
+                f"{old / new:>6.2f}x"
+            )
+
+
+if __name__ == "__main__":
+    main()
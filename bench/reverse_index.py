@@ -0,0 +1,73 @@
+"""
+Measure how long it takes to find the certificates for a server name in an
+IdentityIndex -- compared to verifying every certificate -- and how much
+memory the index uses, for growing numbers of certificates.
+
+Run it from the project root::
+
+    $ python bench/reverse_index.py --sizes 1000,10000,50000
+"""
+
+from __future__ import annotations
+
+import argparse
+import timeit
+
+from service_identity.hazmat import DNS_ID, DNSPattern, IdentityIndex
+
+
+def patterns(i: int) -> list[DNSPattern]:
+    """
+    The patterns of the *i*-th certificate: a wildcard, its apex, and a few
+    hosts.
+    """
+    return [
+        DNSPattern.from_bytes(f"*.tenant{i}.example.com".encode()),
+        DNSPattern.from_bytes(f"tenant{i}.example.com".encode()),
+    ] + [
+        DNSPattern.from_bytes(f"h{j}.tenant{i}.example.net".encode())
+        for j in range(4)
+    ]
+
+
+def run(size: int) -> None:
+    certs = {f"cert{i}.pem": patterns(i) for i in range(size)}
+    ii = IdentityIndex()
+    for handle, ps in certs.items():
+        ii.insert(handle, ps)
+
+    sid = DNS_ID(f"www.tenant{size // 2}.example.com")
+
+    def scan() -> list[str]:
+        return [h for h, ps in certs.items() if any(sid.verify(p) for p in ps)]
+
+    def churn() -> None:
+        ii.remove("cert0.pem")
+        ii.insert("cert0.pem", certs["cert0.pem"])
+
+    assert scan() == ii.lookup(sid)
+
+    lookup_time = min(timeit.repeat(lambda: ii.lookup(sid), number=10_000))
+    scan_time = min(timeit.repeat(scan, number=1, repeat=3))
+    churn_time = min(timeit.repeat(churn, number=1000))
+    print(
+        f"{size:>6}  {lookup_time * 100:>6.2f} µs  {scan_time * 1000:>7.1f} ms  "
+        f"{ii.nbytes / size:>10.0f}  {churn_time * 1000:>10.2f} µs"
+    )
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--sizes", default="1000,10000,50000")
+    args = parser.parse_args()
+
+    print(
+        f"{'certs':>6}  {'lookup':>9}  {'scan':>10}  {'bytes/cert':>10}  "
+        f"{'insert+remove':>13}"
+    )
+    for size in (int(s) for s in args.sizes.split(",")):
+        run(size)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,90 @@
+"""
+Compare walking the subjectAltNames once against the former four
+``get_values_for_type()`` passes.
+
+Run it from the project root::
+
+    $ python bench/san_walk.py
+"""
+
+from __future__ import annotations
+
+import argparse
+
+from cryptography.hazmat import asn1
+from cryptography.x509 import (
+    DNSName,
+    ExtensionOID,
+    IPAddress,
+    OtherName,
+    UniformResourceIdentifier,
+)
+
+from _certificates import make_certificate, mixed_names
+from _timing import per_call
+from service_identity.cryptography import ID_ON_DNS_SRV, extract_patterns
+from service_identity.hazmat import (
+    DNSPattern,
+    IPAddressPattern,
+    SRVPattern,
+    URIPattern,
+)
+
+
+def extract_patterns_four_passes(cert):
+    """
+    The implementation of extract_patterns() up to 26.1.0.
+    """
+    ids = []
+    ext = cert.extensions.get_extension_for_oid(
+        ExtensionOID.SUBJECT_ALTERNATIVE_NAME
+    )
+    ids.extend(
+        [
+            DNSPattern.from_bytes(name.encode("utf-8"))
+            for name in ext.value.get_values_for_type(DNSName)
+        ]
+    )
+    ids.extend(
+        [
+            URIPattern.from_bytes(uri.encode("utf-8"))
+            for uri in ext.value.get_values_for_type(UniformResourceIdentifier)
+        ]
+    )
+    ids.extend(
+        [
+            IPAddressPattern(ip)
+            for ip in ext.value.get_values_for_type(IPAddress)
+        ]
+    )
+    for other in ext.value.get_values_for_type(OtherName):
+        if other.type_id == ID_ON_DNS_SRV:
+            srv = asn1.decode_der(asn1.IA5String, other.value)
+            ids.append(SRVPattern.from_bytes(srv.as_str().encode("ascii")))
+
+    return ids
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--sizes", default="10,100,1000,10000")
+    args = parser.parse_args()
+
+    print(
+        f"{'SANs':>6}  {'four passes':>14}  {'one pass':>14}  {'speedup':>7}"
+    )
+    for size in (int(s) for s in args.sizes.split(",")):
+        cert = make_certificate(mixed_names(size))
+        assert extract_patterns(cert) == extract_patterns_four_passes(cert)
+        number = max(1, 10_000 // size)
+
+        old = per_call(lambda c=cert: extract_patterns_four_passes(c), number)
+        new = per_call(lambda c=cert: extract_patterns(c), number)
+
+        print(
+            f"{size:>6}  {old:>11.1f} µs  {new:>11.1f} µs  {old / new:>6.2f}x"
+        )
+
+
+if __name__ == "__main__":
+    main()
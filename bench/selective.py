@@ -0,0 +1,61 @@
+"""
+Compare verifying an IP address against certificates with many SANs with
+all patterns and with only the IP address patterns extracted.
+
+Run it from the project root::
+
+    $ python bench/selective.py --sizes 1,10,100,1000,10000
+"""
+
+from __future__ import annotations
+
+import argparse
+import contextlib
+
+from _certificates import make_certificate, mixed_names
+from _timing import per_call
+from service_identity.cryptography import (
+    extract_patterns,
+    verify_certificate_ip_address,
+)
+from service_identity.exceptions import VerificationError
+from service_identity.hazmat import IPAddress_ID, verify_service_identity
+
+
+def verify_all(cert, ip: str) -> None:
+    """
+    How verify_certificate_ip_address used to work.
+    """
+    with contextlib.suppress(VerificationError):
+        verify_service_identity(extract_patterns(cert), [IPAddress_ID(ip)], [])
+
+
+def verify_selectively(cert, ip: str) -> None:
+    with contextlib.suppress(VerificationError):
+        verify_certificate_ip_address(cert, ip)
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--sizes", default="1,10,100,1000,10000")
+    args = parser.parse_args()
+
+    print(
+        f"{'SANs':>6}  {'all patterns':>15}  {'selective':>12}  {'speedup':>7}"
+    )
+    for size in (int(s) for s in args.sizes.split(",")):
+        cert = make_certificate(mixed_names(size))
+        number = max(1, 10_000 // size)
+
+        old = per_call(lambda cert=cert: verify_all(cert, "192.0.2.1"), number)
+        new = per_call(
+            lambda cert=cert: verify_selectively(cert, "192.0.2.1"), number
+        )
+
+        print(
+            f"{size:>6}  {old:>12.1f} µs  {new:>9.1f} µs  {old / new:>6.2f}x"
+        )
+
+
+if __name__ == "__main__":
+    main()
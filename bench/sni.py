@@ -0,0 +1,171 @@
+"""
+Measure TLS handshakes per second of a server with many certificates that
+picks the context for each server name -- using an SNISelector and by
+verifying every certificate in turn.
+
+The handshakes run in-process through memory BIOs -- not sockets -- so the
+rates include neither network nor kernel overhead and are a few hundred
+handshakes per second: the TLS handshake itself dominates.
+
+Run it from the project root::
+
+    $ python bench/sni.py --certificates 1000 --handshakes 2000
+"""
+
+from __future__ import annotations
+
+import argparse
+import pathlib
+import ssl
+import tempfile
+import time
+import timeit
+
+from cryptography import x509
+from cryptography.hazmat.primitives.serialization import Encoding
+
+from _certificates import key_pem, make_certificate
+from service_identity.cryptography import extract_patterns
+from service_identity.hazmat import DNS_ID, IdentityIndex
+from service_identity.ssl import set_sni_callback
+
+
+def contexts(
+    n: int, directory: pathlib.Path
+) -> list[tuple[ssl.SSLContext, list]]:
+    """
+    *n* server contexts for ``*.tenant<i>.example.com`` and their patterns.
+    """
+    key = directory / "key.pem"
+    key.write_bytes(key_pem())
+    rv = []
+    for i in range(n):
+        cert = make_certificate(
+            [
+                x509.DNSName(f"*.tenant{i}.example.com"),
+                x509.DNSName(f"tenant{i}.example.com"),
+            ]
+        )
+        path = directory / f"{i}.pem"
+        path.write_bytes(cert.public_bytes(Encoding.PEM))
+        ctx = ssl.SSLContext(ssl.PROTOCOL_TLS_SERVER)
+        ctx.load_cert_chain(path, key)
+        rv.append((ctx, extract_patterns(cert)))
+
+    return rv
+
+
+def handshake(
+    server_ctx: ssl.SSLContext, client_ctx: ssl.SSLContext, server_name: str
+) -> None:
+    c_in, c_out, s_in, s_out = (ssl.MemoryBIO() for _ in range(4))
+    client = client_ctx.wrap_bio(c_in, c_out, server_hostname=server_name)
+    server = server_ctx.wrap_bio(s_in, s_out, server_side=True)
+
+    done = [False, False]
+    while not all(done):
+        for i, obj in enumerate((client, server)):
+            if not done[i]:
+                try:
+                    obj.do_handshake()
+                    done[i] = True
+                except ssl.SSLWantReadError:
+                    pass
+        s_in.write(c_out.read())
+        c_in.write(s_out.read())
+
+
+def linear_selector(ctxs: list[tuple[ssl.SSLContext, list]]):
+    """
+    Select the first context whose certificate is valid for a server name by
+    verifying every certificate in turn.
+    """
+
+    def select(server_name: str) -> ssl.SSLContext | None:
+        try:
+            sid = DNS_ID(server_name)
+        except ValueError:
+            return None
+
+        for ctx, patterns in ctxs:
+            if any(sid.verify(p) for p in patterns):
+                return ctx
+
+        return None
+
+    return select
+
+
+def handshakes_per_second(
+    server_ctx: ssl.SSLContext, client_ctx: ssl.SSLContext, names: list[str]
+) -> float:
+    start = time.perf_counter()
+    for name in names:
+        handshake(server_ctx, client_ctx, name)
+
+    return len(names) / (time.perf_counter() - start)
+
+
+def report(label, server_ctx, client_ctx, names, select) -> None:
+    rate = handshakes_per_second(server_ctx, client_ctx, names)
+    per_select = (
+        min(
+            timeit.repeat(
+                lambda: [select(n) for n in names[:100]], number=10, repeat=3
+            )
+        )
+        / 1000
+    )
+    print(
+        f"{label:>9}: {rate:>6.0f} handshakes/s, "
+        f"{per_select * 1_000_000:>8.2f} µs per selection"
+    )
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--certificates", type=int, default=1000)
+    parser.add_argument("--handshakes", type=int, default=2000)
+    args = parser.parse_args()
+
+    client_ctx = ssl.SSLContext(ssl.PROTOCOL_TLS_CLIENT)
+    client_ctx.check_hostname = False
+    client_ctx.verify_mode = ssl.CERT_NONE
+
+    with tempfile.TemporaryDirectory() as d:
+        ctxs = contexts(args.certificates, pathlib.Path(d))
+
+    index: IdentityIndex[ssl.SSLContext] = IdentityIndex()
+    for ctx, patterns in ctxs:
+        index.insert(ctx, patterns)
+
+    # Clients spread over all tenants, with every tenth name unknown.
+    names = [
+        f"www.unknown{i % 100}.example.org"
+        if i % 10 == 0
+        else f"www.tenant{i % args.certificates}.example.com"
+        for i in range(args.handshakes)
+    ]
+
+    linear = linear_selector(ctxs)
+    server_ctx = ctxs[0][0]
+
+    def linear_callback(ssl_object, server_name, _):
+        selected = linear(server_name)
+        if selected is not None:
+            ssl_object.context = selected
+
+    print(
+        f"{args.certificates} certificates, {args.handshakes} in-process "
+        "handshakes through memory BIOs (no sockets)"
+    )
+
+    server_ctx.sni_callback = linear_callback
+    report("linear", server_ctx, client_ctx, names, linear)
+
+    selector = set_sni_callback(server_ctx, index)
+    report("selector", server_ctx, client_ctx, names, selector.select)
+
+
+if __name__ == "__main__":
+    main()
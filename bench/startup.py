@@ -0,0 +1,239 @@
+"""
+Measure the import time and the cold-start cost of service-identity in fresh
+interpreters: the imports themselves, the work that's done on the first call
+(lazy imports like idna, the first certificate parse), and the steady state.
+
+Run it from the project root::
+
+    $ python bench/startup.py
+
+It exits with status 1 if a measurement exceeds its budget, so it can catch
+startup regressions.  Budgets can be scaled for slow machines using --scale
+and overridden one by one using --budget, for example::
+
+    $ python bench/startup.py --scale 2 --budget import=50
+"""
+
+from __future__ import annotations
+
+import argparse
+import json
+import statistics
+import subprocess
+import sys
+
+from cryptography.hazmat.primitives.serialization import Encoding
+
+from _certificates import dns_names, make_certificate, mixed_names
+
+
+PEM = make_certificate(dns_names(1) + mixed_names(100)).public_bytes(
+    Encoding.PEM
+)
+
+# Runs in a fresh interpreter.  Times the first execution of STMT after
+# SETUP, and -- unless it's an import -- the best of many more executions.
+CHILD = """
+import json, sys, time
+
+PEM = sys.stdin.buffer.read()
+SETUP, STMT, STEADY = json.loads(sys.argv[1])
+
+ns = {"PEM": PEM}
+exec(SETUP, ns)
+code = compile(STMT, "<stmt>", "exec")
+
+start = time.perf_counter()
+exec(code, ns)
+first = time.perf_counter() - start
+
+steady = None
+if STEADY:
+    steady = float("inf")
+    for _ in range(200):
+        start = time.perf_counter()
+        exec(code, ns)
+        steady = min(steady, time.perf_counter() - start)
+
+print(json.dumps([first, steady]))
+"""
+
+LOAD_CERT = (
+    "from cryptography import x509\n"
+    "cert = x509.load_pem_x509_certificate(PEM)\n"
+)
+
+# name, setup, statement, whether to measure the steady state, first-call
+# budget in ms, steady-state budget in µs.
+CASES = [
+    ("import", "", "import service_identity", False, 100, None),
+    (
+        "import-hazmat",
+        "",
+        "import service_identity.hazmat",
+        False,
+        150,
+        None,
+    ),
+    (
+        "import-cryptography",
+        "",
+        "import service_identity.cryptography",
+        False,
+        400,
+        None,
+    ),
+    (
+        "import-pyopenssl",
+        "",
+        "import service_identity.pyopenssl",
+        False,
+        500,
+        None,
+    ),
+    (
+        "dns-id",
+        "from service_identity.hazmat import DNS_ID",
+        "DNS_ID('www.example.com')",
+        True,
+        5,
+        20,
+    ),
+    (
+        "idn-dns-id",
+        "from service_identity.hazmat import DNS_ID",
+        "DNS_ID('www.bücher.example')",
+        True,
+        50,
+        20,
+    ),
+    (
+        "x509-parse",
+        "from cryptography import x509",
+        "x509.load_pem_x509_certificate(PEM).extensions",
+        True,
+        20,
+        1000,
+    ),
+    (
+        "verify",
+        "from service_identity.cryptography import "
+        "verify_certificate_hostname\n" + LOAD_CERT,
+        "verify_certificate_hostname(cert, 'www.h0.example.com')",
+        True,
+        20,
+        100,
+    ),
+]
+
+
+def run(setup: str, stmt: str, *, steady: bool) -> tuple[float, float | None]:
+    """
+    Run *stmt* after *setup* in a fresh interpreter and return the seconds
+    of its first execution and, if *steady*, of its best later execution.
+    """
+    out = subprocess.run(  # noqa: S603
+        [sys.executable, "-c", CHILD, json.dumps([setup, stmt, steady])],
+        input=PEM,
+        capture_output=True,
+        check=True,
+    ).stdout
+    first, best = json.loads(out)
+
+    return first, best
+
+
+def slowest_imports(module: str, n: int) -> list[tuple[int, str]]:
+    """
+    Return the *n* modules with the highest self time in µs according to
+    ``python -X importtime`` when importing *module*.
+    """
+    err = subprocess.run(  # noqa: S603
+        [sys.executable, "-X", "importtime", "-c", f"import {module}"],
+        capture_output=True,
+        check=True,
+        text=True,
+    ).stderr
+
+    rv = []
+    for line in err.splitlines()[1:]:
+        self_us, _, name = line[len("import time:") :].split("|")
+        rv.append((int(self_us), name.strip()))
+
+    return sorted(rv, reverse=True)[:n]
+
+
+def parse_budgets(overrides: list[str]) -> dict[str, float]:
+    rv = {}
+    for o in overrides:
+        name, _, budget = o.partition("=")
+        rv[name] = float(budget)
+
+    return rv
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument(
+        "--runs",
+        type=int,
+        default=5,
+        help="fresh interpreters per measurement; the median counts",
+    )
+    parser.add_argument(
+        "--scale", type=float, default=1.0, help="multiply all budgets"
+    )
+    parser.add_argument(
+        "--budget",
+        action="append",
+        default=[],
+        metavar="NAME=MS",
+        help="override the first-call budget of a measurement",
+    )
+    parser.add_argument(
+        "--top",
+        type=int,
+        default=0,
+        metavar="N",
+        help="show the N slowest modules of each import",
+    )
+    args = parser.parse_args()
+    overrides = parse_budgets(args.budget)
+
+    print(
+        f"{'measurement':>20}  {'first':>9}  {'budget':>8}  "
+        f"{'steady':>9}  {'budget':>8}"
+    )
+    over = False
+    for name, setup, stmt, steady, first_budget, steady_budget in CASES:
+        runs = [run(setup, stmt, steady=steady) for _ in range(args.runs)]
+        first_ms = statistics.median(r[0] for r in runs) * 1_000
+        budget_ms = overrides.get(name, first_budget) * args.scale
+        flags = []
+        if first_ms > budget_ms:
+            flags.append("first")
+
+        line = f"{name:>20}  {first_ms:>7.1f}ms  {budget_ms:>6.0f}ms"
+        if steady:
+            steady_us = min(r[1] for r in runs) * 1_000_000
+            steady_budget_us = steady_budget * args.scale
+            if steady_us > steady_budget_us:
+                flags.append("steady")
+            line += f"  {steady_us:>7.1f}µs  {steady_budget_us:>6.0f}µs"
+
+        if flags:
+            over = True
+            line += f"  OVER BUDGET ({', '.join(flags)})"
+        print(line)
+
+        if args.top and stmt.startswith("import "):
+            for self_us, module in slowest_imports(
+                stmt[len("import ") :], args.top
+            ):
+                print(f"{'':>22}{self_us / 1_000:>7.1f}ms  {module}")
+
+    sys.exit(over)
+
+
+if __name__ == "__main__":
+    main()
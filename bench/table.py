@@ -0,0 +1,116 @@
+"""
+Measure the memory per subjectAltName of the patterns of an inventory of
+certificates kept as pattern objects and in a PatternTable, and how long it
+takes to find the certificates for a hostname.
+
+Run it from the project root::
+
+    $ python bench/table.py --certificates 2000 --names 20
+"""
+
+from __future__ import annotations
+
+import argparse
+import ipaddress
+import timeit
+import tracemalloc
+
+from cryptography import x509
+
+from _certificates import make_certificate
+from service_identity.cryptography import (
+    extract_pattern_table,
+    extract_patterns,
+)
+from service_identity.hazmat import DNS_ID
+
+
+def certificates(n: int, names: int) -> list[x509.Certificate]:
+    """
+    *n* certificates with *names* mostly unique names each: DNS names,
+    wildcards, an URI, and an IP address.
+    """
+    return [
+        make_certificate(
+            [
+                x509.DNSName(f"host{j}.team{i}.example.com")
+                for j in range(names - 4)
+            ]
+            + [
+                x509.DNSName(f"*.team{i}.example.com"),
+                x509.DNSName(f"*.edge{i % 10}.example.net"),
+                x509.UniformResourceIdentifier(f"sip:team{i}.example.com"),
+                x509.IPAddress(ipaddress.ip_address(0x0A000000 + i)),
+            ]
+        )
+        for i in range(n)
+    ]
+
+
+def retained(f):
+    """
+    Return the bytes that are still allocated after calling *f*, and its
+    return value.
+    """
+    tracemalloc.start()
+    try:
+        before = tracemalloc.get_traced_memory()[0]
+        rv = f()
+        after = tracemalloc.get_traced_memory()[0]
+    finally:
+        tracemalloc.stop()
+
+    return after - before, rv
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--certificates", type=int, default=2000)
+    parser.add_argument("--names", type=int, default=20)
+    args = parser.parse_args()
+
+    certs = certificates(args.certificates, args.names)
+    extract_patterns(certs[0])  # Warm up caches and lazy imports.
+    sans = args.certificates * args.names
+
+    objects, store = retained(lambda: [extract_patterns(c) for c in certs])
+    columnar, table = retained(lambda: extract_pattern_table(certs))
+
+    print(f"{args.certificates} certificates with {args.names} names each")
+    print(f" objects: {objects / sans:>6.1f} bytes per SAN")
+    print(
+        f"   table: {columnar / sans:>6.1f} bytes per SAN  "
+        f"({objects / columnar:.1f}x less, nbytes={table.nbytes})"
+    )
+
+    for label, f in [
+        ("objects", lambda: [extract_patterns(c) for c in certs]),
+        ("table", lambda: extract_pattern_table(certs)),
+    ]:
+        cost = min(timeit.repeat(f, number=1, repeat=3))
+        print(f"extracting ({label}): {cost * 1000:.0f}ms")
+
+    sid = DNS_ID(f"www.team{args.certificates // 2}.example.com")
+    assert table.find(sid) == [
+        i
+        for i, patterns in enumerate(store)
+        if any(sid.verify(p) for p in patterns)
+    ]
+
+    for label, f in [
+        (
+            "objects",
+            lambda: [
+                i
+                for i, patterns in enumerate(store)
+                if any(sid.verify(p) for p in patterns)
+            ],
+        ),
+        ("table", lambda: table.find(sid)),
+    ]:
+        cost = min(timeit.repeat(f, number=10, repeat=3)) / 10
+        print(f"finding a hostname ({label}): {cost * 1e6:.1f}µs")
+
+
+if __name__ == "__main__":
+    main()
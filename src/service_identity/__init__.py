@@ -2,7 +2,10 @@
 Verify service identities.
 """
 
-from . import cryptography, hazmat, pyopenssl
+from __future__ import annotations
+
+from typing import TYPE_CHECKING, Any
+
 from .exceptions import (
     CertificateError,
     SubjectAltNameWarning,
@@ -10,6 +13,10 @@ from .exceptions import (
 )
 
 
+if TYPE_CHECKING:
+    from . import cryptography, hazmat, pyopenssl, ssl
+
+
 __title__ = "service-identity"
 
 __author__ = "Hynek Schlawack"
@@ -25,10 +32,21 @@ __all__ = [
     "cryptography",
     "hazmat",
     "pyopenssl",
+    "ssl",
 ]
 
+# Imported on first access such that importing service_identity doesn't import
+# cryptography, pyOpenSSL, and ssl.
+_SUBMODULES = frozenset(("cryptography", "hazmat", "pyopenssl", "ssl"))
+
+
+def __getattr__(name: str) -> Any:
+    if name in _SUBMODULES:
+        from importlib import import_module  # noqa: PLC0415
+
+        # Also sets the attribute, so we're called only once per submodule.
+        return import_module(f"{__name__}.{name}")
 
-def __getattr__(name: str) -> str:
     if name != "__version__":
         msg = f"module {__name__} has no attribute {name}"
         raise AttributeError(msg)
@@ -36,3 +54,7 @@ def __getattr__(name: str) -> str:
     from importlib.metadata import version  # noqa: PLC0415
 
     return version("service-identity")
+
+
+def __dir__() -> list[str]:
+    return sorted({*globals(), *_SUBMODULES})
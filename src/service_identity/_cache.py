@@ -0,0 +1,130 @@
+"""
+A small, thread-safe LRU cache with an entry and a byte budget.
+"""
+
+from __future__ import annotations
+
+import threading
+import time
+
+from collections import OrderedDict
+from typing import Generic, TypeVar
+
+
+K = TypeVar("K")
+V = TypeVar("V")
+
+
+class LRUCache(Generic[K, V]):
+    """
+    A least-recently-used cache that holds at most *max_entries* entries and
+    at most *max_bytes* bytes -- as estimated by the caller on `put`.
+
+    Entries can expire at a wall-clock time.  Counts hits, misses, and
+    evictions.
+    """
+
+    def __init__(self, max_entries: int, max_bytes: int | None = None):
+        if max_entries < 1:
+            msg = "max_entries must be at least 1."
+            raise ValueError(msg)
+
+        #: The maximum number of entries.
+        self.max_entries = max_entries
+        #: The maximum of estimated bytes or `None` for no limit.
+        self.max_bytes = max_bytes
+        #: The number of successful lookups.
+        self.hits = 0
+        #: The number of unsuccessful lookups.
+        self.misses = 0
+        #: The number of entries that have been evicted to stay in budget.
+        self.evictions = 0
+        #: The estimated number of bytes of all entries.
+        self.size = 0
+
+        self._data: OrderedDict[K, tuple[V, int, float | None]] = OrderedDict()
+        self._lock = threading.Lock()
+
+    def __len__(self) -> int:
+        return len(self._data)
+
+    def __contains__(self, key: K) -> bool:
+        return key in self._data
+
+    def get(self, key: K) -> V | None:
+        """
+        Return the value for *key* and mark it as recently used, or `None` if
+        it's not cached or expired.
+        """
+        with self._lock:
+            try:
+                value, size, expires = self._data[key]
+            except KeyError:
+                self.misses += 1
+                return None
+
+            if expires is not None and time.time() >= expires:
+                del self._data[key]
+                self.size -= size
+                self.misses += 1
+                return None
+
+            self._data.move_to_end(key)
+            self.hits += 1
+
+            return value
+
+    def put(
+        self,
+        key: K,
+        value: V,
+        size: int = 0,
+        expires: float | None = None,
+    ) -> None:
+        """
+        Cache *value* for *key* until the `time.time` *expires* and evict the
+        least recently used entries until the cache is within its budget
+        again.
+
+        Values that are bigger than *max_bytes* on their own or that are
+        already expired are not cached -- and remove the old value of *key*.
+        """
+        with self._lock:
+            old = self._data.pop(key, None)
+            if old is not None:
+                self.size -= old[1]
+
+            if (self.max_bytes is not None and size > self.max_bytes) or (
+                expires is not None and time.time() >= expires
+            ):
+                return
+
+            self._data[key] = (value, size, expires)
+            self.size += size
+
+            while len(self._data) > self.max_entries or (
+                self.max_bytes is not None and self.size > self.max_bytes
+            ):
+                _, (_, evicted_size, _) = self._data.popitem(last=False)
+                self.size -= evicted_size
+                self.evictions += 1
+
+    def pop(self, key: K) -> None:
+        """
+        Remove *key* if it's cached.
+        """
+        with self._lock:
+            old = self._data.pop(key, None)
+            if old is not None:
+                self.size -= old[1]
+
+    def clear(self) -> None:
+        """
+        Remove all entries and reset the statistics.
+        """
+        with self._lock:
+            self._data.clear()
+            self.size = 0
+            self.hits = 0
+            self.misses = 0
+            self.evictions = 0
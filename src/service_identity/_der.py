@@ -0,0 +1,135 @@
+"""
+Minimal DER walking.
+
+We only need to split up constructed values, so there's no support for
+high tag numbers or indefinite lengths -- neither of them is valid in the
+parts of certificates that we look at.
+"""
+
+from __future__ import annotations
+
+from typing import Iterator, Union
+
+
+Buffer = Union[bytes, bytearray, memoryview]
+
+
+def read_tlv(data: Buffer, pos: int, end: int) -> tuple[int, int, int]:
+    """
+    Read the tag-length-value at *pos* of *data* that must end before *end*.
+
+    Returns:
+        The tag byte, the start of the value, and the end of the value.
+
+    Raises:
+        ValueError: If the encoding is invalid or truncated.
+    """
+    if pos + 2 > end:
+        msg = "Truncated DER."
+        raise ValueError(msg)
+
+    tag = data[pos]
+    if tag & 0x1F == 0x1F:
+        msg = "High tag numbers are not supported."
+        raise ValueError(msg)
+
+    length = data[pos + 1]
+    pos += 2
+    if length & 0x80:
+        n = length & 0x7F
+        if n == 0 or n > 4 or pos + n > end:
+            msg = "Invalid DER length."
+            raise ValueError(msg)
+
+        length = int.from_bytes(data[pos : pos + n], "big")
+        pos += n
+
+    if pos + length > end:
+        msg = "Truncated DER."
+        raise ValueError(msg)
+
+    return tag, pos, pos + length
+
+
+def iter_tlvs(
+    data: Buffer, start: int, end: int
+) -> Iterator[tuple[int, int, int, int]]:
+    """
+    Iterate over the tag-length-values between *start* and *end*.
+
+    Yields:
+        The tag byte, the start of the whole TLV, and start and end of the
+        value.
+    """
+    pos = start
+    while pos < end:
+        tag, vstart, vend = read_tlv(data, pos, end)
+        yield tag, pos, vstart, vend
+        pos = vend
+
+
+_SEQUENCE = 0x30
+_OID = 0x06
+_OCTET_STRING = 0x04
+_EXTENSIONS = 0xA3
+
+
+def find_extension(cert: Buffer, oid: bytes) -> tuple[int, int] | None:
+    """
+    Find the extension with the DER-encoded object identifier *oid* in the
+    DER-encoded X.509 certificate *cert*.
+
+    Nothing else is parsed or validated.
+
+    Returns:
+        Start and end of the extension's value within *cert*, or `None` if
+        the certificate doesn't have the extension.
+
+    Raises:
+        ValueError:
+            If the certificate structure is invalid or the extension is
+            present more than once.
+    """
+    tag, start, end = read_tlv(cert, 0, len(cert))
+    if tag != _SEQUENCE:
+        msg = "Certificate is not a SEQUENCE."
+        raise ValueError(msg)
+
+    tag, start, end = read_tlv(cert, start, end)  # tbsCertificate
+    if tag != _SEQUENCE:
+        msg = "tbsCertificate is not a SEQUENCE."
+        raise ValueError(msg)
+
+    # The extensions are the last element of the tbsCertificate.
+    for tag, _, vstart, vend in iter_tlvs(cert, start, end):  # noqa: B007
+        if tag == _EXTENSIONS:
+            break
+    else:
+        return None
+
+    tag, start, end = read_tlv(cert, vstart, vend)
+    if tag != _SEQUENCE:
+        msg = "Extensions are not a SEQUENCE."
+        raise ValueError(msg)
+
+    rv = None
+    for _, _, ext_start, ext_end in iter_tlvs(cert, start, end):
+        tag, oid_start, oid_end = read_tlv(cert, ext_start, ext_end)
+        if tag != _OID or cert[oid_start:oid_end] != oid:
+            continue
+
+        if rv is not None:
+            msg = "Duplicate extension."
+            raise ValueError(msg)
+
+        # The extnValue OCTET STRING is always the last element.
+        *_, (tag, _, value_start, value_end) = iter_tlvs(
+            cert, oid_end, ext_end
+        )
+        if tag != _OCTET_STRING:
+            msg = "extnValue is not an OCTET STRING."
+            raise ValueError(msg)
+
+        rv = value_start, value_end
+
+    return rv
@@ -0,0 +1,418 @@
+"""
+The memory-mappable on-disk identity index.
+
+Imported on first use by :mod:`service_identity.hazmat`.
+"""
+
+from __future__ import annotations
+
+import array
+import contextlib
+import mmap
+import os
+import pathlib
+import stat
+import struct
+import sys
+import tempfile
+import zlib
+
+from typing import Iterable
+
+from ._table import _pattern_row, _row_needles, _row_pattern
+from .hazmat import CertificatePattern, ServiceID
+
+
+# The on-disk identity index format.  All integers are little-endian.
+#
+# header:    magic, version, reserved, CRC-32 of everything after the header,
+#            and the number of certificates, certificate keys, keys, postings,
+#            and hash table slots, followed by the sizes of the name and key
+#            blobs.
+# certs:     per certificate: the offset and length of its name in the name
+#            blob and the range of its keys in cert_keys.
+# cert_keys: u32 key indexes -- the patterns of the certificates in order.
+# keys:      per key: the offset and length in the key blob and the range of
+#            its certificates in postings.
+# postings:  u32 certificate indexes in ascending order.
+# slots:     an open-addressing hash table of key indexes + 1 -- 0 is empty --
+#            probed linearly, starting at CRC-32(key) & (slots - 1).
+# names:     the UTF-8-encoded names of the certificates.
+# key blob:  the keys: the row kind followed by the arena value as in
+#            PatternTable.  The names are keys with the kind _KEY_NAME, too.
+_INDEX_MAGIC = b"SIDX"
+_INDEX_VERSION = 1
+_INDEX_HEADER = struct.Struct("<4sHHIIIIIIQQ")
+_INDEX_CERT = struct.Struct("<QIII")
+_INDEX_KEY = struct.Struct("<QIII")
+_INDEX_U32 = struct.Struct("<I")
+_KEY_NAME = 254
+
+
+def write_identity_index(
+    path: str | os.PathLike[str],
+    certificates: Iterable[tuple[str, Iterable[CertificatePattern]]],
+) -> None:
+    """
+    Write the patterns of *certificates* and the tables to look them up into
+    a file that can be opened using `MappedIdentityIndex`.
+
+    The file is written to a temporary file next to *path*, flushed to
+    disk, and then renamed, such that processes that have the old file open
+    keep using it undisturbed and a crash never leaves a partial index
+    behind.  An existing file keeps its permissions, new ones are readable
+    by everyone.
+
+    Args:
+        path: The file to write.
+
+        certificates:
+            Pairs of unique names -- like file names -- and the patterns of
+            the respective certificate as returned by ``extract_patterns``.
+
+    Raises:
+        ValueError: If a name is not unique.
+
+    .. versionadded:: 26.2.0
+    """
+    data = _pack_index(*_collect_index(certificates))
+
+    path = pathlib.Path(path)
+    try:
+        mode = stat.S_IMODE(path.stat().st_mode)
+    except FileNotFoundError:
+        mode = 0o644
+
+    fd, tmp = tempfile.mkstemp(dir=path.parent, prefix=f".{path.name}.")
+    try:
+        with os.fdopen(fd, "wb") as f:
+            f.write(data)
+            f.flush()
+            os.fsync(f.fileno())
+        os.chmod(tmp, mode)  # noqa: PTH101
+        os.replace(tmp, path)  # noqa: PTH105
+    except BaseException:
+        with contextlib.suppress(OSError):
+            os.unlink(tmp)  # noqa: PTH108
+        raise
+
+
+def _collect_index(
+    certificates: Iterable[tuple[str, Iterable[CertificatePattern]]],
+) -> tuple[
+    dict[bytes, int],
+    list[array.array[int]],
+    list[tuple[bytes, array.array[int]]],
+]:
+    """
+    Assign ids to the keys of *certificates*.
+
+    Return the ids, the postings of each key, and the encoded name and the
+    key ids of each certificate.
+    """
+    key_ids: dict[bytes, int] = {}
+    postings: list[array.array[int]] = []
+    certs: list[tuple[bytes, array.array[int]]] = []
+
+    def key_id(key: bytes, cert: int) -> int:
+        kid = key_ids.setdefault(key, len(key_ids))
+        if kid == len(postings):
+            postings.append(array.array("I"))
+        if not postings[kid] or postings[kid][-1] != cert:
+            postings[kid].append(cert)
+
+        return kid
+
+    for cert, (name, patterns) in enumerate(certificates):
+        name_bytes = name.encode("utf-8")
+        if bytes((_KEY_NAME,)) + name_bytes in key_ids:
+            msg = f"Duplicate certificate name {name!r}."
+            raise ValueError(msg)
+
+        key_id(bytes((_KEY_NAME,)) + name_bytes, cert)
+        rows = array.array("I")
+        for p in patterns:
+            kind, value = _pattern_row(p)
+            rows.append(key_id(bytes((kind,)) + value, cert))
+        certs.append((name_bytes, rows))
+
+    return key_ids, postings, certs
+
+
+def _pack_index(
+    key_ids: dict[bytes, int],
+    postings: list[array.array[int]],
+    certs: list[tuple[bytes, array.array[int]]],
+) -> bytes:
+    """
+    Serialize the output of `_collect_index`.
+    """
+    slots = array.array("I", bytes(4 * _slot_count(len(key_ids))))
+    mask = len(slots) - 1
+    for key, kid in key_ids.items():
+        i = zlib.crc32(key) & mask
+        while slots[i]:
+            i = (i + 1) & mask
+        slots[i] = kid + 1
+
+    body = bytearray()
+    names = bytearray()
+    cert_keys = array.array("I")
+    for name_bytes, rows in certs:
+        body += _INDEX_CERT.pack(
+            len(names), len(name_bytes), len(cert_keys), len(rows)
+        )
+        names += name_bytes
+        cert_keys.extend(rows)
+    body += _le_bytes(cert_keys)
+
+    blob = bytearray()
+    flat_postings = array.array("I")
+    for key, kid in key_ids.items():
+        body += _INDEX_KEY.pack(
+            len(blob), len(key), len(flat_postings), len(postings[kid])
+        )
+        blob += key
+        flat_postings.extend(postings[kid])
+    body += _le_bytes(flat_postings)
+    body += _le_bytes(slots)
+    body += names
+    body += blob
+
+    header = _INDEX_HEADER.pack(
+        _INDEX_MAGIC,
+        _INDEX_VERSION,
+        0,
+        zlib.crc32(body),
+        len(certs),
+        len(cert_keys),
+        len(key_ids),
+        len(flat_postings),
+        len(slots),
+        len(names),
+        len(blob),
+    )
+
+    return header + bytes(body)
+
+
+def _slot_count(keys: int) -> int:
+    """
+    Return the smallest power of two that's at least twice *keys*.
+    """
+    return 1 << (2 * keys - 1).bit_length() if keys else 1
+
+
+def _le_bytes(a: array.array[int]) -> bytes:
+    if sys.byteorder == "big":
+        a = array.array(a.typecode, a)
+        a.byteswap()
+
+    return a.tobytes()
+
+
+class MappedIdentityIndex:
+    r"""
+    An identity index in a file written by `write_identity_index` that's
+    used in place using :mod:`mmap`.
+
+    Nothing is deserialized when it's opened -- lookups read the few pages of
+    the hash table, the keys, and the postings they need.  Therefore, all
+    processes on a host that open the same file share it through the page
+    cache.
+
+    Lookups have the same semantics as `IdentityIndex.lookup` --
+    ``URI_ID``\ s and ``SRV_ID``\ s are looked up directly, too.
+
+    Use it as a context manager or call :meth:`close` when you're done.
+
+    Args:
+        path: The file to open.
+
+        verify_checksum:
+            Whether to verify the CRC-32 of the file, which reads all of it
+            once.
+
+    Raises:
+        ValueError:
+            If the file is not an identity index, has an unsupported version,
+            or is corrupt.
+
+    .. versionadded:: 26.2.0
+    """
+
+    def __init__(
+        self, path: str | os.PathLike[str], *, verify_checksum: bool = True
+    ):
+        with open(path, "rb") as f:  # noqa: PTH123
+            try:
+                self._mm = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+            except ValueError:  # empty file
+                msg = "Not a service-identity index."
+                raise ValueError(msg) from None
+
+        try:
+            self._open(verify_checksum=verify_checksum)
+        except BaseException:
+            self._mm.close()
+            raise
+
+    def _open(self, *, verify_checksum: bool) -> None:
+        mm = self._mm
+        if len(mm) < _INDEX_HEADER.size or mm[:4] != _INDEX_MAGIC:
+            msg = "Not a service-identity index."
+            raise ValueError(msg)
+
+        n_certs: int
+        (
+            _,
+            version,
+            _,
+            crc,
+            n_certs,
+            n_cert_keys,
+            n_keys,
+            n_postings,
+            self._n_slots,
+            names_size,
+            blob_size,
+        ) = _INDEX_HEADER.unpack_from(mm)
+        self._n_certs = n_certs
+        if version != _INDEX_VERSION:
+            msg = f"Unsupported index version {version}."
+            raise ValueError(msg)
+
+        self._certs = _INDEX_HEADER.size
+        self._cert_keys = self._certs + self._n_certs * _INDEX_CERT.size
+        self._keys = self._cert_keys + 4 * n_cert_keys
+        self._postings = self._keys + n_keys * _INDEX_KEY.size
+        self._slots = self._postings + 4 * n_postings
+        self._names = self._slots + 4 * self._n_slots
+        self._blob = self._names + names_size
+        if (
+            self._blob + blob_size != len(mm)
+            or self._n_slots & (self._n_slots - 1)
+            or self._n_slots <= n_keys
+        ) or (
+            verify_checksum
+            and zlib.crc32(memoryview(mm)[_INDEX_HEADER.size :]) != crc
+        ):
+            msg = "Corrupt service-identity index."
+            raise ValueError(msg)
+
+    def __enter__(self) -> MappedIdentityIndex:  # noqa: PYI034
+        return self
+
+    def __exit__(self, *exc_info: object) -> None:
+        self.close()
+
+    def close(self) -> None:
+        """
+        Unmap the file.
+        """
+        self._mm.close()
+
+    def __len__(self) -> int:
+        """
+        The number of certificates in the index.
+        """
+        return self._n_certs
+
+    @property
+    def nbytes(self) -> int:
+        """
+        The size of the file in bytes.
+        """
+        return len(self._mm)
+
+    def lookup(self, service_id: ServiceID) -> list[str]:
+        """
+        Return the names of the certificates that are valid for *service_id*
+        in the order they have been written -- exact matches before
+        wildcards.
+
+        Service IDs other than ``DNS_ID``, ``IPAddress_ID``, ``URI_ID``, and
+        ``SRV_ID`` are verified against the patterns of every certificate.
+        """
+        needles = _row_needles(service_id)
+        if needles is None:
+            return [
+                self._name(cert)
+                for cert in range(self._n_certs)
+                if any(service_id.verify(p) for p in self._patterns(cert))
+            ]
+
+        kind, values = needles
+        certs: dict[int, None] = {}
+        for value in values:
+            certs.update(dict.fromkeys(self._find(bytes((kind,)) + value)))
+
+        return [self._name(cert) for cert in certs]
+
+    def patterns(self, name: str) -> list[CertificatePattern]:
+        """
+        Return the patterns of the certificate *name*.
+
+        Raises:
+            KeyError: If there's no certificate called *name*.
+        """
+        certs = self._find(bytes((_KEY_NAME,)) + name.encode("utf-8"))
+        if not certs:
+            raise KeyError(name)
+
+        return self._patterns(certs[0])
+
+    def _find(self, key: bytes) -> list[int]:
+        """
+        Return the indexes of the certificates that have *key*.
+        """
+        mm = self._mm
+        mask = self._n_slots - 1
+        i = zlib.crc32(key) & mask
+        for _ in range(self._n_slots):
+            (kid,) = _INDEX_U32.unpack_from(mm, self._slots + 4 * i)
+            if not kid:
+                return []
+
+            offset, length, start, count = _INDEX_KEY.unpack_from(
+                mm, self._keys + (kid - 1) * _INDEX_KEY.size
+            )
+            if (
+                length == len(key)
+                and mm[self._blob + offset : self._blob + offset + length]
+                == key
+            ):
+                return list(
+                    struct.unpack_from(
+                        f"<{count}I", mm, self._postings + 4 * start
+                    )
+                )
+
+            i = (i + 1) & mask
+
+        return []
+
+    def _name(self, cert: int) -> str:
+        offset, length, _, _ = _INDEX_CERT.unpack_from(
+            self._mm, self._certs + cert * _INDEX_CERT.size
+        )
+        start = self._names + offset
+
+        return self._mm[start : start + length].decode("utf-8")
+
+    def _patterns(self, cert: int) -> list[CertificatePattern]:
+        mm = self._mm
+        _, _, start, count = _INDEX_CERT.unpack_from(
+            mm, self._certs + cert * _INDEX_CERT.size
+        )
+        rv = []
+        for kid in struct.unpack_from(
+            f"<{count}I", mm, self._cert_keys + 4 * start
+        ):
+            offset, length, _, _ = _INDEX_KEY.unpack_from(
+                mm, self._keys + kid * _INDEX_KEY.size
+            )
+            key = mm[self._blob + offset : self._blob + offset + length]
+            rv.append(_row_pattern(key[0], key[1:]))
+
+        return rv
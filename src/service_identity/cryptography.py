@@ -4,40 +4,90 @@
 
 from __future__ import annotations
 
+import copy
+import hashlib
+import ipaddress
+import os
+import pathlib
+import sys
+import threading
+import time
 import warnings
 
-from typing import Sequence
+from typing import (
+    Any,
+    Callable,
+    Collection,
+    Iterable,
+    Iterator,
+    Literal,
+    Mapping,
+    Sequence,
+)
+
+import attr
 
 from cryptography.hazmat import asn1
+from cryptography.hazmat.primitives.hashes import SHA256
+from cryptography.hazmat.primitives.serialization import Encoding
 from cryptography.x509 import (
     Certificate,
     DNSName,
     ExtensionOID,
+    GeneralName,
     IPAddress,
     ObjectIdentifier,
     OtherName,
     UniformResourceIdentifier,
+    load_pem_x509_certificate,
 )
 from cryptography.x509.extensions import ExtensionNotFound
 
-from .exceptions import CertificateError
+from ._cache import LRUCache
+from ._der import Buffer, find_extension, iter_tlvs, read_tlv
+from ._table import PatternTable, _ip_bytes
+from .exceptions import CertificateError, VerificationError
 from .hazmat import (
     DNS_ID,
+    CertificateIdentity,
     CertificatePattern,
     DNSPattern,
+    IdentityIndex,
     IPAddress_ID,
     IPAddressPattern,
+    PatternInterner,
+    ServiceID,
     SRVPattern,
     URIPattern,
-    verify_service_identity,
+    VerificationResult,
+    _check_lazily,
+    _dns_pattern_bytes,
+    _srv_pattern_parts,
+    _uri_pattern_parts,
 )
 
 
-__all__ = ["verify_certificate_hostname"]
+__all__ = [
+    "CertificateDirectory",
+    "PatternCache",
+    "RefreshResult",
+    "VerificationCache",
+    "check_certificate_hostname",
+    "check_certificate_ip_address",
+    "extract_pattern_table",
+    "extract_patterns_from_der",
+    "iter_patterns",
+    "match_hostnames",
+    "subject_alt_name_digest",
+    "verify_certificate_hostname",
+]
 
 
 def verify_certificate_hostname(
-    certificate: Certificate, hostname: str
+    certificate: Certificate,
+    hostname: str,
+    *,
+    cache: VerificationCache | None = None,
 ) -> None:
     r"""
     Verify whether *certificate* is valid for *hostname*.
@@ -52,6 +102,9 @@ def verify_certificate_hostname(
 
         hostname: The hostname that *certificate* should be valid for.
 
+        cache:
+            If passed, the result is looked up in and added to *cache*.
+
     Raises:
         service_identity.VerificationError:
             If *certificate* is not valid for *hostname*.
@@ -64,16 +117,22 @@ def verify_certificate_hostname(
         :exc:`~service_identity.CertificateError` is raised if the certificate
         contains no ``subjectAltName``\ s instead of
         :exc:`~service_identity.VerificationError`.
+
+    .. versionchanged:: 26.2.0
+        Added the *cache* argument.
     """
-    verify_service_identity(
-        cert_patterns=extract_patterns(certificate),
-        obligatory_ids=[DNS_ID(hostname)],
-        optional_ids=[],
-    )
+    if cache is not None:
+        cache.verify(certificate, DNS_ID, hostname)
+        return
+
+    _verify_one(certificate, DNS_ID.cached(hostname))
 
 
 def verify_certificate_ip_address(
-    certificate: Certificate, ip_address: str
+    certificate: Certificate,
+    ip_address: str,
+    *,
+    cache: VerificationCache | None = None,
 ) -> None:
     r"""
     Verify whether *certificate* is valid for *ip_address*.
@@ -90,6 +149,9 @@ def verify_certificate_ip_address(
             The IP address that *connection* should be valid for.  Can be an
             IPv4 or IPv6 address.
 
+        cache:
+            If passed, the result is looked up in and added to *cache*.
+
     Raises:
         service_identity.VerificationError:
             If *certificate* is not valid for *ip_address*.
@@ -104,10 +166,123 @@ def verify_certificate_ip_address(
         :exc:`~service_identity.CertificateError` is raised if the certificate
         contains no ``subjectAltName``\ s instead of
         :exc:`~service_identity.VerificationError`.
+
+    .. versionchanged:: 26.2.0
+        Added the *cache* argument.
+    """
+    if cache is not None:
+        cache.verify(certificate, IPAddress_ID, ip_address)
+        return
+
+    _verify_one(certificate, IPAddress_ID.cached(ip_address))
+
+
+def check_certificate_hostname(
+    certificate: Certificate, hostname: str
+) -> VerificationResult:
+    r"""
+    Check whether *certificate* is valid for *hostname* without raising a
+    :exc:`~service_identity.VerificationError` if it isn't.
+
+    Use it if you expect many certificates to be invalid -- for example when
+    scanning.
+
+    Args:
+        certificate: A *cryptography* X509 certificate object.
+
+        hostname: The hostname that *certificate* should be valid for.
+
+    Returns:
+        A result that is truthy if *certificate* is valid for *hostname*.
+
+    Raises:
+        service_identity.CertificateError:
+            If *certificate* contains invalid / unexpected data. This includes
+            the case where the certificate contains no ``subjectAltName``\ s.
+
+    .. versionadded:: 26.2.0
+    """
+    return _check_selectively(
+        certificate, obligatory_ids=[DNS_ID.cached(hostname)], optional_ids=[]
+    )
+
+
+def match_hostnames(
+    certificate: Certificate,
+    hostnames: Iterable[str],
+    *,
+    cache: PatternCache | None = None,
+) -> list[str]:
+    r"""
+    Return the *hostnames* that *certificate* is valid for.
+
+    Unlike calling :func:`verify_certificate_hostname` for each hostname, the
+    patterns are extracted once and compiled into a
+    :class:`~service_identity.hazmat.CertificateIdentity`, so the cost grows
+    with the number of ``subjectAltName``\ s *plus* the number of hostnames
+    -- not their product.
+
+    Args:
+        certificate: A *cryptography* X509 certificate object.
+
+        hostnames: The hostnames to check -- for example of virtual hosts.
+
+        cache:
+            If passed, the compiled identity is looked up in and added to
+            *cache*.
+
+    Returns:
+        The hostnames that *certificate* is valid for in the order of
+        *hostnames*.
+
+    Raises:
+        service_identity.CertificateError:
+            If *certificate* contains invalid / unexpected data. This includes
+            the case where the certificate contains no ``subjectAltName``\ s.
+
+        ValueError: If one of *hostnames* is not a valid hostname.
+
+    .. versionadded:: 26.2.0
     """
-    verify_service_identity(
-        cert_patterns=extract_patterns(certificate),
-        obligatory_ids=[IPAddress_ID(ip_address)],
+    if cache is None:
+        identity = _hostname_identity(certificate)
+    else:
+        identity = cache._identity(certificate, _DNS_ONLY)
+
+    if identity is None:
+        msg = "Certificate does not contain any `subjectAltName`s."
+        raise CertificateError(msg)
+
+    return [h for h in hostnames if identity.matches(DNS_ID.cached(h))]
+
+
+def check_certificate_ip_address(
+    certificate: Certificate, ip_address: str
+) -> VerificationResult:
+    r"""
+    Check whether *certificate* is valid for *ip_address* without raising a
+    :exc:`~service_identity.VerificationError` if it isn't.
+
+    Args:
+        certificate: A *cryptography* X509 certificate object.
+
+        ip_address:
+            The IP address that *certificate* should be valid for.  Can be an
+            IPv4 or IPv6 address.
+
+    Returns:
+        A result that is truthy if *certificate* is valid for *ip_address*.
+
+    Raises:
+        service_identity.CertificateError:
+            If *certificate* contains invalid / unexpected data. This includes
+            the case where the certificate contains no ``subjectAltName``\ s.
+
+    .. versionadded:: 26.2.0
+    """
+    return _check_selectively(
+        certificate,
+        obligatory_ids=[IPAddress_ID.cached(ip_address)],
         optional_ids=[],
     )
 
@@ -115,58 +290,1173 @@ def verify_certificate_ip_address(
 ID_ON_DNS_SRV = ObjectIdentifier("1.3.6.1.5.5.7.8.7")  # id_on_dnsSRV
 
 
-def extract_patterns(cert: Certificate) -> Sequence[CertificatePattern]:
-    """
+def extract_patterns(
+    cert: Certificate,
+    *,
+    cache: PatternCache | None = None,
+    pattern_classes: Collection[type[CertificatePattern]] | None = None,
+) -> Sequence[CertificatePattern]:
+    r"""
     Extract all valid ID patterns from a certificate for service verification.
 
     Args:
         cert: The certificate to be dissected.
 
+        cache:
+            If passed, the patterns are looked up in and added to *cache*.
+
+        pattern_classes:
+            If passed, only patterns of these classes are extracted and the
+            ``subjectAltName``\ s of other types are neither decoded nor
+            validated.  For example, ``{IPAddressPattern}`` if you only want
+            to verify IP addresses.
+
     Returns:
         List of IDs.
 
     .. versionchanged:: 23.1.0
        ``commonName`` is not used as a fallback anymore.
+
+    .. versionchanged:: 26.2.0
+        Added the *cache* and *pattern_classes* arguments.
     """
-    ids: list[CertificatePattern] = []
+    if cache is not None:
+        return cache.extract_patterns(cert, pattern_classes=pattern_classes)
+
+    return _extract_patterns(cert, pattern_classes)
+
+
+def iter_patterns(
+    cert: Certificate,
+    *,
+    pattern_classes: Collection[type[CertificatePattern]] | None = None,
+) -> Iterator[CertificatePattern]:
+    """
+    Like :func:`extract_patterns`, but decode the patterns one by one while
+    iterating.
+
+    Use it with
+    :func:`~service_identity.hazmat.verify_service_identity_iter` to stop
+    decoding as soon as the outcome is clear.
+
+    Args:
+        cert: The certificate to be dissected.
+
+        pattern_classes: Same as for :func:`extract_patterns`.
+
+    Returns:
+        An iterator over the patterns in the order they appear in the
+        certificate -- *not* grouped by type like :func:`extract_patterns`.
+
+    .. versionadded:: 26.2.0
+    """
+    return _iter_patterns(_general_names(cert), _selected(pattern_classes))
+
+
+def extract_pattern_table(
+    certs: Iterable[Certificate],
+    *,
+    pattern_classes: Collection[type[CertificatePattern]] | None = None,
+    table: PatternTable | None = None,
+) -> PatternTable:
+    """
+    Extract the patterns of all *certs* into a
+    :class:`~service_identity.hazmat.PatternTable` -- without creating a
+    pattern object per ``subjectAltName``.
+
+    The certificates get consecutive indexes in the order of *certs* and the
+    patterns of each are in the same order as in :func:`extract_patterns`.
+
+    Args:
+        certs: The certificates to be dissected.
+
+        pattern_classes: Same as for :func:`extract_patterns`.
+
+        table: If passed, the patterns are appended to *table*.
+
+    Returns:
+        *table* or a new table.
+
+    Raises:
+        service_identity.CertificateError:
+            If a certificate contains invalid patterns.  The certificates up
+            to it have been added to the table, the invalid one hasn't.
+
+    .. versionadded:: 26.2.0
+    """
+    if table is None:
+        table = PatternTable()
+
+    selected = _selected(pattern_classes)
+    for cert in certs:
+        # Group the rows by type like _extract_patterns() and only append
+        # them once the whole certificate has been validated.
+        groups: tuple[list[bytes], ...] = ([], [], [], [])
+        for name in _general_names(cert):
+            kind = _kind(name)
+            if kind is not None and selected[kind]:
+                groups[kind].append(_ROW_ENCODERS[kind](name))
+
+        table._append_rows(
+            (kind, value)
+            for kind, values in enumerate(groups)
+            for value in values
+        )
+
+    return table
+
+
+def _general_names(cert: Certificate) -> Iterable[GeneralName]:
     try:
         ext = cert.extensions.get_extension_for_oid(
             ExtensionOID.SUBJECT_ALTERNATIVE_NAME
         )
     except ExtensionNotFound:
-        pass
-    else:
-        ids.extend(
-            [
-                DNSPattern.from_bytes(name.encode("utf-8"))
-                for name in ext.value.get_values_for_type(DNSName)
-            ]
-        )
-        ids.extend(
-            [
-                URIPattern.from_bytes(uri.encode("utf-8"))
-                for uri in ext.value.get_values_for_type(
-                    UniformResourceIdentifier
+        return ()
+
+    return ext.value  # type: ignore[no-any-return]
+
+
+def _extract_patterns(
+    cert: Certificate,
+    pattern_classes: Collection[type[CertificatePattern]] | None,
+) -> list[CertificatePattern]:
+    """
+    Extract the patterns of *pattern_classes* (or all if `None`) from *cert*.
+    """
+    return _extract_selected(cert, _selected(pattern_classes))[0]
+
+
+def _extract_selected(
+    cert: Certificate, selected: tuple[bool, bool, bool, bool]
+) -> tuple[list[CertificatePattern], bool]:
+    """
+    Extract the patterns of the *selected* types from *cert* and whether it
+    has any ``subjectAltName`` that we extract patterns from -- selected or
+    not.
+    """
+    # Walk the names only once, but keep returning them grouped by type.
+    groups: tuple[list[GeneralName], ...] = ([], [], [], [])
+    has_patterns = False
+    for name in _general_names(cert):
+        kind = _kind(name)
+        if kind is not None:
+            has_patterns = True
+            groups[kind].append(name)
+
+    ids: list[CertificatePattern] = []
+    for wanted, names, decode in zip(selected, groups, _DECODERS):
+        if wanted:
+            ids += map(decode, names)
+
+    return ids, has_patterns
+
+
+def _iter_patterns(
+    names: Iterable[GeneralName], selected: tuple[bool, bool, bool, bool]
+) -> Iterator[CertificatePattern]:
+    for name in names:
+        kind = _kind(name)
+        if kind is not None and selected[kind]:
+            yield _DECODERS[kind](name)
+
+
+def _kind(name: GeneralName) -> int | None:
+    """
+    Return the index of *name*'s type in DNS names, URIs, IP addresses, and
+    SRV names -- or `None` if we don't extract patterns from it.
+    """
+    if isinstance(name, DNSName):
+        return 0
+    if isinstance(name, UniformResourceIdentifier):
+        return 1
+    if isinstance(name, IPAddress):
+        return 2
+    if isinstance(name, OtherName) and name.type_id == ID_ON_DNS_SRV:
+        return 3
+
+    return None
+
+
+def _selected(
+    pattern_classes: Collection[type[CertificatePattern]] | None,
+) -> tuple[bool, bool, bool, bool]:
+    """
+    Whether DNS, URI, IP address, and SRV patterns are in *pattern_classes*.
+    """
+    if pattern_classes is None:
+        return True, True, True, True
+
+    classes = tuple(pattern_classes)
+
+    return (
+        issubclass(DNSPattern, classes),
+        issubclass(URIPattern, classes),
+        issubclass(IPAddressPattern, classes),
+        issubclass(SRVPattern, classes),
+    )
+
+
+_DNS_ONLY = _selected([DNSPattern])
+
+
+def _verify_one(certificate: Certificate, service_id: ServiceID) -> None:
+    """
+    Verify *certificate* for the obligatory *service_id*.
+
+    This is the path of the public verify functions: only the names that can
+    match *service_id* are decoded, it stops at the first match, and nothing
+    else is allocated on success.
+    """
+    kind = _KINDS[service_id.pattern_class]
+    decode = _DECODERS[kind]
+    has_patterns = False
+    for name in _general_names(certificate):
+        name_kind = _kind(name)
+        if name_kind is None:
+            continue
+
+        has_patterns = True
+        if name_kind == kind and service_id.verify(decode(name)):
+            return
+
+    if not has_patterns:
+        msg = "Certificate does not contain any `subjectAltName`s."
+        raise CertificateError(msg)
+
+    raise VerificationError(
+        errors=[service_id.error_on_mismatch(mismatched_id=service_id)]
+    )
+
+
+def _verify_one_cached(
+    certificate: Certificate, service_id: ServiceID, cache: PatternCache
+) -> None:
+    """
+    Like `_verify_one`, but use the patterns of *service_id*'s type from
+    *cache*.
+    """
+    kind = _KINDS[service_id.pattern_class]
+    try:
+        _, entry = cache._entry(certificate, _ONLY[kind])
+    except CertificateError:
+        # _verify_one() stops at the first match, so a malformed name after
+        # it doesn't fail the verification.
+        _verify_one(certificate, service_id)
+        return
+
+    if not entry.has_patterns:
+        msg = "Certificate does not contain any `subjectAltName`s."
+        raise CertificateError(msg)
+
+    for pattern in entry.patterns:
+        if service_id.verify(pattern):
+            return
+
+    raise VerificationError(
+        errors=[service_id.error_on_mismatch(mismatched_id=service_id)]
+    )
+
+
+def _hostname_identity(certificate: Certificate) -> CertificateIdentity | None:
+    """
+    Compile the DNS patterns of *certificate* or return `None` if it
+    doesn't have any ``subjectAltName``.
+
+    Like `_verify_one`, names of other types are not decoded.
+    """
+    has_patterns = False
+    patterns: list[CertificatePattern] = []
+    for name in _general_names(certificate):
+        kind = _kind(name)
+        if kind is None:
+            continue
+
+        has_patterns = True
+        if kind == 0:
+            patterns.append(_DECODERS[0](name))
+
+    if not has_patterns:
+        return None
+
+    return CertificateIdentity.from_patterns(patterns)
+
+
+def _check_selectively(
+    certificate: Certificate,
+    obligatory_ids: Sequence[ServiceID],
+    optional_ids: Sequence[ServiceID],
+) -> VerificationResult:
+    """
+    Like :func:`~service_identity.hazmat.check_service_identity`, but only
+    decode the patterns that can match *obligatory_ids* and *optional_ids*
+    and stop once the result is clear.
+    """
+    names = _general_names(certificate)
+    if not any(_kind(name) is not None for name in names):
+        msg = "Certificate does not contain any `subjectAltName`s."
+        raise CertificateError(msg)
+
+    # If none of the patterns can match, the stream is empty.  But that's not
+    # the same as a certificate without patterns.
+    result, _ = _check_lazily(
+        _iter_patterns(
+            names,
+            _selected(
+                {sid.pattern_class for sid in (*obligatory_ids, *optional_ids)}
+            ),
+        ),
+        obligatory_ids,
+        optional_ids,
+    )
+
+    return result
+
+
+def _srv_pattern_from_other_name(other: OtherName) -> SRVPattern:
+    return SRVPattern.from_bytes(_srv_bytes(other))
+
+
+def _srv_bytes(other: OtherName) -> bytes:
+    try:
+        srv = asn1.decode_der(asn1.IA5String, other.value)
+    except ValueError as e:
+        msg = "Unexpected certificate content."
+        raise CertificateError(msg) from e
+
+    rv: bytes = srv.as_str().encode("ascii")
+
+    return rv
+
+
+_KINDS: dict[type[CertificatePattern], int] = {
+    DNSPattern: 0,
+    URIPattern: 1,
+    IPAddressPattern: 2,
+    SRVPattern: 3,
+}
+_DECODERS: tuple[Callable[[Any], CertificatePattern], ...] = (
+    lambda name: DNSPattern.from_bytes(name.value.encode("utf-8")),
+    lambda name: URIPattern.from_bytes(name.value.encode("utf-8")),
+    lambda name: IPAddressPattern(name.value),
+    _srv_pattern_from_other_name,
+)
+# The selection of only the type at each index of _DECODERS.
+_ONLY = tuple(_selected([cls]) for cls in _KINDS)
+
+
+# Like _DECODERS, but produce the normalized PatternTable values.
+_ROW_ENCODERS: tuple[Callable[[Any], bytes], ...] = (
+    lambda name: _dns_pattern_bytes(name.value.encode("utf-8")),
+    lambda name: b":".join(_uri_pattern_parts(name.value.encode("utf-8"))),
+    lambda name: _ip_bytes(name.value),
+    lambda name: b".".join(_srv_pattern_parts(_srv_bytes(name))),
+)
+
+
+def subject_alt_name_digest(cert: Certificate) -> bytes:
+    r"""
+    Compute a SHA-256 digest of the ``subjectAltName`` extension of *cert*
+    that doesn't depend on the order of the names.
+
+    Since patterns are only extracted from ``subjectAltName``\ s, two
+    certificates with the same digest have the same patterns -- for example
+    a certificate and its renewal.  It's computed from the raw extension
+    bytes and therefore much cheaper than :func:`extract_patterns`.
+
+    Args:
+        cert: The certificate to be dissected.
+
+    Returns:
+        32 bytes.
+
+    .. versionadded:: 26.2.0
+    """
+    der = cert.public_bytes(Encoding.DER)
+    try:
+        san = find_extension(der, _OID_SUBJECT_ALT_NAME)
+        if san is None:
+            return hashlib.sha256().digest()
+
+        return _san_digest(der, *san)
+    except ValueError as e:
+        msg = "Unexpected certificate content."
+        raise CertificateError(msg) from e
+
+
+def _san_digest(der: bytes, start: int, end: int) -> bytes:
+    """
+    Hash the DER-encoded GeneralNames between *start* and *end* in sorted
+    order.
+    """
+    _, start, end = read_tlv(der, start, end)
+    names = sorted(der[s:e] for _, s, _, e in iter_tlvs(der, start, end))
+
+    return hashlib.sha256(b"".join(names)).digest()
+
+
+CacheKey = Literal["fingerprint", "subject_alt_names"]
+"""
+How caches identify certificates:
+
+``"fingerprint"``
+    By the SHA-256 fingerprint of their DER encoding.
+
+``"subject_alt_names"``
+    By :func:`subject_alt_name_digest`, so renewed certificates with the same
+    names share entries.
+"""
+
+
+def _cache_key(cert: Certificate, key: CacheKey) -> bytes:
+    if key == "fingerprint":
+        fp: bytes = cert.fingerprint(SHA256())
+        return fp
+
+    return subject_alt_name_digest(cert)
+
+
+@attr.s(slots=True, frozen=True)
+class _PatternCacheEntry:
+    patterns: Sequence[CertificatePattern] = attr.ib()
+    size: int = attr.ib()
+    #: Whether the certificate has any patterns -- also of unselected types.
+    has_patterns: bool = attr.ib()
+    identity: CertificateIdentity | None = attr.ib(default=None)
+
+
+class PatternCache:
+    r"""
+    A bounded LRU cache for the patterns of certificates and their compiled
+    :class:`~service_identity.hazmat.CertificateIdentity`.
+
+    Pass it to :func:`extract_patterns` to skip the extraction of certificates
+    that have been seen before.  It's safe to share between threads.
+
+    The patterns are cached per selection of *pattern_classes*, so only the
+    ``subjectAltName``\ s of the selected types are decoded and validated --
+    like without a cache.
+
+    Args:
+        max_entries: The maximum number of certificates to cache.
+
+        max_bytes:
+            The maximum estimated memory of all cached patterns. `None` for no
+            limit.
+
+        key:
+            How certificates are identified.  See :data:`CacheKey`.
+
+        interner:
+            If passed, equal patterns of different certificates are shared
+            using it.  *max_bytes* still counts them once per certificate.
+
+    .. versionadded:: 26.2.0
+    """
+
+    def __init__(
+        self,
+        max_entries: int = 1024,
+        max_bytes: int | None = 16 * 1024**2,
+        *,
+        key: CacheKey = "fingerprint",
+        interner: PatternInterner | None = None,
+    ):
+        self.key = key
+        self.interner = interner
+        self._lru: LRUCache[
+            tuple[bytes, tuple[bool, ...]], _PatternCacheEntry
+        ] = LRUCache(max_entries, max_bytes)
+
+    def __len__(self) -> int:
+        return len(self._lru)
+
+    @property
+    def hits(self) -> int:
+        """
+        The number of certificates whose patterns have been found.
+        """
+        return self._lru.hits
+
+    @property
+    def misses(self) -> int:
+        """
+        The number of certificates whose patterns had to be extracted.
+        """
+        return self._lru.misses
+
+    @property
+    def evictions(self) -> int:
+        """
+        The number of entries that have been evicted to stay in budget.
+        """
+        return self._lru.evictions
+
+    @property
+    def size(self) -> int:
+        """
+        The estimated memory of all cached patterns in bytes.
+        """
+        return self._lru.size
+
+    def extract_patterns(
+        self,
+        cert: Certificate,
+        *,
+        pattern_classes: Collection[type[CertificatePattern]] | None = None,
+    ) -> Sequence[CertificatePattern]:
+        """
+        Return the cached patterns of *cert* or extract and cache them.
+
+        The returned patterns are shared and must not be modified.
+
+        Args:
+            cert: The certificate to be dissected.
+
+            pattern_classes: Same as for :func:`extract_patterns`.
+        """
+        return self._entry(cert, _selected(pattern_classes))[1].patterns
+
+    def identity(
+        self,
+        cert: Certificate,
+        *,
+        pattern_classes: Collection[type[CertificatePattern]] | None = None,
+    ) -> CertificateIdentity:
+        """
+        Return the cached compiled identity of *cert* or compile and cache
+        it.
+
+        Identities that don't fit into *max_bytes* along with their patterns
+        are returned without caching them.
+
+        Args:
+            cert: The certificate to be dissected.
+
+            pattern_classes: Same as for :func:`extract_patterns`.
+        """
+        return self._identity(
+            cert, _selected(pattern_classes)
+        ) or CertificateIdentity.from_patterns(())
+
+    def _identity(
+        self, cert: Certificate, selected: tuple[bool, bool, bool, bool]
+    ) -> CertificateIdentity | None:
+        """
+        Like `identity`, but return `None` if *cert* doesn't have any
+        ``subjectAltName`` -- like `_hostname_identity`.
+        """
+        key, entry = self._entry(cert, selected)
+        if not entry.has_patterns:
+            return None
+
+        if entry.identity is not None:
+            return entry.identity
+
+        identity = CertificateIdentity.from_patterns(entry.patterns)
+        # The lookup tables are about the size of the patterns.
+        size = 2 * entry.size
+        max_bytes = self._lru.max_bytes
+        if max_bytes is None or size <= max_bytes:
+            self._lru.put(key, attr.evolve(entry, identity=identity), size)
+
+        return identity
+
+    def _entry(
+        self, cert: Certificate, selected: tuple[bool, bool, bool, bool]
+    ) -> tuple[tuple[bytes, tuple[bool, ...]], _PatternCacheEntry]:
+        key = (_cache_key(cert, self.key), selected)
+        entry = self._lru.get(key)
+        if entry is None:
+            extracted, has_patterns = _extract_selected(cert, selected)
+            patterns = tuple(
+                extracted
+                if self.interner is None
+                else self.interner.intern_all(extracted)
+            )
+            entry = _PatternCacheEntry(
+                patterns, _estimate_size(patterns), has_patterns
+            )
+            self._lru.put(key, entry, entry.size)
+
+        return key, entry
+
+    def clear(self) -> None:
+        """
+        Remove all cached patterns and reset the statistics.
+        """
+        self._lru.clear()
+
+
+@attr.s(slots=True, frozen=True)
+class _Result:
+    error: VerificationError | CertificateError | None = attr.ib()
+
+
+_SUCCESS = _Result(None)
+
+
+class VerificationCache:
+    """
+    A bounded LRU cache for the results of verifying certificates for
+    hostnames and IP addresses.
+
+    Pass it to :func:`verify_certificate_hostname`,
+    :func:`verify_certificate_ip_address`, or their pyOpenSSL counterparts.
+    Both successes and failures are cached and a cached failure raises the
+    same error again.
+
+    Entries expire at the latest when the certificate that they've been
+    computed for does.  Results for expired certificates are not cached.  It's
+    safe to share between threads.
+
+    Args:
+        max_entries: The maximum number of results to cache.
+
+        max_age:
+            The maximum number of seconds to cache a result, if you want them
+            to expire before the certificate does.
+
+        pattern_cache:
+            Used to extract the patterns of certificates whose results are
+            not cached.
+
+        key:
+            How certificates are identified.  See :data:`CacheKey`.
+
+    .. versionadded:: 26.2.0
+    """
+
+    def __init__(
+        self,
+        max_entries: int = 4096,
+        *,
+        max_age: float | None = None,
+        pattern_cache: PatternCache | None = None,
+        key: CacheKey = "fingerprint",
+    ):
+        self.key = key
+        self.max_age = max_age
+        self.pattern_cache = pattern_cache
+        self._lru: LRUCache[
+            tuple[bytes, Callable[[str], ServiceID], str], _Result
+        ] = LRUCache(max_entries)
+
+    def __len__(self) -> int:
+        return len(self._lru)
+
+    @property
+    def hits(self) -> int:
+        """
+        The number of results that have been found.
+        """
+        return self._lru.hits
+
+    @property
+    def misses(self) -> int:
+        """
+        The number of results that had to be computed -- including expired
+        ones.
+        """
+        return self._lru.misses
+
+    @property
+    def evictions(self) -> int:
+        """
+        The number of results that have been evicted to stay in budget.
+        """
+        return self._lru.evictions
+
+    def verify(
+        self,
+        certificate: Certificate,
+        id_class: Callable[[str], ServiceID],
+        value: str,
+    ) -> None:
+        """
+        Verify whether *certificate* is valid for the obligatory service ID
+        ``id_class(value)``.
+
+        Raises:
+            service_identity.VerificationError:
+                If *certificate* is not valid.
+
+            service_identity.CertificateError:
+                If *certificate* contains invalid / unexpected data.
+        """
+        key = (_cache_key(certificate, self.key), id_class, value)
+        entry = self._lru.get(key)
+        if entry is not None:
+            if entry.error is not None:
+                raise copy.copy(entry.error)
+            return
+
+        expires = certificate.not_valid_after_utc.timestamp()
+        if self.max_age is not None:
+            expires = min(expires, time.time() + self.max_age)
+
+        # Use the shared instances of our ID classes, so misses for
+        # hostnames that have been seen before skip the IDNA encoding.
+        make_id = getattr(id_class, "cached", id_class)
+        try:
+            if self.pattern_cache is None:
+                _verify_one(certificate, make_id(value))
+            else:
+                _verify_one_cached(
+                    certificate, make_id(value), self.pattern_cache
                 )
-            ]
+        except (VerificationError, CertificateError) as e:
+            self._lru.put(key, _Result(e), expires=expires)
+            raise
+
+        self._lru.put(key, _SUCCESS, expires=expires)
+
+    def clear(self) -> None:
+        """
+        Remove all cached results and reset the statistics.
+        """
+        self._lru.clear()
+
+
+def _estimate_size(patterns: Sequence[CertificatePattern]) -> int:
+    """
+    Estimate the memory that is used by *patterns* in bytes.
+    """
+    return sys.getsizeof(patterns) + sum(_pattern_size(p) for p in patterns)
+
+
+def _pattern_size(p: CertificatePattern) -> int:
+    if isinstance(p, URIPattern):
+        return (
+            sys.getsizeof(p)
+            + sys.getsizeof(p.protocol_pattern)
+            + _pattern_size(p.dns_pattern)
+        )
+    if isinstance(p, SRVPattern):
+        return (
+            sys.getsizeof(p)
+            + sys.getsizeof(p.name_pattern)
+            + _pattern_size(p.dns_pattern)
         )
-        ids.extend(
-            [
-                IPAddressPattern(ip)
-                for ip in ext.value.get_values_for_type(IPAddress)
-            ]
+
+    if isinstance(p, DNSPattern):
+        return (
+            sys.getsizeof(p)
+            + sys.getsizeof(p.pattern)
+            + sys.getsizeof(p.head)
+            + sys.getsizeof(p.tail)
         )
-        for other in ext.value.get_values_for_type(OtherName):
-            if other.type_id == ID_ON_DNS_SRV:
-                try:
-                    srv = asn1.decode_der(asn1.IA5String, other.value)
-                except ValueError as e:
-                    msg = "Unexpected certificate content."
-                    raise CertificateError(msg) from e
 
-                ids.append(SRVPattern.from_bytes(srv.as_str().encode("ascii")))
+    return sys.getsizeof(p) + sys.getsizeof(p.pattern)
 
-    return ids
+
+_OID_SUBJECT_ALT_NAME = b"\x55\x1d\x11"  # 2.5.29.17
+_OID_ON_DNS_SRV = b"\x2b\x06\x01\x05\x05\x07\x08\x07"
+
+_TAG_SEQUENCE = 0x30
+_TAG_IA5STRING = 0x16
+_TAG_OID = 0x06
+_TAG_EXPLICIT_0 = 0xA0
+
+# GeneralName CHOICE tags.
+_TAG_OTHER_NAME = 0xA0
+_TAG_DNS_NAME = 0x82
+_TAG_URI = 0x86
+_TAG_IP_ADDRESS = 0x87
+
+
+def extract_patterns_from_der(
+    cert: Buffer,
+    *,
+    pattern_classes: Collection[type[CertificatePattern]] | None = None,
+) -> Sequence[CertificatePattern]:
+    """
+    Extract all valid ID patterns from a DER-encoded certificate for service
+    verification.
+
+    Same as :func:`extract_patterns`, but it only locates and decodes the
+    ``subjectAltName`` extension without parsing the rest of the certificate
+    into objects.  Use it if you have the DER bytes anyway -- for example from
+    :meth:`ssl.SSLSocket.getpeercert` with ``binary_form=True``.
+
+    .. note::
+        Nothing else about the certificate is parsed or validated.
+
+    Args:
+        cert: The DER-encoded certificate to be dissected.
+
+        pattern_classes: Same as for :func:`extract_patterns`.
+
+    Returns:
+        List of IDs in the same order as :func:`extract_patterns`.
+
+    Raises:
+        service_identity.CertificateError:
+            If *cert* contains invalid / unexpected data.
+
+    .. versionadded:: 26.2.0
+    """
+    try:
+        san = find_extension(cert, _OID_SUBJECT_ALT_NAME)
+        if san is None:
+            return []
+
+        return _patterns_from_general_names(cert, *san, pattern_classes)
+    except ValueError as e:
+        msg = "Unexpected certificate content."
+        raise CertificateError(msg) from e
+
+
+def _patterns_from_general_names(
+    der: Buffer,
+    start: int,
+    end: int,
+    pattern_classes: Collection[type[CertificatePattern]] | None = None,
+) -> list[CertificatePattern]:
+    """
+    Decode the DER-encoded GeneralNames of *pattern_classes* (or all if
+    `None`) between *start* and *end*.
+    """
+    tag, start, end = read_tlv(der, start, end)
+    if tag != _TAG_SEQUENCE:
+        msg = "GeneralNames are not a SEQUENCE."
+        raise ValueError(msg)
+
+    dns: list[CertificatePattern] = []
+    uris: list[CertificatePattern] = []
+    ips: list[CertificatePattern] = []
+    srvs: list[CertificatePattern] = []
+    want_dns, want_uri, want_ip, want_srv = _selected(pattern_classes)
+    for tag, _, vstart, vend in iter_tlvs(der, start, end):
+        if tag == _TAG_DNS_NAME and want_dns:
+            dns.append(
+                DNSPattern.from_bytes(_decode_string(der, vstart, vend))
+            )
+        elif tag == _TAG_URI and want_uri:
+            uris.append(
+                URIPattern.from_bytes(_decode_string(der, vstart, vend))
+            )
+        elif tag == _TAG_IP_ADDRESS and want_ip:
+            ips.append(IPAddressPattern(_decode_ip(bytes(der[vstart:vend]))))
+        elif tag == _TAG_OTHER_NAME and want_srv:
+            srv = _decode_srv(der, vstart, vend)
+            if srv is not None:
+                srvs.append(SRVPattern.from_bytes(srv))
+
+    return dns + uris + ips + srvs
+
+
+def _decode_string(der: Buffer, start: int, end: int) -> bytes:
+    """
+    Like *cryptography*, we only insist on UTF-8 for IA5Strings in
+    GeneralNames.
+    """
+    value = bytes(der[start:end])
+    if not value.isascii():
+        value.decode("utf-8")
+
+    return value
+
+
+def _decode_ip(
+    value: bytes,
+) -> ipaddress.IPv4Address | ipaddress.IPv6Address:
+    if len(value) in (4, 16):
+        return ipaddress.ip_address(value)
+
+    # Like *cryptography*, accept networks with their netmask.
+    if len(value) not in (8, 32):
+        msg = "Invalid iPAddress length."
+        raise ValueError(msg)
+
+    half = len(value) // 2
+    mask = int.from_bytes(value[half:], "big")
+    prefix = bin(mask).count("1")
+    if mask != ((1 << prefix) - 1) << (half * 8 - prefix):
+        msg = "Invalid netmask."
+        raise ValueError(msg)
+
+    return ipaddress.ip_network(  # type: ignore[return-value]
+        f"{ipaddress.ip_address(value[:half])}/{prefix}"
+    )
+
+
+def _decode_srv(der: Buffer, start: int, end: int) -> bytes | None:
+    """
+    Decode the SRV name in the otherName between *start* and *end*.
+
+    Returns:
+        `None` if the otherName is not an SRV name.
+    """
+    tag, oid_start, oid_end = read_tlv(der, start, end)
+    if tag != _TAG_OID:
+        msg = "Invalid otherName."
+        raise ValueError(msg)
+    if der[oid_start:oid_end] != _OID_ON_DNS_SRV:
+        return None
+
+    tag, vstart, vend = read_tlv(der, oid_end, end)
+    if tag != _TAG_EXPLICIT_0:
+        msg = "Invalid otherName."
+        raise ValueError(msg)
+
+    tag, start, end = read_tlv(der, vstart, vend)
+    value = bytes(der[start:end])
+    if tag != _TAG_IA5STRING or end != vend or not value.isascii():
+        msg = "Invalid SRV name."
+        raise ValueError(msg)
+
+    return value
+
+
+@attr.s(slots=True, frozen=True)
+class RefreshResult:
+    """
+    The changes that :meth:`CertificateDirectory.refresh` has applied.
+
+    It's truthy if the index has changed.
+
+    .. versionadded:: 26.2.0
+    """
+
+    #: The paths of the files that have been added to the index.
+    added: tuple[str, ...] = attr.ib()
+    #: The paths of the files whose certificate has changed.
+    changed: tuple[str, ...] = attr.ib()
+    #: The paths of the files that have been removed from the index --
+    #: because they're gone or can't be loaded anymore.
+    removed: tuple[str, ...] = attr.ib()
+    #: The files that couldn't be loaded during this refresh and why.
+    errors: Mapping[str, Exception] = attr.ib()
+
+    def __bool__(self) -> bool:
+        return bool(self.added or self.changed or self.removed)
+
+
+@attr.s(slots=True)
+class _FileState:
+    #: The modification time in ns and the size.
+    stat: tuple[int, int] = attr.ib()
+    digest: bytes = attr.ib()
+    patterns: Sequence[CertificatePattern] = attr.ib()
+
+
+@attr.s(slots=True, frozen=True)
+class _DirectorySnapshot:
+    """
+    The files of a `CertificateDirectory`, their index, and the files that
+    couldn't be loaded -- replaced together by one assignment, such that
+    readers never mix two refreshes.
+    """
+
+    files: Mapping[str, _FileState] = attr.ib()
+    index: IdentityIndex[str] = attr.ib()
+    #: Files that couldn't be loaded: their stats and why.
+    failed: Mapping[str, tuple[tuple[int, int], Exception]] = attr.ib()
+
+
+class CertificateDirectory:
+    """
+    The certificates in the PEM files of a directory, indexed by the
+    hostnames and IP addresses that they're valid for.
+
+    The index is built when it's created and updated using :meth:`refresh`.
+    Only files whose modification time or size have changed are read again,
+    and only if their content has changed, they're parsed again.  The
+    changes are applied to copies of the index and the files that then
+    replace both at once, so readers never block and never see a partial
+    update.  Copying is linear in the number of files and names, but only
+    shallow: the certificates of the names that didn't change are shared.
+    Call :meth:`refresh` from one thread at a time -- for example
+    periodically or when a file watcher notices a change.
+
+    Only the first certificate of each file is used -- the others are
+    usually its chain.
+
+    Args:
+        path: The directory.
+
+        suffixes: Only files with one of these suffixes are loaded.
+
+    Raises:
+        OSError: If *path* can't be listed.
+
+    .. versionadded:: 26.2.0
+    """
+
+    def __init__(
+        self,
+        path: str | os.PathLike[str],
+        *,
+        suffixes: Collection[str] = (".pem", ".crt"),
+    ):
+        self.path = os.fspath(path)
+        self.suffixes = tuple(suffixes)
+        # Readers read it exactly once, refresh() replaces it.
+        self._snapshot = _DirectorySnapshot({}, IdentityIndex(), {})
+        self._lock = threading.Lock()
+
+        self.refresh()
+
+    def __len__(self) -> int:
+        """
+        The number of certificates in the index.
+        """
+        return len(self._snapshot.files)
+
+    @property
+    def index(self) -> IdentityIndex[str]:
+        """
+        The current index from the paths of the files to their patterns.
+
+        It's replaced -- never changed -- by :meth:`refresh`, so don't change
+        it either.
+        """
+        return self._snapshot.index
+
+    @property
+    def errors(self) -> Mapping[str, Exception]:
+        """
+        The files that can't be loaded and why.
+        """
+        return {path: e for path, (_, e) in self._snapshot.failed.items()}
+
+    def lookup(self, service_id: DNS_ID | IPAddress_ID) -> list[str]:
+        """
+        Return the paths of the files whose certificate is valid for
+        *service_id*.  See
+        :meth:`service_identity.hazmat.IdentityIndex.lookup`.
+        """
+        return self._snapshot.index.lookup(service_id)
+
+    def patterns(self, path: str) -> Sequence[CertificatePattern]:
+        """
+        Return the patterns of the certificate in *path*.
+
+        Raises:
+            KeyError: If there's no certificate for *path* in the index.
+        """
+        return self._snapshot.files[path].patterns
+
+    def refresh(self) -> RefreshResult:
+        """
+        Apply the changes of the directory to the index.
+
+        Raises:
+            OSError: If the directory can't be listed.
+        """
+        with self._lock:
+            return self._refresh()
+
+    def _refresh(self) -> RefreshResult:
+        snapshot = self._snapshot
+        files = snapshot.files
+        stats = self._scan()
+        # The new states of the files whose stats changed.
+        states: dict[str, _FileState] = {}
+        added: list[str] = []
+        changed: list[str] = []
+        removed = [path for path in files if path not in stats]
+        errors: dict[str, Exception] = {}
+        failed = {
+            path: failure
+            for path, failure in snapshot.failed.items()
+            if path in stats
+        }
+
+        for path, stat in stats.items():
+            old = files.get(path)
+            if (old is not None and old.stat == stat) or (
+                path in failed and failed[path][0] == stat
+            ):
+                continue
+
+            try:
+                state = _load_file(path, stat, old)
+            except (OSError, ValueError, CertificateError) as e:
+                errors[path] = e
+                failed[path] = (stat, e)
+                if old is not None:
+                    removed.append(path)
+                continue
+
+            failed.pop(path, None)
+            if old is None:
+                added.append(path)
+            elif state.digest != old.digest:
+                changed.append(path)
+            states[path] = state
+
+        if states or removed or failed != snapshot.failed:
+            self._apply(states, failed, added, changed, removed)
+
+        return RefreshResult(
+            added=tuple(sorted(added)),
+            changed=tuple(sorted(changed)),
+            removed=tuple(sorted(removed)),
+            errors=errors,
+        )
+
+    def _scan(self) -> dict[str, tuple[int, int]]:
+        """
+        Return the modification times and sizes of the certificate files.
+        """
+        stats = {}
+        with os.scandir(self.path) as it:
+            for entry in it:
+                if entry.name.endswith(self.suffixes) and entry.is_file():
+                    st = entry.stat()
+                    stats[entry.path] = (st.st_mtime_ns, st.st_size)
+
+        return stats
+
+    def _apply(
+        self,
+        states: dict[str, _FileState],
+        failed: dict[str, tuple[tuple[int, int], Exception]],
+        added: list[str],
+        changed: list[str],
+        removed: list[str],
+    ) -> None:
+        """
+        Apply the changes to copies of the files and the index and publish
+        them at once with *failed*.
+        """
+        snapshot = self._snapshot
+        files = snapshot.files
+        if states or removed:
+            files = dict(files)
+            for path in removed:
+                del files[path]
+            files.update(states)
+
+        index = snapshot.index
+        if added or changed or removed:
+            index = index.copy()
+            for path in removed:
+                index.remove(path)
+            for path in (*added, *changed):
+                index.insert(path, states[path].patterns)
+
+        self._snapshot = _DirectorySnapshot(files, index, failed)
+
+
+def _load_file(
+    path: str, stat: tuple[int, int], old: _FileState | None
+) -> _FileState:
+    """
+    Load the certificate in *path* unless its content is the same as *old*'s.
+    """
+    data = pathlib.Path(path).read_bytes()
+    digest = hashlib.sha256(data).digest()
+    if old is not None and old.digest == digest:
+        return _FileState(stat, digest, old.patterns)
+
+    return _FileState(
+        stat,
+        digest,
+        tuple(extract_patterns(load_pem_x509_certificate(data))),
+    )
 
 
 def extract_ids(cert: Certificate) -> Sequence[CertificatePattern]:
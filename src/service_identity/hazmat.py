@@ -6,11 +6,30 @@ from __future__ import annotations
 
 import ipaddress
 import re
-
-from typing import Protocol, Sequence, Union, runtime_checkable
+import sys
+import threading
+import weakref
+
+from types import ModuleType
+from typing import (
+    TYPE_CHECKING,
+    Any,
+    Callable,
+    ClassVar,
+    Generic,
+    Hashable,
+    Iterable,
+    Literal,
+    Protocol,
+    Sequence,
+    TypeVar,
+    Union,
+    runtime_checkable,
+)
 
 import attr
 
+from ._cache import LRUCache
 from .exceptions import (
     CertificateError,
     DNSMismatch,
@@ -22,10 +41,55 @@ from .exceptions import (
 )
 
 
-try:
-    import idna
-except ImportError:
-    idna = None  # type: ignore[assignment]
+if TYPE_CHECKING:
+    # The redundant aliases mark the lazy imports from __getattr__ as public.
+    from ._mapped import (
+        MappedIdentityIndex as MappedIdentityIndex,  # noqa: PLC0414
+    )
+    from ._mapped import (
+        write_identity_index as write_identity_index,  # noqa: PLC0414
+    )
+    from ._table import PatternTable as PatternTable  # noqa: PLC0414
+
+
+# idna is imported on first use by _import_idna() because it's only needed
+# for non-ASCII hostnames and slow to import.  Until then, the name is unbound.
+idna: ModuleType | None
+
+# Imported on first access from these private modules such that importing
+# hazmat stays cheap.
+_LAZY = {
+    "MappedIdentityIndex": "_mapped",
+    "PatternTable": "_table",
+    "write_identity_index": "_mapped",
+}
+
+
+def _import_idna() -> ModuleType | None:
+    global idna  # noqa: PLW0603
+
+    try:
+        import idna  # noqa: PLC0415
+    except ImportError:
+        idna = None
+
+    return idna
+
+
+def __getattr__(name: str) -> Any:
+    if name == "idna":
+        return _import_idna()
+
+    if name in _LAZY:
+        from importlib import import_module  # noqa: PLC0415
+
+        value = getattr(import_module(f".{_LAZY[name]}", __package__), name)
+        globals()[name] = value
+
+        return value
+
+    msg = f"module {__name__} has no attribute {name}"
+    raise AttributeError(msg)
 
 
 @attr.s(slots=True)
@@ -38,10 +102,26 @@ class ServiceMatch:
     cert_pattern: CertificatePattern = attr.ib()
 
 
+Collect = Literal["all", "first", "none"]
+"""
+Which matches `verify_service_identity` returns:
+
+- ``"all"``: every match of every ID -- including several patterns that
+  match the same ID.
+- ``"first"``: only the first match of every ID.  The search for an ID stops
+  once it's matched.
+- ``"none"``: no matches -- it only verifies.  Also stops at the first match.
+
+.. versionadded:: 26.2.0
+"""
+
+
 def verify_service_identity(
     cert_patterns: Sequence[CertificatePattern],
     obligatory_ids: Sequence[ServiceID],
     optional_ids: Sequence[ServiceID],
+    *,
+    collect: Collect = "all",
 ) -> list[ServiceMatch]:
     """
     Verify whether *cert_patterns* are valid for *obligatory_ids* and
@@ -49,64 +129,293 @@ def verify_service_identity(
 
     *obligatory_ids* must be both present and match.  *optional_ids* must match
     if a pattern of the respective type is present.
+
+    *collect* determines which matches are returned.  See `Collect`.
+
+    .. versionchanged:: 26.2.0
+        Added the *collect* argument.
+    """
+    result = check_service_identity(
+        cert_patterns, obligatory_ids, optional_ids, collect=collect
+    )
+    if not result:
+        raise VerificationError(errors=result.errors)
+
+    return result.matches
+
+
+@attr.s(slots=True, frozen=True)
+class VerificationResult:
+    """
+    The outcome of checking service IDs against certificate patterns.
+
+    It's truthy if the verification succeeded.  The failed IDs are stored as
+    bitmasks and the `Mismatch` objects are only built when you access
+    `errors`.
+
+    .. versionadded:: 26.2.0
+    """
+
+    #: The obligatory IDs that have been checked.
+    obligatory_ids: Sequence[ServiceID] = attr.ib()
+    #: The optional IDs that have been checked.
+    optional_ids: Sequence[ServiceID] = attr.ib()
+    #: Bit *n* is set if ``obligatory_ids[n]`` failed.
+    failed_obligatory: int = attr.ib()
+    #: Bit *n* is set if ``optional_ids[n]`` failed.
+    failed_optional: int = attr.ib()
+    #: The matches as determined by the *collect* argument.
+    matches: list[ServiceMatch] = attr.ib()
+
+    @property
+    def ok(self) -> bool:
+        """
+        Whether the verification succeeded.
+        """
+        return not (self.failed_obligatory or self.failed_optional)
+
+    def __bool__(self) -> bool:
+        return self.ok
+
+    @property
+    def errors(self) -> list[Mismatch]:
+        """
+        The errors that `verify_service_identity` would raise in a
+        `VerificationError` -- obligatory IDs first.
+        """
+        return [
+            i.error_on_mismatch(mismatched_id=i)
+            for ids, failed in (
+                (self.obligatory_ids, self.failed_obligatory),
+                (self.optional_ids, self.failed_optional),
+            )
+            for n, i in enumerate(ids)
+            if failed >> n & 1
+        ]
+
+
+def check_service_identity(
+    cert_patterns: Sequence[CertificatePattern],
+    obligatory_ids: Sequence[ServiceID],
+    optional_ids: Sequence[ServiceID],
+    *,
+    collect: Collect = "none",
+) -> VerificationResult:
+    """
+    Like `verify_service_identity`, but return the outcome instead of raising
+    a `VerificationError` if it fails.
+
+    That's considerably cheaper if you expect many verifications to fail.
+
+    Raises:
+        service_identity.CertificateError:
+            If *cert_patterns* is empty.
+
+    .. versionadded:: 26.2.0
     """
     if not cert_patterns:
         msg = "Certificate does not contain any `subjectAltName`s."
         raise CertificateError(msg)
 
-    errors = []
-    matches = _find_matches(cert_patterns, obligatory_ids) + _find_matches(
-        cert_patterns, optional_ids
-    )
-
-    matched_ids = [match.service_id for match in matches]
-    for i in obligatory_ids:
-        if i not in matched_ids:
-            errors.append(  # noqa: PERF401
-                i.error_on_mismatch(mismatched_id=i)
-            )
+    if collect not in ("all", "first", "none"):
+        msg = f"Unknown collect mode {collect!r}."
+        raise ValueError(msg)
+
+    buckets = _bucket(cert_patterns)
+    matches: list[ServiceMatch] = []
+    failed_obligatory = 0
+    for n, i in enumerate(obligatory_ids):
+        if not _match_id(
+            _candidates(buckets, cert_patterns, i.pattern_class),
+            i,
+            matches,
+            collect,
+        ):
+            failed_obligatory |= 1 << n
 
-    for i in optional_ids:
+    failed_optional = 0
+    for n, i in enumerate(optional_ids):
         # If an optional ID is not matched by a certificate pattern *but* there
         # is a pattern of the same type , it is an error and the verification
         # fails.  Example: the user passes a SRV-ID for "_mail.domain.com" but
         # the certificate contains an SRV-Pattern for "_xmpp.domain.com".
-        if i not in matched_ids and _contains_instance_of(
-            cert_patterns, i.pattern_class
-        ):
-            errors.append(  # noqa: PERF401
-                i.error_on_mismatch(mismatched_id=i)
-            )
-
-    if errors:
-        raise VerificationError(errors=errors)
-
-    return matches
+        candidates = _candidates(buckets, cert_patterns, i.pattern_class)
+        if candidates and not _match_id(candidates, i, matches, collect):
+            failed_optional |= 1 << n
+
+    return VerificationResult(
+        obligatory_ids,
+        optional_ids,
+        failed_obligatory,
+        failed_optional,
+        matches,
+    )
 
 
-def _find_matches(
+def _match_id(
     cert_patterns: Sequence[CertificatePattern],
-    service_ids: Sequence[ServiceID],
-) -> list[ServiceMatch]:
+    sid: ServiceID,
+    matches: list[ServiceMatch],
+    collect: Collect,
+) -> bool:
     """
-    Search for matching certificate patterns and service_ids.
+    Add the matches of *sid* in *cert_patterns* to *matches* according to
+    *collect*.
 
-    Args:
-        service_ids: List of service IDs like DNS_ID.
+    Returns:
+        Whether *sid* is matched by any of *cert_patterns*.
     """
-    matches = []
-    for sid in service_ids:
+    if collect == "all":
+        found = False
         for cid in cert_patterns:
             if sid.verify(cid):
-                matches.append(  # noqa: PERF401
-                    ServiceMatch(cert_pattern=cid, service_id=sid)
-                )
+                matches.append(ServiceMatch(cert_pattern=cid, service_id=sid))
+                found = True
 
-    return matches
+        return found
 
+    for cid in cert_patterns:
+        if sid.verify(cid):
+            if collect == "first":
+                matches.append(ServiceMatch(cert_pattern=cid, service_id=sid))
+            return True
+
+    return False
+
+
+def verify_service_identity_iter(
+    cert_patterns: Iterable[CertificatePattern],
+    obligatory_ids: Sequence[ServiceID],
+    optional_ids: Sequence[ServiceID],
+) -> list[ServiceMatch]:
+    """
+    Like `verify_service_identity`, but consume *cert_patterns* lazily -- for
+    example from :func:`service_identity.cryptography.iter_patterns`.
+
+    The iteration stops as soon as every ID has been matched, because no
+    later pattern could change the outcome anymore.  Therefore, only the
+    *first* match of each ID is returned, in the order they've been found.
+
+    Raises the same errors as `verify_service_identity`.
+
+    .. versionadded:: 26.2.0
+    """
+    result, empty = _check_lazily(cert_patterns, obligatory_ids, optional_ids)
+    if empty:
+        msg = "Certificate does not contain any `subjectAltName`s."
+        raise CertificateError(msg)
 
-def _contains_instance_of(seq: Sequence[object], cl: type) -> bool:
-    return any(isinstance(e, cl) for e in seq)
+    if not result:
+        raise VerificationError(errors=result.errors)
+
+    return result.matches
+
+
+def _check_lazily(
+    cert_patterns: Iterable[CertificatePattern],
+    obligatory_ids: Sequence[ServiceID],
+    optional_ids: Sequence[ServiceID],
+) -> tuple[VerificationResult, bool]:
+    """
+    Match *cert_patterns* until all IDs are matched.
+
+    Returns:
+        The result with the first match of each ID and whether
+        *cert_patterns* was empty.
+    """
+    unmatched_obligatory = list(enumerate(obligatory_ids))
+    unmatched_optional = list(enumerate(optional_ids))
+    seen: set[type] = set()
+    matches: list[ServiceMatch] = []
+    for pattern in cert_patterns:
+        seen.add(type(pattern))
+        unmatched_obligatory = _match_pattern(
+            pattern, unmatched_obligatory, matches
+        )
+        unmatched_optional = _match_pattern(
+            pattern, unmatched_optional, matches
+        )
+
+        # An unmatched optional ID could still fail due to a later pattern of
+        # its type, so we can only stop once it's matched, too.
+        if not unmatched_obligatory and not unmatched_optional:
+            break
+
+    failed_obligatory = 0
+    for n, _ in unmatched_obligatory:
+        failed_obligatory |= 1 << n
+
+    failed_optional = 0
+    for n, i in unmatched_optional:
+        if any(issubclass(cl, i.pattern_class) for cl in seen):
+            failed_optional |= 1 << n
+
+    return (
+        VerificationResult(
+            obligatory_ids,
+            optional_ids,
+            failed_obligatory,
+            failed_optional,
+            matches,
+        ),
+        not seen,
+    )
+
+
+def _match_pattern(
+    pattern: CertificatePattern,
+    service_ids: list[tuple[int, ServiceID]],
+    matches: list[ServiceMatch],
+) -> list[tuple[int, ServiceID]]:
+    """
+    Add the matches of *pattern* and the enumerated *service_ids* to
+    *matches*.
+
+    Returns:
+        The enumerated service IDs that have not been matched.
+    """
+    unmatched = []
+    for n, sid in service_ids:
+        if sid.verify(pattern):
+            matches.append(ServiceMatch(cert_pattern=pattern, service_id=sid))
+        else:
+            unmatched.append((n, sid))
+
+    return unmatched
+
+
+def _bucket(
+    cert_patterns: Sequence[CertificatePattern],
+) -> dict[type, list[CertificatePattern]]:
+    """
+    Group *cert_patterns* by their class while keeping their order.
+
+    Service IDs only match patterns of their *pattern_class*, so they only
+    need to be compared to their bucket.
+    """
+    buckets: dict[type, list[CertificatePattern]] = {}
+    for p in cert_patterns:
+        buckets.setdefault(type(p), []).append(p)
+
+    return buckets
+
+
+def _candidates(
+    buckets: dict[type, list[CertificatePattern]],
+    cert_patterns: Sequence[CertificatePattern],
+    cl: type,
+) -> Sequence[CertificatePattern]:
+    """
+    Return the patterns that are instances of *cl* in their original order.
+    """
+    classes = [t for t in buckets if issubclass(t, cl)]
+    if len(classes) == 1:
+        return buckets[classes[0]]
+    if not classes:
+        return ()
+
+    # Patterns of several subclasses; the buckets would lose their order.
+    return [p for p in cert_patterns if isinstance(p, cl)]
 
 
 def _is_ip_address(pattern: str | bytes) -> bool:
@@ -119,61 +428,173 @@ def _is_ip_address(pattern: str | bytes) -> bool:
     Returns:
         `True` if *pattern* could be an IP address, else `False`.
     """
+    return _classify_host(pattern) != "DNS"
+
+
+HostClass = Literal["DNS", "IPv4", "IPv6", "numeric"]
+
+# What int() accepts from ASCII strings.
+_RE_NUMERIC = re.compile(
+    r"[ \t\n\x0b\x0c\r]*[+-]?[0-9]+(?:_[0-9]+)*[ \t\n\x0b\x0c\r]*\Z"
+)
+# What ipaddress.IPv4Address accepts.
+_OCTET = r"(?:25[0-5]|2[0-4][0-9]|1[0-9][0-9]|[1-9]?[0-9])"
+_RE_IPV4 = re.compile(rf"{_OCTET}(?:\.{_OCTET}){{3}}\Z")
+_RE_HEXTET = re.compile(r"[0-9a-fA-F]{1,4}\Z")
+_RE_DIGIT = re.compile(r"\d")
+_RE_LETTER = re.compile(r"[^\W\d_]")
+# Characters that can't appear in IP addresses, int()s, or IPv6 scope IDs.
+_RE_DNS_ONLY = re.compile(r"[g-zG-Z]")
+# ipaddress.IPv6Address accepts scope IDs like "%eth0" since Python 3.9.
+_HAS_SCOPE_IDS = sys.version_info >= (3, 9)
+
+
+def _classify_host(pattern: str | bytes) -> HostClass:
+    """
+    Classify *pattern* without raising and catching exceptions.
+
+    ``*`` counts as a digit, so wildcard patterns that could match IP
+    addresses are classified as such.
+
+    Returns:
+        ``"numeric"`` if `int` accepts *pattern*, ``"IPv4"`` or ``"IPv6"`` if
+        `ipaddress.ip_address` does, else ``"DNS"``.
+    """
     if isinstance(pattern, bytes):
-        try:
-            pattern = pattern.decode("ascii")
-        except UnicodeError:
+        if not pattern.isascii():
+            return "DNS"
+        pattern = pattern.decode("ascii")
+    elif not pattern.isascii():
+        return _classify_non_ascii_host(pattern)
+
+    if "%" not in pattern and _RE_DNS_ONLY.search(pattern) is not None:
+        # The common case: a host name.
+        return "DNS"
+
+    if _RE_NUMERIC.match(pattern) is not None:
+        return "numeric"
+
+    pattern = pattern.replace("*", "1")
+    if _RE_IPV4.match(pattern) is not None:
+        return "IPv4"
+
+    return "IPv6" if _is_ipv6(pattern) else "DNS"
+
+
+def _is_ipv6(addr: str) -> bool:
+    """
+    Check *addr* like `ipaddress.IPv6Address` does.
+    """
+    addr, sep, scope_id = addr.partition("%")
+    if sep and (not _HAS_SCOPE_IDS or not scope_id or "%" in scope_id):
+        return False
+
+    head, compressed, tail = addr.partition("::")
+    hextets = [
+        *(head.split(":") if head else ()),
+        *(tail.split(":") if tail else ()),
+    ]
+    if hextets and "." in hextets[-1] and (tail or not compressed):
+        if _RE_IPV4.match(hextets.pop()) is None:
+            return False
+        hextets += ("0", "0")
+
+    if compressed:
+        if len(hextets) > 7:
             return False
+    elif len(hextets) != 8:
+        return False
+
+    return all(_RE_HEXTET.match(h) is not None for h in hextets)
+
+
+def _classify_non_ascii_host(pattern: str) -> HostClass:
+    """
+    Let `int` and `ipaddress.ip_address` decide about non-ASCII *pattern*s.
+    """
+    # Only int() accepts non-ASCII characters -- digits and whitespace, but no
+    # letters -- and only IPv6 scope IDs can contain any others.
+    if "%" not in pattern and (
+        _RE_LETTER.search(pattern) is not None
+        or _RE_DIGIT.search(pattern) is None
+    ):
+        return "DNS"
 
     try:
         int(pattern)
     except ValueError:
         pass
     else:
-        return True
+        return "numeric"
 
     try:
-        ipaddress.ip_address(pattern.replace("*", "1"))
+        ip = ipaddress.ip_address(pattern.replace("*", "1"))
     except ValueError:
-        return False
+        return "DNS"
 
-    return True
+    return "IPv4" if ip.version == 4 else "IPv6"
 
 
-@attr.s(slots=True)
+@attr.s(slots=True, frozen=True)
 class DNSPattern:
     """
     A DNS pattern as extracted from certificates.
+
+    .. versionchanged:: 26.2.0
+        Instances are immutable and hashable.
     """
 
     #: The pattern.
     pattern: bytes = attr.ib()
 
+    #: Whether the pattern contains a wildcard.
+    is_wildcard: bool = attr.ib(init=False, eq=False, repr=False)
+    #: The left-most label of the pattern.
+    head: bytes = attr.ib(init=False, eq=False, repr=False)
+    #: Everything after the left-most label; `None` if there's only one.
+    tail: bytes | None = attr.ib(init=False, eq=False, repr=False)
+
     _RE_LEGAL_CHARS = re.compile(rb"^[a-z0-9\-_.]+$")
 
+    def __attrs_post_init__(self) -> None:
+        head, tail = _split_head(self.pattern)
+        object.__setattr__(self, "is_wildcard", b"*" in self.pattern)
+        object.__setattr__(self, "head", head)
+        object.__setattr__(self, "tail", tail)
+
     @classmethod
     def from_bytes(cls, pattern: bytes) -> DNSPattern:
-        if not isinstance(pattern, bytes):
-            msg = "The DNS pattern must be a bytes string."
-            raise TypeError(msg)
+        return cls(pattern=_dns_pattern_bytes(pattern))
 
-        pattern = pattern.strip()
 
-        if pattern == b"" or _is_ip_address(pattern) or b"\0" in pattern:
-            msg = f"Invalid DNS pattern {pattern!r}."
-            raise CertificateError(msg)
+def _dns_pattern_bytes(pattern: bytes) -> bytes:
+    """
+    Validate and normalize the DNS pattern *pattern*.
+    """
+    if not isinstance(pattern, bytes):
+        msg = "The DNS pattern must be a bytes string."
+        raise TypeError(msg)
 
-        pattern = pattern.translate(_TRANS_TO_LOWER)
-        if b"*" in pattern:
-            _validate_pattern(pattern)
+    pattern = pattern.strip()
 
-        return cls(pattern=pattern)
+    if pattern == b"" or _is_ip_address(pattern) or b"\0" in pattern:
+        msg = f"Invalid DNS pattern {pattern!r}."
+        raise CertificateError(msg)
 
+    pattern = pattern.translate(_TRANS_TO_LOWER)
+    if b"*" in pattern:
+        _validate_pattern(pattern)
 
-@attr.s(slots=True)
+    return pattern
+
+
+@attr.s(slots=True, frozen=True)
 class IPAddressPattern:
     """
     An IP address pattern as extracted from certificates.
+
+    .. versionchanged:: 26.2.0
+        Instances are immutable and hashable.
     """
 
     #: The pattern.
@@ -188,10 +609,13 @@ class IPAddressPattern:
             raise CertificateError(msg) from None
 
 
-@attr.s(slots=True)
+@attr.s(slots=True, frozen=True)
 class URIPattern:
     """
     An URI pattern as extracted from certificates.
+
+    .. versionchanged:: 26.2.0
+        Instances are immutable and hashable.
     """
 
     #: The pattern for the protocol part.
@@ -201,28 +625,41 @@ class URIPattern:
 
     @classmethod
     def from_bytes(cls, pattern: bytes) -> URIPattern:
-        if not isinstance(pattern, bytes):
-            msg = "The URI pattern must be a bytes string."
-            raise TypeError(msg)
-
-        pattern = pattern.strip().translate(_TRANS_TO_LOWER)
-
-        if b":" not in pattern or b"*" in pattern or _is_ip_address(pattern):
-            msg = f"Invalid URI pattern {pattern!r}."
-            raise CertificateError(msg)
-
-        protocol_pattern, hostname = pattern.split(b":")
+        protocol_pattern, dns_pattern = _uri_pattern_parts(pattern)
 
         return cls(
             protocol_pattern=protocol_pattern,
-            dns_pattern=DNSPattern.from_bytes(hostname),
+            dns_pattern=DNSPattern(pattern=dns_pattern),
         )
 
 
-@attr.s(slots=True)
+def _uri_pattern_parts(pattern: bytes) -> tuple[bytes, bytes]:
+    """
+    Validate the URI pattern *pattern* and split it into its normalized
+    protocol and DNS patterns.
+    """
+    if not isinstance(pattern, bytes):
+        msg = "The URI pattern must be a bytes string."
+        raise TypeError(msg)
+
+    pattern = pattern.strip().translate(_TRANS_TO_LOWER)
+
+    if b":" not in pattern or b"*" in pattern or _is_ip_address(pattern):
+        msg = f"Invalid URI pattern {pattern!r}."
+        raise CertificateError(msg)
+
+    protocol_pattern, hostname = pattern.split(b":")
+
+    return protocol_pattern, _dns_pattern_bytes(hostname)
+
+
+@attr.s(slots=True, frozen=True)
 class SRVPattern:
     """
     An SRV pattern as extracted from certificates.
+
+    .. versionchanged:: 26.2.0
+        Instances are immutable and hashable.
     """
 
     #: The pattern for the name part.
@@ -232,27 +669,39 @@ class SRVPattern:
 
     @classmethod
     def from_bytes(cls, pattern: bytes) -> SRVPattern:
-        if not isinstance(pattern, bytes):
-            msg = "The SRV pattern must be a bytes string."
-            raise TypeError(msg)
-
-        pattern = pattern.strip().translate(_TRANS_TO_LOWER)
-
-        if (
-            pattern[0] != b"_"[0]
-            or b"." not in pattern
-            or b"*" in pattern
-            or _is_ip_address(pattern)
-        ):
-            msg = f"Invalid SRV pattern {pattern!r}."
-            raise CertificateError(msg)
+        name_pattern, dns_pattern = _srv_pattern_parts(pattern)
 
-        name, hostname = pattern.split(b".", 1)
         return cls(
-            name_pattern=name[1:], dns_pattern=DNSPattern.from_bytes(hostname)
+            name_pattern=name_pattern,
+            dns_pattern=DNSPattern(pattern=dns_pattern),
         )
 
 
+def _srv_pattern_parts(pattern: bytes) -> tuple[bytes, bytes]:
+    """
+    Validate the SRV pattern *pattern* and split it into its normalized name
+    and DNS patterns.
+    """
+    if not isinstance(pattern, bytes):
+        msg = "The SRV pattern must be a bytes string."
+        raise TypeError(msg)
+
+    pattern = pattern.strip().translate(_TRANS_TO_LOWER)
+
+    if (
+        pattern[0] != b"_"[0]
+        or b"." not in pattern
+        or b"*" in pattern
+        or _is_ip_address(pattern)
+    ):
+        msg = f"Invalid SRV pattern {pattern!r}."
+        raise CertificateError(msg)
+
+    name, hostname = pattern.split(b".", 1)
+
+    return name[1:], _dns_pattern_bytes(hostname)
+
+
 CertificatePattern = Union[
     SRVPattern, URIPattern, DNSPattern, IPAddressPattern
 ]
@@ -262,6 +711,80 @@ certificate.
 """
 
 
+_P = TypeVar("_P", bound=CertificatePattern)
+
+
+class PatternInterner:
+    """
+    An intern table that replaces equal patterns -- for example from many
+    certificates for the same domain -- by one shared instance.
+
+    The patterns are only referenced weakly: they're dropped once nothing
+    else uses them.  It's safe to share between threads.
+
+    .. versionadded:: 26.2.0
+    """
+
+    def __init__(self) -> None:
+        # Keyed by the fields instead of the patterns themselves, because the
+        # keys are referenced strongly.
+        self._patterns: weakref.WeakValueDictionary[
+            tuple[Any, ...], CertificatePattern
+        ] = weakref.WeakValueDictionary()
+        self._lock = threading.Lock()
+        #: The number of patterns that have been replaced by shared ones.
+        self.hits = 0
+        #: The number of patterns that have been added to the table.
+        self.misses = 0
+
+    def __len__(self) -> int:
+        return len(self._patterns)
+
+    def intern(self, pattern: _P) -> _P:
+        """
+        Return the shared instance that is equal to *pattern* and make
+        *pattern* the shared instance if there is none yet.
+
+        The DNS patterns within URI and SRV patterns are shared, too.
+        """
+        with self._lock:
+            return self._intern(pattern)
+
+    def intern_all(self, patterns: Iterable[_P]) -> list[_P]:
+        """
+        Like `intern`, but for all *patterns*.
+        """
+        with self._lock:
+            return [self._intern(p) for p in patterns]
+
+    def _intern(self, pattern: _P) -> _P:
+        key = _intern_key(pattern)
+        shared = self._patterns.get(key)
+        if shared is not None:
+            self.hits += 1
+            return shared  # type: ignore[return-value]
+
+        self.misses += 1
+        if isinstance(pattern, (URIPattern, SRVPattern)):
+            dns_pattern = self._intern(pattern.dns_pattern)
+            if dns_pattern is not pattern.dns_pattern:
+                pattern = attr.evolve(pattern, dns_pattern=dns_pattern)
+                key = _intern_key(pattern)
+
+        self._patterns[key] = pattern
+
+        return pattern
+
+
+def _intern_key(pattern: CertificatePattern) -> tuple[Any, ...]:
+    if isinstance(pattern, (DNSPattern, IPAddressPattern)):
+        return (type(pattern), pattern.pattern)
+    if isinstance(pattern, URIPattern):
+        return (URIPattern, pattern.protocol_pattern, pattern.dns_pattern)
+
+    return (SRVPattern, pattern.name_pattern, pattern.dns_pattern)
+
+
 @runtime_checkable
 class ServiceID(Protocol):
     @property
@@ -273,14 +796,188 @@ class ServiceID(Protocol):
     def verify(self, pattern: CertificatePattern) -> bool: ...
 
 
-@attr.s(init=False, slots=True)
-class DNS_ID:
+@attr.s(slots=True, frozen=True)
+class CacheInfo:
+    """
+    Statistics of a cache -- like the instance cache of a service ID class or
+    the IDNA cache.
+
+    .. versionadded:: 26.2.0
+    """
+
+    #: The number of values that have been found in the cache.
+    hits: int = attr.ib()
+    #: The number of values that had to be computed.
+    misses: int = attr.ib()
+    #: The number of values that have been evicted to stay in budget.
+    evictions: int = attr.ib()
+    #: The number of cached values.
+    size: int = attr.ib()
+    #: The maximum number of cached values.
+    max_size: int = attr.ib()
+
+
+def _cache_info(lru: LRUCache[Any, Any]) -> CacheInfo:
+    return CacheInfo(
+        hits=lru.hits,
+        misses=lru.misses,
+        evictions=lru.evictions,
+        size=len(lru),
+        max_size=lru.max_entries,
+    )
+
+
+# The number of instances that each service ID class caches.  It's read
+# once when the class is created -- the max_size of its cache_info().
+_ID_CACHE_SIZE = 1024
+
+# The number of IDNA-encoded hostnames that are cached -- the max_size of
+# idna_cache_info().
+_IDNA_CACHE: LRUCache[str, bytes] = LRUCache(4096)
+
+
+def _encode_hostname(hostname: str) -> bytes:
+    """
+    Encode *hostname* to ASCII -- using IDNA and the IDNA cache if necessary.
+    """
+    if hostname.isascii():
+        return hostname.encode("ascii")
+
+    try:
+        idna_ = idna
+    except NameError:
+        idna_ = _import_idna()
+
+    if not idna_:
+        msg = "idna library is required for non-ASCII IDs."
+        raise ImportError(msg)
+
+    ascii_id = _IDNA_CACHE.get(hostname)
+    if ascii_id is None:
+        ascii_id = idna_.encode(hostname)
+        _IDNA_CACHE.put(hostname, ascii_id)
+
+    return ascii_id
+
+
+def encode_hostnames(hostnames: Iterable[str]) -> list[bytes]:
+    """
+    Encode *hostnames* to ASCII like `DNS_ID` does before it normalizes
+    them: non-ASCII hostnames are IDNA-encoded using -- and added to -- the
+    IDNA cache.
+
+    Duplicates within *hostnames* are encoded only once.  You can use it to
+    warm the IDNA cache for a known set of internationalized domains.
+
+    Raises:
+        ImportError: If a hostname isn't ASCII and *idna* isn't installed.
+
+        idna.IDNAError: If a hostname can't be IDNA-encoded.
+
+    .. versionadded:: 26.2.0
+    """
+    encoded: dict[str, bytes] = {}
+    rv = []
+    for hostname in hostnames:
+        ascii_id = encoded.get(hostname)
+        if ascii_id is None:
+            ascii_id = encoded[hostname] = _encode_hostname(hostname)
+        rv.append(ascii_id)
+
+    return rv
+
+
+def idna_cache_info() -> CacheInfo:
+    """
+    Return the statistics of the IDNA cache.
+
+    .. versionadded:: 26.2.0
+    """
+    return _cache_info(_IDNA_CACHE)
+
+
+def idna_cache_clear() -> None:
+    """
+    Remove all cached IDNA encodings and reset the statistics.
+
+    .. versionadded:: 26.2.0
+    """
+    _IDNA_CACHE.clear()
+
+
+_T = TypeVar("_T", bound="_CachedID")
+
+
+class _CachedID:
+    """
+    Gives each service ID class a bounded cache of its instances.
+
+    That's safe because service IDs are immutable.
+    """
+
+    __slots__ = ()
+
+    _instances: ClassVar[LRUCache[str, Any]]
+
+    def __init_subclass__(cls, **kw: Any) -> None:
+        super().__init_subclass__(**kw)
+        cls._instances = LRUCache(_ID_CACHE_SIZE)
+
+    @classmethod
+    def cached(cls: type[_T], value: str) -> _T:  # noqa: PYI019
+        """
+        Like calling the class with *value*, but return a shared instance from
+        a bounded LRU cache if possible.
+
+        Invalid values are not cached and raise the same errors every time.
+
+        .. versionadded:: 26.2.0
+        """
+        sid = cls._instances.get(value)
+        if sid is None:
+            sid = cls(value)  # type: ignore[call-arg]
+            cls._instances.put(value, sid)
+
+        return sid
+
+    @classmethod
+    def cache_info(cls) -> CacheInfo:
+        """
+        Return the statistics of the cache that is used by `cached`.
+
+        .. versionadded:: 26.2.0
+        """
+        return _cache_info(cls._instances)
+
+    @classmethod
+    def cache_clear(cls) -> None:
+        """
+        Remove all cached instances and reset the statistics.
+
+        .. versionadded:: 26.2.0
+        """
+        cls._instances.clear()
+
+
+@attr.s(init=False, slots=True, frozen=True)
+class DNS_ID(_CachedID):
     """
     A DNS service ID, aka hostname.
+
+    .. versionchanged:: 26.2.0
+        Instances are immutable and hashable.
     """
 
     hostname: bytes = attr.ib()
 
+    #: The left-most label of the hostname.
+    head: bytes = attr.ib(eq=False, repr=False)
+    #: Everything after the left-most label; `None` if there's only one.
+    tail: bytes | None = attr.ib(eq=False, repr=False)
+    #: Whether the left-most label is IDNA-encoded and therefore can't be
+    #: matched by wildcards.
+    has_idna_head: bool = attr.ib(eq=False, repr=False)
+
     # characters that are legal in a normalized hostname
     _RE_LEGAL_CHARS = re.compile(rb"^[a-z0-9\-_.]+$")
     pattern_class = DNSPattern
@@ -296,34 +993,44 @@ class DNS_ID:
             msg = "Invalid DNS-ID."
             raise ValueError(msg)
 
-        if any(ord(c) > 127 for c in hostname):
-            if idna:
-                ascii_id = idna.encode(hostname)
-            else:
-                msg = "idna library is required for non-ASCII IDs."
-                raise ImportError(msg)
-        else:
-            ascii_id = hostname.encode("ascii")
-
-        self.hostname = ascii_id.translate(_TRANS_TO_LOWER)
-        if self._RE_LEGAL_CHARS.match(self.hostname) is None:
+        hostname_bytes = _encode_hostname(hostname).translate(_TRANS_TO_LOWER)
+        if self._RE_LEGAL_CHARS.match(hostname_bytes) is None:
             msg = "Invalid DNS-ID."
             raise ValueError(msg)
 
+        head, tail = _split_head(hostname_bytes)
+        object.__setattr__(self, "hostname", hostname_bytes)
+        object.__setattr__(self, "head", head)
+        object.__setattr__(self, "tail", tail)
+        object.__setattr__(self, "has_idna_head", head.startswith(b"xn--"))
+
     def verify(self, pattern: CertificatePattern) -> bool:
         """
         https://tools.ietf.org/search/rfc6125#section-6.4
         """
         if isinstance(pattern, self.pattern_class):
-            return _hostname_matches(pattern.pattern, self.hostname)
+            if not pattern.is_wildcard:
+                return pattern.pattern == self.hostname
+
+            # A hostname can't contain a "*", so only a complete left-most
+            # label wildcard can match -- and not an IDNA label.
+            return (
+                self.tail is not None
+                and pattern.tail == self.tail
+                and pattern.head == b"*"
+                and not self.has_idna_head
+            )
 
         return False
 
 
-@attr.s(slots=True)
-class IPAddress_ID:
+@attr.s(slots=True, frozen=True)
+class IPAddress_ID(_CachedID):
     """
     An IP address service ID.
+
+    .. versionchanged:: 26.2.0
+        Instances are immutable and hashable.
     """
 
     ip: ipaddress.IPv4Address | ipaddress.IPv6Address = attr.ib(
@@ -343,10 +1050,13 @@ class IPAddress_ID:
         return False
 
 
-@attr.s(init=False, slots=True)
-class URI_ID:
+@attr.s(init=False, slots=True, frozen=True)
+class URI_ID(_CachedID):
     """
     An URI service ID.
+
+    .. versionchanged:: 26.2.0
+        Instances are immutable and hashable.
     """
 
     protocol: bytes = attr.ib()
@@ -367,8 +1077,10 @@ class URI_ID:
 
         prot, hostname = uri.split(":")
 
-        self.protocol = prot.encode("ascii").translate(_TRANS_TO_LOWER)
-        self.dns_id = DNS_ID(hostname.strip("/"))
+        object.__setattr__(
+            self, "protocol", prot.encode("ascii").translate(_TRANS_TO_LOWER)
+        )
+        object.__setattr__(self, "dns_id", DNS_ID.cached(hostname.strip("/")))
 
     def verify(self, pattern: CertificatePattern) -> bool:
         """
@@ -383,10 +1095,13 @@ class URI_ID:
         return False
 
 
-@attr.s(init=False, slots=True)
-class SRV_ID:
+@attr.s(init=False, slots=True, frozen=True)
+class SRV_ID(_CachedID):
     """
     An SRV service ID.
+
+    .. versionchanged:: 26.2.0
+        Instances are immutable and hashable.
     """
 
     name: bytes = attr.ib()
@@ -407,8 +1122,10 @@ class SRV_ID:
 
         name, hostname = srv.split(".", 1)
 
-        self.name = name[1:].encode("ascii").translate(_TRANS_TO_LOWER)
-        self.dns_id = DNS_ID(hostname)
+        object.__setattr__(
+            self, "name", name[1:].encode("ascii").translate(_TRANS_TO_LOWER)
+        )
+        object.__setattr__(self, "dns_id", DNS_ID.cached(hostname))
 
     def verify(self, pattern: CertificatePattern) -> bool:
         """
@@ -422,24 +1139,465 @@ class SRV_ID:
         return False
 
 
-def _hostname_matches(cert_pattern: bytes, actual_hostname: bytes) -> bool:
+@attr.s(slots=True)
+class _HostnameIndex:
     """
-    :return: `True` if *cert_pattern* matches *actual_hostname*, else `False`.
+    Positions of DNS patterns, keyed by the hostnames they can match.
+
+    Since a wildcard is only allowed as the complete left-most label, a
+    wildcard pattern is fully described by its tail.  Partial wildcards like
+    ``f*.example.com`` can never match and aren't indexed.
     """
-    if b"*" in cert_pattern:
-        if b"." not in actual_hostname:
-            return False
-        cert_head, cert_tail = cert_pattern.split(b".", 1)
-        actual_head, actual_tail = actual_hostname.split(b".", 1)
-        if cert_tail != actual_tail:
-            return False
-        # No patterns for IDNA
-        if actual_head.startswith(b"xn--"):
-            return False
 
-        return cert_head in (b"*", actual_head)
+    exact: dict[bytes, list[int]] = attr.ib(factory=dict)
+    wildcard_tails: dict[bytes, list[int]] = attr.ib(factory=dict)
+
+    def add(self, pattern: DNSPattern, pos: int) -> None:
+        if not pattern.is_wildcard:
+            self.exact.setdefault(pattern.pattern, []).append(pos)
+            return
+
+        if pattern.head == b"*" and pattern.tail is not None:
+            self.wildcard_tails.setdefault(pattern.tail, []).append(pos)
+
+    def lookup(self, dns_id: DNS_ID) -> list[int]:
+        """
+        Return the positions of all patterns that match *dns_id* using the
+        same rules as `DNS_ID.verify`.
+        """
+        rv = self.exact.get(dns_id.hostname, [])
+        if (
+            self.wildcard_tails
+            and dns_id.tail is not None
+            and not dns_id.has_idna_head
+        ):
+            wildcards = self.wildcard_tails.get(dns_id.tail)
+            if wildcards:
+                rv = sorted(rv + wildcards)
+
+        return rv
+
+
+@attr.s(slots=True)
+class CertificateIdentity:
+    r"""
+    The patterns of a certificate, compiled into hash-based lookup tables.
+
+    Build it once using :meth:`from_patterns` and then verify service IDs in
+    constant time -- independent of the number of patterns.
+
+    Results are identical to :func:`verify_service_identity`.  ``DNS_ID``\ s,
+    ``IPAddress_ID``\ s, ``URI_ID``\ s, and ``SRV_ID``\ s are looked up
+    without comparing them to each pattern.  Other service IDs fall back to a
+    linear scan.
+
+    .. versionadded:: 26.2.0
+    """
+
+    #: The patterns that this identity has been compiled from.
+    patterns: Sequence[CertificatePattern] = attr.ib()
+
+    _dns: _HostnameIndex = attr.ib(factory=_HostnameIndex, repr=False)
+    _ips: dict[ipaddress.IPv4Address | ipaddress.IPv6Address, list[int]] = (
+        attr.ib(factory=dict, repr=False)
+    )
+    _uris: dict[bytes, _HostnameIndex] = attr.ib(factory=dict, repr=False)
+    _srvs: dict[bytes, _HostnameIndex] = attr.ib(factory=dict, repr=False)
+    _pattern_classes: set[type] = attr.ib(factory=set, repr=False)
+
+    @classmethod
+    def from_patterns(
+        cls, cert_patterns: Sequence[CertificatePattern]
+    ) -> CertificateIdentity:
+        """
+        Compile *cert_patterns* as returned by the ``extract_patterns``
+        functions.
+        """
+        ci = cls(patterns=cert_patterns)
+        for pos, p in enumerate(cert_patterns):
+            ci._pattern_classes.add(type(p))
+            if isinstance(p, DNSPattern):
+                ci._dns.add(p, pos)
+            elif isinstance(p, IPAddressPattern):
+                ci._ips.setdefault(p.pattern, []).append(pos)
+            elif isinstance(p, URIPattern):
+                ci._uris.setdefault(p.protocol_pattern, _HostnameIndex()).add(
+                    p.dns_pattern, pos
+                )
+            elif isinstance(p, SRVPattern):
+                ci._srvs.setdefault(p.name_pattern, _HostnameIndex()).add(
+                    p.dns_pattern, pos
+                )
+
+        return ci
+
+    def lookup(self, service_id: ServiceID) -> list[CertificatePattern]:
+        """
+        Return all patterns that match *service_id* in certificate order.
+        """
+        if isinstance(service_id, DNS_ID):
+            positions = self._dns.lookup(service_id)
+        elif isinstance(service_id, IPAddress_ID):
+            positions = self._ips.get(service_id.ip, [])
+        elif isinstance(service_id, URI_ID):
+            idx = self._uris.get(service_id.protocol)
+            positions = idx.lookup(service_id.dns_id) if idx else []
+        elif isinstance(service_id, SRV_ID):
+            idx = self._srvs.get(service_id.name)
+            positions = idx.lookup(service_id.dns_id) if idx else []
+        else:
+            return [p for p in self.patterns if service_id.verify(p)]
+
+        return [self.patterns[pos] for pos in positions]
+
+    def matches(self, service_id: ServiceID) -> bool:
+        """
+        Return whether at least one pattern matches *service_id*.
+        """
+        return bool(self.lookup(service_id))
+
+    def contains_pattern_class(self, cl: type) -> bool:
+        """
+        Return whether at least one of the patterns is an instance of *cl*.
+        """
+        return any(issubclass(pc, cl) for pc in self._pattern_classes)
+
+    def verify(
+        self,
+        obligatory_ids: Sequence[ServiceID],
+        optional_ids: Sequence[ServiceID],
+    ) -> list[ServiceMatch]:
+        """
+        Same as :func:`verify_service_identity`, but using the compiled
+        lookup tables.
+        """
+        if not self.patterns:
+            msg = "Certificate does not contain any `subjectAltName`s."
+            raise CertificateError(msg)
+
+        errors = []
+        matches: list[ServiceMatch] = []
+        for i in obligatory_ids:
+            found = self.lookup(i)
+            if not found:
+                errors.append(i.error_on_mismatch(mismatched_id=i))
+            matches.extend(
+                ServiceMatch(service_id=i, cert_pattern=p) for p in found
+            )
+
+        for i in optional_ids:
+            found = self.lookup(i)
+            if not found and self.contains_pattern_class(i.pattern_class):
+                errors.append(i.error_on_mismatch(mismatched_id=i))
+            matches.extend(
+                ServiceMatch(service_id=i, cert_pattern=p) for p in found
+            )
+
+        if errors:
+            raise VerificationError(errors=errors)
+
+        return matches
+
+
+_H = TypeVar("_H", bound=Hashable)
+
+
+class IdentityIndex(Generic[_H]):
+    """
+    A reverse index from hostnames and IP addresses to the certificates that
+    are valid for them -- for example to pick a certificate for a TLS server
+    name.
+
+    Add the patterns of each certificate under a hashable *handle* of your
+    choice -- like a file name.  Only DNS and IP address patterns are
+    indexed.
+
+    Since a wildcard is only allowed as the complete left-most label, every
+    DNS pattern is indexed by either its hostname or its tail, and a lookup
+    is at most two dictionary lookups -- independent of the number of
+    certificates.  The rules are the same as `DNS_ID.verify`'s and
+    `IPAddress_ID.verify`'s.
+
+    .. versionadded:: 26.2.0
+    """
+
+    def __init__(self) -> None:
+        # The handles per key are insertion-ordered dicts -- used as sets --
+        # such that removing one is O(1) and lookups keep the insertion order.
+        self._exact: dict[bytes, dict[_H, None]] = {}
+        self._wildcard_tails: dict[bytes, dict[_H, None]] = {}
+        self._ips: dict[Any, dict[_H, None]] = {}
+        # The keys of each handle in _exact, _wildcard_tails, and _ips for
+        # removal.
+        self._handles: dict[_H, tuple[tuple[Any, ...], ...]] = {}
+        # Incremented on every change, such that caches can tell.
+        self._generation = 0
+        # After copy(), both indexes share the handles per key until they
+        # change them: the keys in _exact, _wildcard_tails, and _ips whose
+        # handles this index owns -- or None if it owns all of them.
+        self._owned: tuple[set[Any], set[Any], set[Any]] | None = None
+
+    def __len__(self) -> int:
+        """
+        The number of certificates in the index.
+        """
+        return len(self._handles)
+
+    def __contains__(self, handle: object) -> bool:
+        return handle in self._handles
+
+    def insert(
+        self, handle: _H, patterns: Iterable[CertificatePattern]
+    ) -> None:
+        """
+        Index the *patterns* of the certificate *handle*.
+
+        If *handle* is already in the index, its patterns are replaced.
+        """
+        if handle in self._handles:
+            self.remove(handle)
+
+        exact: dict[bytes, None] = {}
+        tails: dict[bytes, None] = {}
+        ips: dict[Any, None] = {}
+        for p in patterns:
+            if isinstance(p, IPAddressPattern):
+                ips[p.pattern] = None
+            elif not isinstance(p, DNSPattern):
+                continue
+            elif not p.is_wildcard:
+                exact[p.pattern] = None
+            elif p.head == b"*" and p.tail is not None:
+                tails[p.tail] = None
+
+        for keys, index, owned in self._indexes(exact, tails, ips):
+            for key in keys:
+                _own_handles(index, owned, key)[handle] = None
+
+        self._handles[handle] = (tuple(exact), tuple(tails), tuple(ips))
+        self._generation += 1
+
+    def remove(self, handle: _H) -> None:
+        """
+        Remove the certificate *handle* from the index.
+
+        Raises:
+            KeyError: If *handle* is not in the index.
+        """
+        for keys, index, owned in self._indexes(*self._handles.pop(handle)):
+            for key in keys:
+                handles = _own_handles(index, owned, key)
+                del handles[handle]
+                if not handles:
+                    del index[key]
+
+        self._generation += 1
+
+    def copy(self) -> IdentityIndex[_H]:
+        """
+        Return a copy that can be changed without affecting this index -- for
+        example to apply changes while others keep using this one.
+
+        Only the tables are copied: both indexes share the certificates per
+        hostname and IP address until either of them changes them.  So
+        copying is linear in the number of names but cheap, and changing
+        the copy only copies the names that it touches.
+        """
+        new: IdentityIndex[_H] = IdentityIndex()
+        new._exact = dict(self._exact)
+        new._wildcard_tails = dict(self._wildcard_tails)
+        new._ips = dict(self._ips)
+        new._handles = dict(self._handles)
+        new._generation = self._generation
+        new._owned = (set(), set(), set())
+        self._owned = (set(), set(), set())
+
+        return new
+
+    def _indexes(
+        self, exact: Iterable[Any], tails: Iterable[Any], ips: Iterable[Any]
+    ) -> tuple[
+        tuple[Iterable[Any], dict[Any, dict[_H, None]], set[Any] | None],
+        ...,
+    ]:
+        owned = self._owned or (None, None, None)
+
+        return (
+            (exact, self._exact, owned[0]),
+            (tails, self._wildcard_tails, owned[1]),
+            (ips, self._ips, owned[2]),
+        )
+
+    def lookup(self, service_id: DNS_ID | IPAddress_ID) -> list[_H]:
+        """
+        Return the certificates that are valid for *service_id* in the order
+        they have been inserted -- exact matches before wildcards.
+        """
+        if isinstance(service_id, IPAddress_ID):
+            return list(self._ips.get(service_id.ip, ()))
+
+        exact = self._exact.get(service_id.hostname, {})
+        if service_id.tail is not None and not service_id.has_idna_head:
+            wildcards = self._wildcard_tails.get(service_id.tail)
+            if wildcards:
+                if not exact:
+                    return list(wildcards)
+
+                return list(exact) + [h for h in wildcards if h not in exact]
+
+        return list(exact)
+
+    @property
+    def nbytes(self) -> int:
+        """
+        The approximate size of the index in bytes -- excluding the handles.
+        """
+        # The keys are counted once in the dictionaries below.
+        size = sys.getsizeof(self._handles) + sum(
+            sys.getsizeof(keys) + sum(map(sys.getsizeof, keys))
+            for keys in self._handles.values()
+        )
+        for index in (self._exact, self._wildcard_tails, self._ips):
+            size += sys.getsizeof(index)
+            for key, handles in index.items():
+                size += sys.getsizeof(key) + sys.getsizeof(handles)
+
+        return size
+
+
+def _own_handles(
+    index: dict[Any, dict[_H, None]], owned: set[Any] | None, key: Any
+) -> dict[_H, None]:
+    """
+    Return the handles of *key* in *index* for changing them -- copied first
+    if they're shared with another `IdentityIndex`.
+    """
+    handles = index.get(key)
+    if handles is not None and (owned is None or key in owned):
+        return handles
+
+    handles = index[key] = {} if handles is None else dict(handles)
+    if owned is not None:
+        owned.add(key)
+
+    return handles
+
+
+#: The number of server names without a certificate that an `SNISelector`
+#: remembers by default.
+SNI_NEGATIVE_CACHE_SIZE = 1024
+
+
+class SNISelector(Generic[_H]):
+    """
+    Select the certificate -- or rather its handle, like an SSL context --
+    for a TLS server name (SNI) from an `IdentityIndex`.
+
+    *index* is either the index itself or a callable that returns the
+    current one.  Pass a callable if the index is replaced rather than
+    changed in place -- for example ``lambda: directory.index`` for a
+    `service_identity.cryptography.CertificateDirectory`, whose
+    :meth:`~service_identity.cryptography.CertificateDirectory.refresh`
+    publishes a new index.  A selector that holds an index itself keeps
+    using it.
+
+    Server names that no certificate is valid for -- including invalid
+    ones -- are remembered in a bounded cache that is cleared whenever the
+    index changes or is replaced.
+
+    The helpers in :mod:`service_identity.pyopenssl` and
+    :mod:`service_identity.ssl` install it as a server name callback.
+
+    .. versionadded:: 26.2.0
+    """
+
+    def __init__(
+        self,
+        index: IdentityIndex[_H] | Callable[[], IdentityIndex[_H]],
+        *,
+        default: _H | None = None,
+        negative_cache_size: int = SNI_NEGATIVE_CACHE_SIZE,
+    ) -> None:
+        self._get_index = index if callable(index) else lambda: index
+        #: What `select` returns if no certificate is valid for a server name.
+        self.default = default
+        self._misses: LRUCache[str | bytes, bool] = LRUCache(
+            negative_cache_size
+        )
+        # The index and its generation that _misses is valid for.
+        self._index = self._get_index()
+        self._generation = self._index._generation
+
+    @property
+    def index(self) -> IdentityIndex[_H]:
+        """
+        The index that certificates are currently selected from.
+        """
+        return self._get_index()
+
+    def select(self, server_name: str | bytes | None) -> _H | None:
+        """
+        Return the first certificate that is valid for *server_name* --
+        exact matches before wildcards -- or `default`.
+
+        *server_name* can be an IP address, too, although that's not allowed
+        by :rfc:`6066`.  If it's `None` because the client didn't send one,
+        `default` is returned.
+        """
+        if server_name is None:
+            return self.default
+
+        index = self._get_index()
+        if index is not self._index or self._generation != index._generation:
+            self._index = index
+            self._generation = index._generation
+            self._misses.clear()
+        elif self._misses.get(server_name):
+            return self.default
+
+        try:
+            handles = index.lookup(_server_name_id(server_name))
+        except ValueError:
+            handles = []
+
+        if handles:
+            return handles[0]
+
+        self._misses.put(server_name, value=True)
+
+        return self.default
+
+    def negative_cache_info(self) -> CacheInfo:
+        """
+        Return the statistics of the cache of server names that no
+        certificate is valid for.
+        """
+        return _cache_info(self._misses)
+
+
+def _server_name_id(server_name: str | bytes) -> DNS_ID | IPAddress_ID:
+    """
+    Return the service ID for *server_name*.
+
+    Raises:
+        ValueError: If *server_name* is neither a hostname nor an IP address.
+    """
+    if isinstance(server_name, bytes):
+        server_name = server_name.decode("ascii")
+
+    if _is_ip_address(server_name):
+        return IPAddress_ID.cached(server_name)
+
+    return DNS_ID.cached(server_name)
+
+
+def _split_head(hostname: bytes) -> tuple[bytes, bytes | None]:
+    """
+    Split *hostname* into its left-most label and the rest.
+    """
+    head, dot, tail = hostname.partition(b".")
 
-    return cert_pattern == actual_hostname
+    return head, tail if dot else None
 
 
 def _validate_pattern(cert_pattern: bytes) -> None:
@@ -7,27 +7,42 @@ from __future__ import annotations
 import contextlib
 import warnings
 
-from typing import Sequence
+from typing import Callable, Collection, Iterable, Iterator, Sequence
 
+from .cryptography import (
+    PatternCache,
+    VerificationCache,
+    _check_selectively,
+    _verify_one,
+)
 from .cryptography import extract_patterns as _cryptography_extract_patterns
+from .cryptography import iter_patterns as _cryptography_iter_patterns
+from .cryptography import match_hostnames as _cryptography_match_hostnames
 from .hazmat import (
     DNS_ID,
     CertificatePattern,
+    IdentityIndex,
     IPAddress_ID,
-    verify_service_identity,
+    SNISelector,
+    VerificationResult,
 )
 
 
 with contextlib.suppress(ImportError):
     # We only use it for docstrings -- `if TYPE_CHECKING`` does not work.
     from OpenSSL.crypto import X509
-    from OpenSSL.SSL import Connection
+    from OpenSSL.SSL import Connection, Context
 
 
 __all__ = ["verify_hostname"]
 
 
-def verify_hostname(connection: Connection, hostname: str) -> None:
+def verify_hostname(
+    connection: Connection,
+    hostname: str,
+    *,
+    cache: VerificationCache | None = None,
+) -> None:
     r"""
     Verify whether the certificate of *connection* is valid for *hostname*.
 
@@ -36,6 +51,9 @@ def verify_hostname(connection: Connection, hostname: str) -> None:
 
         hostname: The hostname that *connection* should be connected to.
 
+        cache:
+            If passed, the result is looked up in and added to *cache*.
+
     Raises:
         service_identity.VerificationError:
             If *connection* does not provide a certificate that is valid for
@@ -50,17 +68,30 @@ def verify_hostname(connection: Connection, hostname: str) -> None:
         :exc:`~service_identity.CertificateError` is raised if the certificate
         contains no ``subjectAltName``\ s instead of
         :exc:`~service_identity.VerificationError`.
+
+    .. versionchanged:: 26.2.0
+        Added the *cache* argument.
     """
-    verify_service_identity(
-        cert_patterns=extract_patterns(
-            connection.get_peer_certificate()  # type:ignore[arg-type]
-        ),
-        obligatory_ids=[DNS_ID(hostname)],
-        optional_ids=[],
+    if cache is not None:
+        cache.verify(
+            connection.get_peer_certificate().to_cryptography(),  # type:ignore[union-attr]
+            DNS_ID,
+            hostname,
+        )
+        return
+
+    _verify_one(
+        connection.get_peer_certificate().to_cryptography(),  # type:ignore[union-attr]
+        DNS_ID.cached(hostname),
     )
 
 
-def verify_ip_address(connection: Connection, ip_address: str) -> None:
+def verify_ip_address(
+    connection: Connection,
+    ip_address: str,
+    *,
+    cache: VerificationCache | None = None,
+) -> None:
     r"""
     Verify whether the certificate of *connection* is valid for *ip_address*.
 
@@ -71,6 +102,9 @@ def verify_ip_address(connection: Connection, ip_address: str) -> None:
             The IP address that *connection* should be connected to. Can be an
             IPv4 or IPv6 address.
 
+        cache:
+            If passed, the result is looked up in and added to *cache*.
+
     Raises:
         service_identity.VerificationError:
             If *connection* does not provide a certificate that is valid for
@@ -86,30 +120,176 @@ def verify_ip_address(connection: Connection, ip_address: str) -> None:
         :exc:`~service_identity.CertificateError` is raised if the certificate
         contains no ``subjectAltName``\ s instead of
         :exc:`~service_identity.VerificationError`.
+
+    .. versionchanged:: 26.2.0
+        Added the *cache* argument.
+    """
+    if cache is not None:
+        cache.verify(
+            connection.get_peer_certificate().to_cryptography(),  # type:ignore[union-attr]
+            IPAddress_ID,
+            ip_address,
+        )
+        return
+
+    _verify_one(
+        connection.get_peer_certificate().to_cryptography(),  # type:ignore[union-attr]
+        IPAddress_ID.cached(ip_address),
+    )
+
+
+def check_hostname(
+    connection: Connection, hostname: str
+) -> VerificationResult:
+    """
+    Check whether the certificate of *connection* is valid for *hostname*
+    without raising a :exc:`~service_identity.VerificationError` if it isn't.
+
+    See :func:`service_identity.cryptography.check_certificate_hostname`.
+
+    .. versionadded:: 26.2.0
     """
-    verify_service_identity(
-        cert_patterns=extract_patterns(
-            connection.get_peer_certificate()  # type:ignore[arg-type]
-        ),
-        obligatory_ids=[IPAddress_ID(ip_address)],
+    return _check_selectively(
+        connection.get_peer_certificate().to_cryptography(),  # type:ignore[union-attr]
+        obligatory_ids=[DNS_ID.cached(hostname)],
         optional_ids=[],
     )
 
 
-def extract_patterns(cert: X509) -> Sequence[CertificatePattern]:
+def check_ip_address(
+    connection: Connection, ip_address: str
+) -> VerificationResult:
+    """
+    Check whether the certificate of *connection* is valid for *ip_address*
+    without raising a :exc:`~service_identity.VerificationError` if it isn't.
+
+    See :func:`service_identity.cryptography.check_certificate_ip_address`.
+
+    .. versionadded:: 26.2.0
+    """
+    return _check_selectively(
+        connection.get_peer_certificate().to_cryptography(),  # type:ignore[union-attr]
+        obligatory_ids=[IPAddress_ID.cached(ip_address)],
+        optional_ids=[],
+    )
+
+
+def match_hostnames(
+    connection: Connection,
+    hostnames: Iterable[str],
+    *,
+    cache: PatternCache | None = None,
+) -> list[str]:
+    """
+    Return the *hostnames* that the certificate of *connection* is valid for.
+
+    See :func:`service_identity.cryptography.match_hostnames`.
+
+    .. versionadded:: 26.2.0
+    """
+    return _cryptography_match_hostnames(
+        connection.get_peer_certificate().to_cryptography(),  # type:ignore[union-attr]
+        hostnames,
+        cache=cache,
+    )
+
+
+def set_sni_callback(
+    context: Context,
+    index: IdentityIndex[Context] | Callable[[], IdentityIndex[Context]],
+    *,
+    default: Context | None = None,
+) -> SNISelector[Context]:
+    """
+    Install a server name callback on the server *context* that switches each
+    connection to the context from *index* whose certificate is valid for
+    the server name that the client sent.
+
+    Args:
+        context: The context that the server accepts connections with.
+
+        index:
+            The contexts, each inserted with the patterns of its
+            certificate.  For example::
+
+                index.insert(ctx, extract_patterns(cert))
+
+            Or a callable that returns the current index if it's replaced
+            rather than changed in place -- see
+            `service_identity.hazmat.SNISelector`.
+
+        default:
+            The context for connections with a server name that no
+            certificate is valid for -- or without one.  If `None`, they keep
+            using *context*.
+
+    Returns:
+        The selector that the callback uses -- for example to check its
+        statistics.
+
+    .. versionadded:: 26.2.0
+    """
+    selector = SNISelector(index, default=default)
+
+    def callback(connection: Connection) -> None:
+        selected = selector.select(connection.get_servername())
+        if selected is not None:
+            connection.set_context(selected)
+
+    context.set_tlsext_servername_callback(callback)
+
+    return selector
+
+
+def extract_patterns(
+    cert: X509,
+    *,
+    cache: PatternCache | None = None,
+    pattern_classes: Collection[type[CertificatePattern]] | None = None,
+) -> Sequence[CertificatePattern]:
     """
     Extract all valid ID patterns from a certificate for service verification.
 
     Args:
         cert: The certificate to be dissected.
 
+        cache:
+            If passed, the patterns are looked up in and added to *cache*.
+
+        pattern_classes:
+            If passed, only patterns of these classes are extracted.  See
+            :func:`service_identity.cryptography.extract_patterns`.
+
     Returns:
         List of IDs.
 
     .. versionchanged:: 23.1.0
        ``commonName`` is not used as a fallback anymore.
+
+    .. versionchanged:: 26.2.0
+        Added the *cache* and *pattern_classes* arguments.
+    """
+    return _cryptography_extract_patterns(
+        cert.to_cryptography(), cache=cache, pattern_classes=pattern_classes
+    )
+
+
+def iter_patterns(
+    cert: X509,
+    *,
+    pattern_classes: Collection[type[CertificatePattern]] | None = None,
+) -> Iterator[CertificatePattern]:
     """
-    return _cryptography_extract_patterns(cert.to_cryptography())
+    Like :func:`extract_patterns`, but decode the patterns one by one while
+    iterating.
+
+    See :func:`service_identity.cryptography.iter_patterns`.
+
+    .. versionadded:: 26.2.0
+    """
+    return _cryptography_iter_patterns(
+        cert.to_cryptography(), pattern_classes=pattern_classes
+    )
 
 
 def extract_ids(cert: X509) -> Sequence[CertificatePattern]:
@@ -0,0 +1,66 @@
+"""
+Standard library :mod:`ssl`-specific code.
+"""
+
+from __future__ import annotations
+
+import ssl
+
+from typing import Callable
+
+from .hazmat import IdentityIndex, SNISelector
+
+
+__all__ = ["set_sni_callback"]
+
+
+def set_sni_callback(
+    context: ssl.SSLContext,
+    index: IdentityIndex[ssl.SSLContext]
+    | Callable[[], IdentityIndex[ssl.SSLContext]],
+    *,
+    default: ssl.SSLContext | None = None,
+) -> SNISelector[ssl.SSLContext]:
+    """
+    Set the :attr:`~ssl.SSLContext.sni_callback` of the server *context* such
+    that each connection switches to the context from *index* whose
+    certificate is valid for the server name that the client sent.
+
+    Args:
+        context: The context that the server accepts connections with.
+
+        index:
+            The contexts, each inserted with the patterns of its
+            certificate.  For example::
+
+                index.insert(ctx, extract_patterns(cert))
+
+            Or a callable that returns the current index if it's replaced
+            rather than changed in place -- see
+            `service_identity.hazmat.SNISelector`.
+
+        default:
+            The context for connections with a server name that no
+            certificate is valid for -- or without one.  If `None`, they keep
+            using *context*.
+
+    Returns:
+        The selector that the callback uses -- for example to check its
+        statistics.
+
+    .. versionadded:: 26.2.0
+    """
+    selector = SNISelector(index, default=default)
+
+    def callback(
+        ssl_object: ssl.SSLObject | ssl.SSLSocket,
+        server_name: str | None,
+        ssl_context: ssl.SSLContext,
+    ) -> None:
+        selected = selector.select(server_name)
+        if selected is not None:
+            ssl_object.context = selected
+
+    context.sni_callback = callback
+
+    return selector
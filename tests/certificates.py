@@ -1,5 +1,11 @@
+import datetime as dt
+
+from cryptography import x509
 from cryptography.hazmat.backends import default_backend
+from cryptography.hazmat.primitives import hashes, serialization
+from cryptography.hazmat.primitives.asymmetric import ec
 from cryptography.x509 import load_pem_x509_certificate
+from cryptography.x509.oid import NameOID
 
 from service_identity.cryptography import extract_patterns
 
@@ -140,3 +146,54 @@ F4B0w+r2LTELSYJ6Mh+tVleuJZ6Yw947E4iAyc/u7ck6qWRex230hnHZqgRiexP2
 4ZueMI+SnpWqL7rOgLD6VuyemZ18on2VJcgvZiVkYMfZf2330ZlRxtyU2AvKRXc3
 3HotzNMgpPpx8C2KKLKKaiIGRY0pg/WC6w==
 -----END CERTIFICATE-----"""
+
+
+_KEY = ec.generate_private_key(ec.SECP256R1())
+
+
+def make_certificate(
+    sans,
+    not_valid_after=None,
+    common_name="service-identity.invalid",
+):
+    """
+    Create a self-signed certificate with the GeneralNames *sans*.
+
+    *not_valid_after* defaults to one day in the future.
+    """
+    now = dt.datetime.now(tz=dt.timezone.utc)
+    name = x509.Name([x509.NameAttribute(NameOID.COMMON_NAME, common_name)])
+    builder = (
+        x509.CertificateBuilder()
+        .subject_name(name)
+        .issuer_name(name)
+        .public_key(_KEY.public_key())
+        .serial_number(x509.random_serial_number())
+        .not_valid_before(now - dt.timedelta(days=1))
+        .not_valid_after(not_valid_after or now + dt.timedelta(days=1))
+    )
+    if sans:
+        builder = builder.add_extension(
+            x509.SubjectAlternativeName(sans), critical=False
+        )
+
+    return builder.sign(_KEY, hashes.SHA256())
+
+
+def write_pem_files(path, cert):
+    """
+    Write *cert* from make_certificate and its private key to PEM files in
+    the directory *path* and return their paths.
+    """
+    cert_path = path / f"{cert.serial_number}.crt"
+    key_path = path / f"{cert.serial_number}.key"
+    cert_path.write_bytes(cert.public_bytes(serialization.Encoding.PEM))
+    key_path.write_bytes(
+        _KEY.private_bytes(
+            serialization.Encoding.PEM,
+            serialization.PrivateFormat.PKCS8,
+            serialization.NoEncryption(),
+        )
+    )
+
+    return str(cert_path), str(key_path)
@@ -0,0 +1,113 @@
+import pytest
+
+from service_identity._cache import LRUCache
+
+
+class TestLRUCache:
+    def test_max_entries_must_be_positive(self):
+        """
+        A cache without space is a configuration error.
+        """
+        with pytest.raises(ValueError, match="max_entries must be at least 1"):
+            LRUCache(0)
+
+    def test_hit_and_miss(self):
+        """
+        Lookups are counted.
+        """
+        c = LRUCache(2)
+        c.put("a", 1)
+
+        assert 1 == c.get("a")
+        assert None is c.get("b")
+        assert (1, 1) == (c.hits, c.misses)
+        assert "a" in c
+        assert 1 == len(c)
+
+    def test_evicts_least_recently_used(self):
+        """
+        If there are too many entries, the least recently used is evicted.
+        """
+        c = LRUCache(2)
+        c.put("a", 1)
+        c.put("b", 2)
+        c.get("a")
+        c.put("c", 3)
+
+        assert "b" not in c
+        assert "a" in c
+        assert "c" in c
+        assert 1 == c.evictions
+
+    def test_byte_budget(self):
+        """
+        Entries are evicted until the cache is within its byte budget and
+        entries that are too big on their own aren't cached at all.
+        """
+        c = LRUCache(10, max_bytes=10)
+        c.put("a", 1, size=4)
+        c.put("b", 2, size=4)
+        c.put("c", 3, size=4)
+
+        assert ["b", "c"] == list(c._data)
+        assert 8 == c.size
+
+        c.put("d", 4, size=11)
+
+        assert "d" not in c
+        assert 8 == c.size
+
+    def test_replace(self):
+        """
+        Putting an existing key replaces the value and its size.
+        """
+        c = LRUCache(10)
+        c.put("a", 1, size=4)
+        c.put("a", 2, size=2)
+
+        assert 2 == c.get("a")
+        assert 2 == c.size
+        assert 0 == c.evictions
+
+    def test_replace_too_big(self):
+        """
+        Putting a value that's too big for an existing key removes the old
+        value.
+        """
+        c = LRUCache(10, max_bytes=10)
+        c.put("a", 1, size=4)
+        c.put("a", 2, size=11)
+
+        assert "a" not in c
+        assert 0 == c.size
+
+    def test_pop(self):
+        """
+        pop removes entries if present.
+        """
+        c = LRUCache(10)
+        c.put("a", 1, size=4)
+        c.pop("a")
+        c.pop("b")
+
+        assert 0 == len(c)
+        assert 0 == c.size
+
+    def test_clear(self):
+        """
+        clear removes all entries and resets the statistics.
+        """
+        c = LRUCache(1)
+        c.put("a", 1, size=1)
+        c.put("b", 1, size=1)
+        c.get("b")
+        c.get("a")
+        c.clear()
+
+        assert (0, 0, 0, 0, 0) == (
+            len(c),
+            c.size,
+            c.hits,
+            c.misses,
+            c.evictions,
+        )
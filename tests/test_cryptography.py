@@ -1,19 +1,49 @@
+import datetime as dt
+import inspect
 import ipaddress
+import os
+import sys
+import tracemalloc
 
 import pytest
 
 from cryptography.hazmat.backends import default_backend
+from cryptography.hazmat.primitives.serialization import Encoding
 from cryptography.x509 import (
+    DirectoryName,
+    DNSName,
     ExtensionOID,
+    IPAddress,
+    Name,
+    ObjectIdentifier,
     OtherName,
+    RegisteredID,
+    RFC822Name,
     SubjectAlternativeName,
+    UniformResourceIdentifier,
     load_pem_x509_certificate,
 )
 
 from service_identity.cryptography import (
     ID_ON_DNS_SRV,
+    CertificateDirectory,
+    PatternCache,
+    RefreshResult,
+    VerificationCache,
+    _check_selectively,
+    _load_file,
+    _patterns_from_general_names,
+    _san_digest,
+    _verify_one,
+    check_certificate_hostname,
+    check_certificate_ip_address,
     extract_ids,
+    extract_pattern_table,
     extract_patterns,
+    extract_patterns_from_der,
+    iter_patterns,
+    match_hostnames,
+    subject_alt_name_digest,
     verify_certificate_hostname,
     verify_certificate_ip_address,
 )
@@ -25,11 +55,20 @@ from service_identity.exceptions import (
 )
 from service_identity.hazmat import (
     DNS_ID,
+    SRV_ID,
+    URI_ID,
+    CertificateIdentity,
     DNSPattern,
+    IdentityIndex,
     IPAddress_ID,
     IPAddressPattern,
+    PatternInterner,
+    PatternTable,
+    ServiceMatch,
     SRVPattern,
     URIPattern,
+    verify_service_identity,
+    verify_service_identity_iter,
 )
 
 from .certificates import (
@@ -37,6 +76,7 @@ from .certificates import (
     PEM_DNS_ONLY,
     PEM_EVERYTHING,
     PEM_OTHER_NAME,
+    make_certificate,
 )
 
 
@@ -47,6 +87,28 @@ X509_OTHER_NAME = load_pem_x509_certificate(PEM_OTHER_NAME, backend)
 CERT_EVERYTHING = load_pem_x509_certificate(PEM_EVERYTHING, backend)
 
 
+class FakeCertificate:
+    """
+    Only has the *san* extension, which doesn't need to be valid.
+    """
+
+    class _Extension:
+        def __init__(self, value):
+            self.value = value
+
+    class _Extensions:
+        def __init__(self, value):
+            self._value = value
+
+        def get_extension_for_oid(self, oid):
+            assert oid == ExtensionOID.SUBJECT_ALTERNATIVE_NAME
+
+            return FakeCertificate._Extension(self._value)
+
+    def __init__(self, san):
+        self.extensions = self._Extensions(san)
+
+
 class TestPublicAPI:
     def test_no_cert_patterns_hostname(self):
         """
@@ -110,6 +172,41 @@ class TestPublicAPI:
             IPAddressMismatch(mismatched_id=IPAddress_ID(ip))
         ] == ei.value.errors
 
+    def test_check_certificate_hostname(self):
+        """
+        check_certificate_hostname returns the result instead of raising.
+        """
+        assert check_certificate_hostname(X509_DNS_ONLY, "twistedmatrix.com")
+
+        rv = check_certificate_hostname(X509_DNS_ONLY, "google.com")
+
+        assert not rv
+        assert 0b1 == rv.failed_obligatory
+        assert [DNSMismatch(mismatched_id=DNS_ID("google.com"))] == rv.errors
+
+    def test_check_certificate_ip_address(self):
+        """
+        check_certificate_ip_address returns the result instead of raising.
+        """
+        assert check_certificate_ip_address(CERT_EVERYTHING, "1.1.1.1")
+
+        rv = check_certificate_ip_address(CERT_EVERYTHING, "1.1.1.2")
+
+        assert not rv
+        assert [
+            IPAddressMismatch(mismatched_id=IPAddress_ID("1.1.1.2"))
+        ] == rv.errors
+
+    def test_check_no_cert_patterns(self):
+        """
+        A certificate without subjectAltNames still raises a CertificateError.
+        """
+        with pytest.raises(
+            CertificateError,
+            match="Certificate does not contain any `subjectAltName`s",
+        ):
+            check_certificate_hostname(X509_CN_ONLY, "example.com")
+
 
 class TestExtractPatterns:
     def test_dns(self):
@@ -150,25 +247,7 @@ class TestExtractPatterns:
         """
         Malformed DER in a SRV-ID otherName raises a CertificateError.
         """
-
-        class Extension:
-            def __init__(self, value):
-                self.value = value
-
-        class Extensions:
-            def __init__(self, value):
-                self._value = value
-
-            def get_extension_for_oid(self, oid):
-                assert oid == ExtensionOID.SUBJECT_ALTERNATIVE_NAME
-
-                return Extension(self._value)
-
-        class Certificate:
-            def __init__(self, san):
-                self.extensions = Extensions(san)
-
-        cert = Certificate(
+        cert = FakeCertificate(
             SubjectAlternativeName(
                 [OtherName(ID_ON_DNS_SRV, b"\x16\x03abc\x00")]
             )
@@ -212,3 +291,1083 @@ class TestExtractPatterns:
             == w.message.args[0]
         )
         assert __file__ == w.filename
+
+
+class TestPatternCache:
+    def test_caches_patterns(self):
+        """
+        The patterns of a certificate are extracted only once.
+        """
+        cache = PatternCache()
+
+        rv1 = extract_patterns(CERT_EVERYTHING, cache=cache)
+        rv2 = extract_patterns(CERT_EVERYTHING, cache=cache)
+
+        assert rv1 is rv2
+        assert list(rv1) == extract_patterns(CERT_EVERYTHING)
+        assert (1, 1, 1) == (cache.hits, cache.misses, len(cache))
+        assert cache.size > 0
+
+    def test_interner(self):
+        """
+        If an interner is passed, equal patterns are shared.
+        """
+        pi = PatternInterner()
+        cache = PatternCache(interner=pi)
+
+        rv = cache.extract_patterns(CERT_EVERYTHING)
+
+        assert list(rv) == extract_patterns(CERT_EVERYTHING)
+        assert rv[0] is rv[2]
+        assert (1, 7) == (pi.hits, pi.misses)
+
+    def test_keyed_by_fingerprint(self):
+        """
+        Certificates are told apart by their DER encoding, not their identity.
+        """
+        cache = PatternCache()
+
+        cache.extract_patterns(X509_DNS_ONLY)
+        cache.extract_patterns(load_pem_x509_certificate(PEM_DNS_ONLY))
+        cache.extract_patterns(CERT_EVERYTHING)
+
+        assert (1, 2) == (cache.hits, cache.misses)
+
+    def test_max_entries(self):
+        """
+        The least recently used certificate is evicted.
+        """
+        cache = PatternCache(max_entries=1)
+
+        cache.extract_patterns(X509_DNS_ONLY)
+        cache.extract_patterns(CERT_EVERYTHING)
+        cache.extract_patterns(X509_DNS_ONLY)
+
+        assert (0, 3, 2) == (cache.hits, cache.misses, cache.evictions)
+
+    def test_max_bytes(self):
+        """
+        Patterns that don't fit into the budget aren't cached.
+        """
+        cache = PatternCache(max_bytes=1)
+
+        cache.extract_patterns(CERT_EVERYTHING)
+
+        assert 0 == len(cache)
+        assert 0 == cache.size
+
+    def test_subject_alt_names_key(self):
+        """
+        If keyed by subjectAltNames, renewed certificates share entries.
+        """
+        cache = PatternCache(key="subject_alt_names")
+        sans = [DNSName("example.com")]
+
+        rv1 = cache.extract_patterns(make_certificate(sans))
+        rv2 = cache.extract_patterns(make_certificate(sans))
+
+        assert rv1 is rv2
+        assert (1, 1) == (cache.hits, cache.misses)
+
+    def test_identity(self):
+        """
+        Compiled identities are cached along the patterns.
+        """
+        cache = PatternCache()
+
+        ci = cache.identity(CERT_EVERYTHING)
+        size = cache.size
+
+        assert isinstance(ci, CertificateIdentity)
+        assert cache.extract_patterns(CERT_EVERYTHING) is ci.patterns
+        assert ci is cache.identity(CERT_EVERYTHING)
+        assert size == cache.size
+        assert 1 == len(cache)
+
+    def test_identity_over_budget(self):
+        """
+        Identities that don't fit into the byte budget along with their
+        patterns are not cached and the patterns stay accounted for.
+        """
+        probe = PatternCache()
+        probe.extract_patterns(CERT_EVERYTHING)
+        size = probe.size
+        cache = PatternCache(max_bytes=size)
+
+        ci = cache.identity(CERT_EVERYTHING)
+
+        assert ci is not cache.identity(CERT_EVERYTHING)
+        assert ci.patterns is cache.extract_patterns(CERT_EVERYTHING)
+        assert size == cache.size
+
+    def test_pattern_classes(self):
+        """
+        Patterns are cached per selection of pattern classes and names of
+        other types are neither decoded nor validated.
+        """
+        cache = PatternCache()
+        cert = make_certificate(
+            [DNSName("example.com"), UniformResourceIdentifier("nocolon")]
+        )
+
+        patterns = cache.extract_patterns(cert, pattern_classes={DNSPattern})
+        ci = cache.identity(cert, pattern_classes=[DNSPattern])
+
+        assert (DNSPattern.from_bytes(b"example.com"),) == patterns
+        assert patterns is ci.patterns
+        assert (1, 1) == (cache.hits, cache.misses)
+        with pytest.raises(CertificateError, match="Invalid URI pattern"):
+            cache.extract_patterns(cert)
+
+    def test_clear(self):
+        """
+        clear empties the cache and resets the statistics.
+        """
+        cache = PatternCache()
+        cache.extract_patterns(CERT_EVERYTHING)
+        cache.extract_patterns(CERT_EVERYTHING)
+
+        cache.clear()
+
+        assert (0, 0, 0, 0) == (
+            len(cache),
+            cache.hits,
+            cache.misses,
+            cache.evictions,
+        )
+
+
+CERT_VALID = make_certificate(
+    [DNSName("example.com"), IPAddress(ipaddress.ip_address("10.0.0.1"))]
+)
+
+
+SRV_VALUE = b"\x16\x18_xmpp-client.example.net"
+CERTS_DIFFERENTIAL = [
+    X509_DNS_ONLY,
+    X509_CN_ONLY,
+    X509_OTHER_NAME,
+    CERT_EVERYTHING,
+    make_certificate([]),
+    make_certificate(
+        [
+            RFC822Name("me@example.com"),
+            OtherName(ID_ON_DNS_SRV, SRV_VALUE),
+            DNSName("*.example.com"),
+            IPAddress(ipaddress.ip_address("::1")),
+            UniformResourceIdentifier("sip:example.com"),
+            OtherName(ObjectIdentifier("1.2.3.4"), b"\x16\x01a"),
+            DirectoryName(Name([])),
+            RegisteredID(ObjectIdentifier("1.2.3.4")),
+            IPAddress(ipaddress.ip_network("10.0.0.0/8")),
+            IPAddress(ipaddress.ip_network("2001:db8::/32")),
+            DNSName("Example.COM"),
+            IPAddress(ipaddress.ip_address("10.0.0.1")),
+        ]
+    ),
+    make_certificate(
+        [DNSName(f"host{i}.example.com") for i in range(1000)]
+        + [IPAddress(ipaddress.ip_address(i)) for i in range(1000)]
+    ),
+]
+
+
+class TestExtractPatternsFromDER:
+    @pytest.mark.parametrize("cert", CERTS_DIFFERENTIAL)
+    @pytest.mark.parametrize("buffer", [bytes, bytearray, memoryview])
+    def test_same_as_extract_patterns(self, cert, buffer):
+        """
+        The same patterns in the same order as extract_patterns are returned
+        for bytes, bytearrays, and memoryviews.
+        """
+        der = buffer(cert.public_bytes(Encoding.DER))
+
+        assert extract_patterns(cert) == list(extract_patterns_from_der(der))
+
+    @pytest.mark.parametrize(
+        "sans",
+        [
+            [OtherName(ID_ON_DNS_SRV, b"\x04\x03abc")],
+            [OtherName(ID_ON_DNS_SRV, b"\x16\x02\xc3\xb8")],
+            [DNSName("*.*.example.com")],
+            [DNSName("192.168.0.1")],
+            [UniformResourceIdentifier("sip:*.example.com")],
+        ],
+    )
+    def test_same_errors_as_extract_patterns(self, sans):
+        """
+        Invalid names raise a CertificateError just like extract_patterns.
+        """
+        cert = make_certificate(sans)
+
+        with pytest.raises(CertificateError):
+            extract_patterns(cert)
+        with pytest.raises(CertificateError):
+            extract_patterns_from_der(cert.public_bytes(Encoding.DER))
+
+    @pytest.mark.parametrize(
+        "der",
+        [
+            b"",
+            b"\x04\x00",
+            b"\x30\x02\x04\x00",
+            b"\x30\x04\x30\x02\xa3\x00",
+            PEM_DNS_ONLY,
+        ],
+    )
+    def test_invalid_certificate(self, der):
+        """
+        Invalid certificate DER raises a CertificateError.
+        """
+        with pytest.raises(
+            CertificateError, match=r"Unexpected certificate content\."
+        ):
+            extract_patterns_from_der(der)
+
+    def test_no_extensions(self):
+        """
+        Certificates without extensions have no patterns.
+        """
+        assert [] == extract_patterns_from_der(b"\x30\x04\x30\x02\x02\x00")
+
+    def test_duplicate_san(self):
+        """
+        Multiple subjectAltName extensions raise a CertificateError.
+        """
+        san = b"\x30\x09\x06\x03\x55\x1d\x11\x04\x02\x30\x00"
+        exts = b"\xa3\x18\x30\x16" + san + san
+        tbs = b"\x30\x1a" + exts
+
+        with pytest.raises(CertificateError):
+            extract_patterns_from_der(b"\x30\x1c" + tbs)
+
+    @pytest.mark.parametrize(
+        "general_names",
+        [
+            b"\x04\x00",
+            b"\x30\x03\x87\x01\x01",
+            b"\x30\x0a\x87\x08\x0a\x00\x00\x00\xff\x00\xff\x00",
+            b"\x30\x04\xa0\x02\x04\x00",
+            b"\x30\x0c\xa0\x0a\x06\x08\x2b\x06\x01\x05\x05\x07\x08\x07",
+            b"\x30\x03\x82\x01\xff",
+            (
+                b"\x30\x14\xa0\x12\x06\x08\x2b\x06\x01\x05\x05\x07\x08\x07"
+                b"\xa0\x06\x16\x03abc\x00"
+            ),
+        ],
+    )
+    def test_invalid_general_names(self, general_names):
+        """
+        Invalid GeneralNames raise ValueErrors.
+        """
+        with pytest.raises(ValueError):
+            _patterns_from_general_names(general_names, 0, len(general_names))
+
+
+PATTERN_CLASSES = [
+    {DNSPattern},
+    {IPAddressPattern},
+    {URIPattern},
+    {SRVPattern},
+    {URIPattern, SRVPattern},
+    set(),
+]
+
+
+class TestPatternClasses:
+    @pytest.mark.parametrize("cert", CERTS_DIFFERENTIAL)
+    @pytest.mark.parametrize("classes", PATTERN_CLASSES)
+    def test_filters(self, cert, classes):
+        """
+        Only patterns of the passed classes are extracted -- in the same order
+        -- with or without cache and from DER.
+        """
+        expected = [
+            p for p in extract_patterns(cert) if isinstance(p, tuple(classes))
+        ]
+
+        assert expected == extract_patterns(cert, pattern_classes=classes)
+        assert expected == list(
+            extract_patterns_from_der(
+                cert.public_bytes(Encoding.DER), pattern_classes=classes
+            )
+        )
+        assert expected == list(
+            extract_patterns(
+                cert, cache=PatternCache(), pattern_classes=classes
+            )
+        )
+
+    def test_other_types_are_not_decoded(self):
+        """
+        subjectAltNames of other types are not decoded, so they can't raise
+        errors.
+        """
+        cert = FakeCertificate(
+            SubjectAlternativeName(
+                [
+                    DNSName("example.com"),
+                    OtherName(ID_ON_DNS_SRV, b"\x16\x03abc\x00"),
+                ]
+            )
+        )
+
+        assert [DNSPattern.from_bytes(b"example.com")] == extract_patterns(
+            cert, pattern_classes={DNSPattern}
+        )
+        verify_certificate_hostname(cert, "example.com")
+
+    def test_no_patterns_of_type(self):
+        """
+        If a certificate has subjectAltNames but none of the needed type, a
+        VerificationError is raised -- not the CertificateError for
+        certificates without subjectAltNames.
+        """
+        with pytest.raises(VerificationError) as ei:
+            verify_certificate_ip_address(X509_DNS_ONLY, "1.1.1.1")
+
+        assert [
+            IPAddressMismatch(mismatched_id=IPAddress_ID("1.1.1.1"))
+        ] == ei.value.errors
+
+    @pytest.mark.parametrize("cert", CERTS_DIFFERENTIAL)
+    @pytest.mark.parametrize(
+        ("obligatory_ids", "optional_ids"),
+        [
+            ([DNS_ID("example.com")], []),
+            ([IPAddress_ID("10.0.0.1")], []),
+            ([IPAddress_ID("1.1.1.1")], [SRV_ID("_xmpp-client.example.net")]),
+            ([], [URI_ID("sip:example.com"), SRV_ID("_mail.example.com")]),
+            ([DNS_ID("twistedmatrix.com")], [URI_ID("http://example.com")]),
+            ([], []),
+        ],
+    )
+    def test_check_selectively(self, cert, obligatory_ids, optional_ids):
+        """
+        _check_selectively returns the same result as
+        verify_service_identity_iter with all patterns.
+        """
+        assert _outcome(
+            verify_service_identity_iter,
+            iter_patterns(cert),
+            obligatory_ids,
+            optional_ids,
+        ) == _outcome(
+            lambda *args: _raise_for(_check_selectively(*args)),
+            cert,
+            obligatory_ids,
+            optional_ids,
+        )
+
+    @pytest.mark.parametrize("cert", CERTS_DIFFERENTIAL)
+    @pytest.mark.parametrize(
+        "sid",
+        [
+            DNS_ID("example.com"),
+            DNS_ID("www.example.com"),
+            DNS_ID("twistedmatrix.com"),
+            IPAddress_ID("10.0.0.1"),
+            IPAddress_ID("1.1.1.2"),
+            URI_ID("sip:example.com"),
+            SRV_ID("_xmpp-client.example.net"),
+            SRV_ID("_mail.example.com"),
+        ],
+    )
+    def test_verify_one(self, cert, sid):
+        """
+        _verify_one succeeds and fails like verify_service_identity with all
+        patterns.
+        """
+        assert _outcome(
+            lambda *args: verify_service_identity(*args) and None,
+            extract_patterns(cert),
+            [sid],
+            [],
+        ) == _outcome(_verify_one, cert, sid)
+
+
+def _raise_for(result):
+    """
+    Raise a VerificationError if *result* failed or return its matches.
+    """
+    if not result:
+        raise VerificationError(errors=result.errors)
+
+    return result.matches
+
+
+def _outcome(f, *args):
+    """
+    Return the result of calling *f* or the type and arguments of the error
+    that it raised.
+    """
+    try:
+        return f(*args)
+    except (CertificateError, VerificationError) as e:
+        return type(e), e.args
+
+
+class TestIterPatterns:
+    @pytest.mark.parametrize("cert", CERTS_DIFFERENTIAL)
+    @pytest.mark.parametrize("classes", [None, *PATTERN_CLASSES])
+    def test_same_as_extract_patterns(self, cert, classes):
+        """
+        The same patterns as extract_patterns are returned, but in certificate
+        order.
+        """
+        rv = list(iter_patterns(cert, pattern_classes=classes))
+
+        assert sorted(
+            extract_patterns(cert, pattern_classes=classes), key=repr
+        ) == sorted(rv, key=repr)
+
+    def test_certificate_order(self):
+        """
+        The patterns are returned in the order of the certificate.
+        """
+        cert = make_certificate(
+            [
+                IPAddress(ipaddress.ip_address("10.0.0.1")),
+                DNSName("example.com"),
+                IPAddress(ipaddress.ip_address("::1")),
+            ]
+        )
+
+        assert [
+            IPAddressPattern(ipaddress.ip_address("10.0.0.1")),
+            DNSPattern.from_bytes(b"example.com"),
+            IPAddressPattern(ipaddress.ip_address("::1")),
+        ] == list(iter_patterns(cert))
+
+    def test_lazy(self):
+        """
+        Names are only decoded while iterating and the verification stops
+        decoding once the outcome is clear.
+        """
+        cert = FakeCertificate(
+            SubjectAlternativeName(
+                [
+                    DNSName("example.com"),
+                    OtherName(ID_ON_DNS_SRV, b"\x16\x03abc\x00"),
+                ]
+            )
+        )
+        it = iter_patterns(cert)
+
+        assert DNSPattern.from_bytes(b"example.com") == next(it)
+        with pytest.raises(CertificateError):
+            next(it)
+
+        assert [
+            ServiceMatch(
+                service_id=DNS_ID("example.com"),
+                cert_pattern=DNSPattern.from_bytes(b"example.com"),
+            )
+        ] == verify_service_identity_iter(
+            iter_patterns(cert), [DNS_ID("example.com")], []
+        )
+
+
+class TestSubjectAltNameDigest:
+    def test_order_independent(self):
+        """
+        The order of the names doesn't matter.
+        """
+        a = make_certificate([DNSName("a.example.com"), DNSName("b.com")])
+        b = make_certificate([DNSName("b.com"), DNSName("a.example.com")])
+
+        assert a.fingerprint(a.signature_hash_algorithm) != b.fingerprint(
+            b.signature_hash_algorithm
+        )
+        assert subject_alt_name_digest(a) == subject_alt_name_digest(b)
+
+    def test_different_names(self):
+        """
+        Different names lead to different digests.
+        """
+        assert subject_alt_name_digest(
+            make_certificate([DNSName("a.example.com")])
+        ) != subject_alt_name_digest(
+            make_certificate([DNSName("b.example.com")])
+        )
+
+    def test_no_san(self):
+        """
+        Certificates without subjectAltNames share a digest.
+        """
+        assert subject_alt_name_digest(
+            X509_CN_ONLY
+        ) == subject_alt_name_digest(make_certificate([]))
+
+    def test_invalid(self):
+        """
+        Malformed DER raises a ValueError.
+        """
+        with pytest.raises(ValueError, match="Truncated DER"):
+            _san_digest(b"\x30\x03\x82\x05a", 0, 5)
+
+
+class TestVerificationCache:
+    def test_caches_success(self):
+        """
+        Successful verifications are cached.
+        """
+        cache = VerificationCache()
+
+        verify_certificate_hostname(CERT_VALID, "example.com", cache=cache)
+        verify_certificate_hostname(CERT_VALID, "example.com", cache=cache)
+        verify_certificate_ip_address(CERT_VALID, "10.0.0.1", cache=cache)
+
+        assert (1, 2, 2) == (cache.hits, cache.misses, len(cache))
+
+    def test_uses_cached_ids(self):
+        """
+        Misses use the shared instances of the ID classes.
+        """
+        DNS_ID.cache_clear()
+
+        verify_certificate_hostname(
+            CERT_VALID, "example.com", cache=VerificationCache()
+        )
+        verify_certificate_hostname(
+            CERT_VALID, "example.com", cache=VerificationCache()
+        )
+
+        assert (1, 1) == (
+            DNS_ID.cache_info().hits,
+            DNS_ID.cache_info().misses,
+        )
+
+    def test_caches_failure(self):
+        """
+        Failed verifications are cached and raise the same error again.
+        """
+        cache = VerificationCache()
+
+        with pytest.raises(VerificationError) as ei1:
+            verify_certificate_hostname(CERT_VALID, "example.net", cache=cache)
+        with pytest.raises(VerificationError) as ei2:
+            verify_certificate_hostname(CERT_VALID, "example.net", cache=cache)
+
+        assert ei1.value is not ei2.value
+        assert (
+            [DNSMismatch(mismatched_id=DNS_ID("example.net"))]
+            == ei1.value.errors
+            == ei2.value.errors
+        )
+        assert (1, 1) == (cache.hits, cache.misses)
+
+    def test_caches_certificate_error(self):
+        """
+        CertificateErrors are cached, too.
+        """
+        cache = VerificationCache()
+        cert = make_certificate([])
+
+        for _ in range(2):
+            with pytest.raises(
+                CertificateError,
+                match="Certificate does not contain any `subjectAltName`s",
+            ):
+                verify_certificate_ip_address(cert, "10.0.0.1", cache=cache)
+
+        assert (1, 1) == (cache.hits, cache.misses)
+
+    def test_expired_certificates_are_not_cached(self):
+        """
+        Results for expired certificates are not cached.
+        """
+        cache = VerificationCache()
+
+        verify_certificate_hostname(
+            X509_DNS_ONLY, "twistedmatrix.com", cache=cache
+        )
+
+        assert 0 == len(cache)
+
+    def test_expires_with_certificate(self, monkeypatch):
+        """
+        Entries expire at the certificate's notAfter at the latest.
+        """
+        cache = VerificationCache()
+        verify_certificate_hostname(CERT_VALID, "example.com", cache=cache)
+        expired = CERT_VALID.not_valid_after_utc + dt.timedelta(seconds=1)
+        monkeypatch.setattr(
+            "service_identity._cache.time.time",
+            expired.timestamp,
+        )
+
+        verify_certificate_hostname(CERT_VALID, "example.com", cache=cache)
+
+        assert (0, 2) == (cache.hits, cache.misses)
+
+    def test_max_age(self):
+        """
+        Entries expire after max_age seconds if set.
+        """
+        cache = VerificationCache(max_age=-1)
+
+        verify_certificate_hostname(CERT_VALID, "example.com", cache=cache)
+
+        assert 0 == len(cache)
+
+    def test_pattern_cache(self):
+        """
+        Patterns for uncached results are extracted using pattern_cache --
+        only those of the type that's verified.
+        """
+        pattern_cache = PatternCache()
+        cache = VerificationCache(pattern_cache=pattern_cache)
+
+        verify_certificate_hostname(CERT_VALID, "example.com", cache=cache)
+        verify_certificate_ip_address(CERT_VALID, "10.0.0.1", cache=cache)
+        verify_certificate_hostname(CERT_VALID, "EXAMPLE.com", cache=cache)
+
+        assert (1, 2) == (pattern_cache.hits, pattern_cache.misses)
+
+    @pytest.mark.parametrize(
+        ("names", "hostname"),
+        [
+            # Malformed names of other types are not decoded.
+            (
+                [DNSName("example.com"), UniformResourceIdentifier("nocolon")],
+                "example.com",
+            ),
+            (
+                [DNSName("example.com"), UniformResourceIdentifier("nocolon")],
+                "example.net",
+            ),
+            # Malformed names of the same type after the first match are not
+            # decoded either -- but before it, they are.
+            (
+                [DNSName("example.com"), DNSName("*.*.example.com")],
+                "example.com",
+            ),
+            (
+                [DNSName("example.com"), DNSName("*.*.example.com")],
+                "example.net",
+            ),
+            ([UniformResourceIdentifier("nocolon")], "example.com"),
+        ],
+    )
+    def test_same_outcome_as_uncached(self, names, hostname):
+        """
+        Caches don't change the outcome of a verification -- with or without
+        pattern_cache.
+        """
+        cert = make_certificate(names)
+
+        def outcome(**kw):
+            try:
+                verify_certificate_hostname(cert, hostname, **kw)
+            except (CertificateError, VerificationError) as e:
+                return type(e), str(e)
+
+            return None
+
+        expected = outcome()
+
+        assert expected == outcome(cache=VerificationCache())
+        assert expected == outcome(
+            cache=VerificationCache(pattern_cache=PatternCache())
+        )
+
+    def test_subject_alt_names_key(self):
+        """
+        If keyed by subjectAltNames, renewed certificates share results.
+        """
+        cache = VerificationCache(key="subject_alt_names")
+        sans = [DNSName("example.com")]
+
+        verify_certificate_hostname(
+            make_certificate(sans), "example.com", cache=cache
+        )
+        verify_certificate_hostname(
+            make_certificate(sans), "example.com", cache=cache
+        )
+
+        assert (1, 1) == (cache.hits, cache.misses)
+
+    def test_max_entries_and_clear(self):
+        """
+        The number of results is bounded and clear empties the cache.
+        """
+        cache = VerificationCache(max_entries=1)
+
+        verify_certificate_hostname(CERT_VALID, "example.com", cache=cache)
+        verify_certificate_ip_address(CERT_VALID, "10.0.0.1", cache=cache)
+
+        assert (1, 1) == (len(cache), cache.evictions)
+
+        cache.clear()
+
+        assert (0, 0, 0, 0) == (
+            len(cache),
+            cache.hits,
+            cache.misses,
+            cache.evictions,
+        )
+
+
+class TestExtractPatternTable:
+    @pytest.mark.parametrize("classes", [None, *PATTERN_CLASSES])
+    def test_same_as_extract_patterns(self, classes):
+        """
+        The table contains the same patterns as extract_patterns in the same
+        order.
+        """
+        pt = extract_pattern_table(CERTS_DIFFERENTIAL, pattern_classes=classes)
+
+        assert len(CERTS_DIFFERENTIAL) == pt.certificates
+        assert [
+            extract_patterns(cert, pattern_classes=classes)
+            for cert in CERTS_DIFFERENTIAL
+        ] == [pt.patterns(i) for i in range(len(CERTS_DIFFERENTIAL))]
+
+    def test_find(self):
+        """
+        Certificates can be found by service IDs.
+        """
+        pt = extract_pattern_table(CERTS_DIFFERENTIAL)
+
+        assert [5] == pt.find(URI_ID("sip:example.com"))
+        assert [2, 5] == pt.find(SRV_ID("_xmpp-client.example.net"))
+        assert [3, 5] == pt.find(IPAddress_ID("::1"))
+        assert [5, 6] == pt.find(DNS_ID("host999.example.com"))
+
+    def test_invalid_certificate(self):
+        """
+        A certificate with invalid patterns raises a CertificateError and
+        isn't added, but the ones before it are.
+        """
+        pt = PatternTable()
+        certs = [
+            X509_DNS_ONLY,
+            make_certificate([DNSName("ok.example.com"), DNSName("*.*.a")]),
+        ]
+
+        with pytest.raises(CertificateError):
+            extract_pattern_table(certs, table=pt)
+
+        assert 1 == pt.certificates
+        assert extract_patterns(X509_DNS_ONLY) == pt.patterns(0)
+        assert extract_pattern_table([X509_OTHER_NAME], table=pt) is pt
+        assert extract_patterns(X509_OTHER_NAME) == pt.patterns(1)
+
+
+HOSTNAMES = [
+    "example.com",
+    "www.example.com",
+    "foo.example.net",
+    "twistedmatrix.com",
+    "www.twistedmatrix.com",
+    "host1.example.com",
+    "Example.COM",
+    "example.org",
+    "example.com",
+]
+
+
+class TestMatchHostnames:
+    @pytest.mark.parametrize("cert", CERTS_DIFFERENTIAL)
+    @pytest.mark.parametrize("cache", [None, PatternCache()])
+    def test_same_as_verify(self, cert, cache):
+        """
+        match_hostnames returns the hostnames that verify_certificate_hostname
+        accepts in order -- or raises the same CertificateError.
+        """
+
+        def matches(hostname):
+            try:
+                verify_certificate_hostname(cert, hostname)
+            except VerificationError:
+                return False
+
+            return True
+
+        try:
+            expected = [h for h in HOSTNAMES if matches(h)]
+        except CertificateError as e:
+            with pytest.raises(CertificateError, match=str(e)):
+                match_hostnames(cert, HOSTNAMES, cache=cache)
+        else:
+            assert expected == match_hostnames(cert, HOSTNAMES, cache=cache)
+
+    @pytest.mark.parametrize("cache", [None, PatternCache()])
+    @pytest.mark.parametrize(
+        "other", ["nocolon", "sip:*.example.com"], ids=["malformed", "valid"]
+    )
+    def test_other_types_are_not_decoded(self, cache, other):
+        """
+        Only DNS names are decoded -- with or without cache -- so other types
+        can't raise errors.
+        """
+        cert = make_certificate(
+            [DNSName("example.com"), UniformResourceIdentifier(other)]
+        )
+
+        assert ["example.com"] == match_hostnames(
+            cert, ["example.com", "example.net"], cache=cache
+        )
+
+    def test_only_other_types(self):
+        """
+        Certificates with subjectAltNames of other types only don't match --
+        with or without cache.
+        """
+        cert = make_certificate([IPAddress(ipaddress.ip_address("10.0.0.1"))])
+
+        assert [] == match_hostnames(cert, ["example.com"])
+        assert [] == match_hostnames(
+            cert, ["example.com"], cache=PatternCache()
+        )
+
+    def test_invalid_hostname(self):
+        """
+        Invalid hostnames raise a ValueError.
+        """
+        with pytest.raises(ValueError, match="Invalid DNS-ID"):
+            match_hostnames(X509_DNS_ONLY, ["twistedmatrix.com", "1.1.1.1"])
+
+    def test_cache(self):
+        """
+        The compiled identity is cached.
+        """
+        cache = PatternCache()
+
+        match_hostnames(X509_DNS_ONLY, HOSTNAMES, cache=cache)
+        match_hostnames(X509_DNS_ONLY, HOSTNAMES, cache=cache)
+
+        assert (1, 1) == (cache.hits, cache.misses)
+
+
+def _write_pem(path, *names):
+    cert = make_certificate([DNSName(name) for name in names])
+    path.write_bytes(cert.public_bytes(Encoding.PEM))
+
+    return cert
+
+
+class TestCertificateDirectory:
+    def test_load(self, tmp_path):
+        """
+        The first certificate of each file with a matching suffix is loaded
+        and indexed.
+        """
+        chain = _write_pem(tmp_path / "a.pem", "a.example.com")
+        (tmp_path / "a.pem").write_bytes(
+            (tmp_path / "a.pem").read_bytes()
+            + make_certificate([DNSName("ca.example.org")]).public_bytes(
+                Encoding.PEM
+            )
+        )
+        _write_pem(tmp_path / "b.crt", "*.example.com")
+        _write_pem(tmp_path / "c.txt", "c.example.org")
+        (tmp_path / "d.pem").mkdir()
+
+        cd = CertificateDirectory(tmp_path)
+        a, b = str(tmp_path / "a.pem"), str(tmp_path / "b.crt")
+
+        assert 2 == len(cd)
+        assert extract_patterns(chain) == list(cd.patterns(a))
+        assert [a, b] == cd.lookup(DNS_ID("a.example.com"))
+        assert [] == cd.lookup(DNS_ID("ca.example.org"))
+        assert [] == cd.lookup(DNS_ID("c.example.org"))
+
+    def test_refresh(self, tmp_path):
+        """
+        Added, changed, and removed files are applied to a new index.
+        Unchanged ones aren't even read again.
+        """
+        _write_pem(tmp_path / "a.pem", "a.example.com")
+        _write_pem(tmp_path / "b.pem", "b.example.com")
+        a, b, c = (str(tmp_path / f"{n}.pem") for n in "abc")
+        cd = CertificateDirectory(tmp_path)
+        index = cd.index
+
+        assert not cd.refresh()
+        assert index is cd.index
+
+        _write_pem(tmp_path / "a.pem", "a.example.net")
+        (tmp_path / "b.pem").unlink()
+        _write_pem(tmp_path / "c.pem", "c.example.com")
+
+        rv = cd.refresh()
+
+        assert (
+            RefreshResult(added=(c,), changed=(a,), removed=(b,), errors={})
+            == rv
+        )
+        assert index is not cd.index
+        # Readers of the old index aren't affected.
+        assert [b] == index.lookup(DNS_ID("b.example.com"))
+        assert [] == cd.lookup(DNS_ID("b.example.com"))
+        assert [] == cd.lookup(DNS_ID("a.example.com"))
+        assert [a] == cd.lookup(DNS_ID("a.example.net"))
+        assert [c] == cd.lookup(DNS_ID("c.example.com"))
+
+    def test_lookup_across_removing_refresh(self, tmp_path, monkeypatch):
+        """
+        The files and the index are replaced together: the paths that a
+        lookup returns -- during a removing refresh or from an index that a
+        reader keeps across it -- have their patterns.
+        """
+        _write_pem(tmp_path / "a.pem", "a.example.com")
+        _write_pem(tmp_path / "b.pem", "b.example.com")
+        a, b = str(tmp_path / "a.pem"), str(tmp_path / "b.pem")
+        cd = CertificateDirectory(tmp_path)
+        index = cd.index
+        patterns = cd.patterns(b)
+        seen = []
+        insert = IdentityIndex.insert
+
+        def read_while_inserting(self, handle, patterns):
+            seen.extend(
+                (path, cd.patterns(path), len(cd))
+                for path in cd.lookup(DNS_ID("b.example.com"))
+            )
+            insert(self, handle, patterns)
+
+        monkeypatch.setattr(IdentityIndex, "insert", read_while_inserting)
+        (tmp_path / "b.pem").unlink()
+        _write_pem(tmp_path / "a.pem", "a.example.net")
+
+        assert (b,) == cd.refresh().removed
+        assert [(b, patterns, 2)] == seen
+        assert [b] == index.lookup(DNS_ID("b.example.com"))
+        assert [] == cd.lookup(DNS_ID("b.example.com"))
+        assert [a] == cd.lookup(DNS_ID("a.example.net"))
+        assert 1 == len(cd)
+        with pytest.raises(KeyError):
+            cd.patterns(b)
+
+    def test_errors_during_refresh(self, tmp_path, monkeypatch):
+        """
+        The errors are published together with the files and the index, so
+        readers see the ones of the last complete refresh.
+        """
+        a, b = tmp_path / "a.pem", tmp_path / "b.pem"
+        a.write_bytes(b"broken")
+        _write_pem(b, "b.example.com")
+        cd = CertificateDirectory(tmp_path)
+        seen = []
+
+        def read_while_loading(*args):
+            seen.append((sorted(cd.errors), len(cd)))
+            return _load_file(*args)
+
+        monkeypatch.setattr(
+            "service_identity.cryptography._load_file", read_while_loading
+        )
+        _write_pem(a, "a.example.com")
+        b.write_bytes(b"broken too")
+
+        cd.refresh()
+
+        assert [([str(a)], 1)] * 2 == seen
+        assert [str(b)] == list(cd.errors)
+        assert [str(a)] == cd.lookup(DNS_ID("a.example.com"))
+
+    def test_same_content(self, tmp_path):
+        """
+        If only the modification time changed, the file isn't parsed again
+        and the index stays the same.
+        """
+        path = tmp_path / "a.pem"
+        _write_pem(path, "a.example.com")
+        cd = CertificateDirectory(tmp_path)
+        index = cd.index
+        patterns = cd.patterns(str(path))
+        st = path.stat()
+        os.utime(path, ns=(st.st_atime_ns, st.st_mtime_ns + 10**9))
+
+        assert not cd.refresh()
+        assert index is cd.index
+        assert patterns is cd.patterns(str(path))
+
+    def test_errors(self, tmp_path):
+        """
+        Files that can't be loaded are reported once, removed from the index,
+        and picked up again once they're fixed.
+        """
+        path = tmp_path / "a.pem"
+        _write_pem(path, "a.example.com")
+        cd = CertificateDirectory(tmp_path)
+
+        path.write_bytes(b"-----BEGIN CERTIFICATE-----\nbroken\n")
+        rv = cd.refresh()
+
+        assert (str(path),) == rv.removed
+        assert [str(path)] == list(rv.errors)
+        assert rv.errors == cd.errors
+        assert [] == cd.lookup(DNS_ID("a.example.com"))
+        assert {} == cd.refresh().errors
+        assert [str(path)] == list(cd.errors)
+
+        _write_pem(path, "a.example.com")
+
+        assert (str(path),) == cd.refresh().added
+        assert {} == cd.errors
+
+        path.unlink()
+
+        assert (str(path),) == cd.refresh().removed
+        assert 0 == len(cd)
+        with pytest.raises(KeyError):
+            cd.patterns(str(path))
+
+
+ALLOCATIONS_CERT = make_certificate(
+    [DNSName("www.h0.example.com")]
+    + [DNSName(f"h{i}.example.com") for i in range(25)]
+    + [IPAddress(ipaddress.ip_address(0x0A000000 + i)) for i in range(25)]
+    + [UniformResourceIdentifier(f"sip:h{i}.example.com") for i in range(25)]
+)
+
+
+def _peak_allocation(func, number=20):
+    """
+    Return the highest peak of traced memory of *number* calls of *func*.
+    """
+    func()  # Warm up caches and lazy imports.
+
+    # Tracing each call separately starts every peak at zero --
+    # tracemalloc.reset_peak() needs Python 3.9.
+    peak = 0
+    for _ in range(number):
+        tracemalloc.start()
+        try:
+            func()
+            peak = max(peak, tracemalloc.get_traced_memory()[1])
+        finally:
+            tracemalloc.stop()
+
+    return peak
+
+
+@pytest.mark.skipif(
+    inspect.isfunction(sys.gettrace()) or inspect.ismethod(sys.gettrace()),
+    reason="Python-level tracers allocate on every call.",
+)
+class TestAllocations:
+    """
+    The fast paths stay within the budgets of bench/allocations.py.
+    """
+
+    def test_verify_certificate_hostname(self):
+        """
+        Verifying a hostname allocates at most 3 KiB per call.
+        """
+        assert 3072 >= _peak_allocation(
+            lambda: verify_certificate_hostname(
+                ALLOCATIONS_CERT, "www.h0.example.com"
+            )
+        )
+
+    def test_verify_certificate_ip_address(self):
+        """
+        Verifying an IP address allocates at most 1 KiB per call.
+        """
+        assert 1024 >= _peak_allocation(
+            lambda: verify_certificate_ip_address(ALLOCATIONS_CERT, "10.0.0.1")
+        )
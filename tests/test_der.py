@@ -0,0 +1,57 @@
+import pytest
+
+from service_identity._der import iter_tlvs, read_tlv
+
+
+class TestReadTLV:
+    def test_short_length(self):
+        """
+        Short-form lengths are parsed.
+        """
+        assert (0x04, 2, 5) == read_tlv(b"\x04\x03abc", 0, 5)
+
+    def test_long_length(self):
+        """
+        Long-form lengths are parsed.
+        """
+        der = b"\x04\x81\x80" + b"a" * 128
+
+        assert (0x04, 3, 131) == read_tlv(der, 0, len(der))
+
+    @pytest.mark.parametrize(
+        "der",
+        [
+            b"\x04",
+            b"\x04\x04abc",
+            b"\x1f\x01a",
+            b"\x04\x80",
+            b"\x04\x85\x00\x00\x00\x00\x01a",
+            b"\x04\x82\x01",
+        ],
+    )
+    def test_invalid(self, der):
+        """
+        Truncated and unsupported encodings raise ValueError.
+        """
+        with pytest.raises(ValueError):
+            read_tlv(der, 0, len(der))
+
+
+class TestIterTLVs:
+    def test_iterates(self):
+        """
+        All TLVs are yielded with their positions.
+        """
+        der = b"\x82\x01a\x87\x02bc"
+
+        assert [(0x82, 0, 2, 3), (0x87, 3, 5, 7)] == list(
+            iter_tlvs(der, 0, len(der))
+        )
+
+    def test_memoryview(self):
+        """
+        memoryviews work, too.
+        """
+        der = memoryview(b"\x82\x01a")
+
+        assert [(0x82, 0, 2, 3)] == list(iter_tlvs(der, 0, len(der)))
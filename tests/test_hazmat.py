@@ -1,8 +1,18 @@
+import copy
+import gc
 import ipaddress
 import pickle
+import stat
+import sys
+import threading
 
+import attr
 import pytest
 
+from hypothesis import example, given
+from hypothesis import strategies as st
+
+import service_identity._cache
 import service_identity.hazmat
 
 from service_identity.cryptography import extract_patterns
@@ -16,18 +26,28 @@ from service_identity.hazmat import (
     DNS_ID,
     SRV_ID,
     URI_ID,
+    CertificateIdentity,
     DNSPattern,
+    IdentityIndex,
     IPAddress_ID,
     IPAddressPattern,
+    MappedIdentityIndex,
+    PatternInterner,
+    PatternTable,
     ServiceMatch,
+    SNISelector,
     SRVPattern,
     URIPattern,
-    _contains_instance_of,
-    _find_matches,
-    _hostname_matches,
+    _classify_host,
     _is_ip_address,
     _validate_pattern,
+    check_service_identity,
+    encode_hostnames,
+    idna_cache_clear,
+    idna_cache_info,
     verify_service_identity,
+    verify_service_identity_iter,
+    write_identity_index,
 )
 
 from .certificates import DNS_IDS
@@ -189,18 +209,394 @@ class TestVerifyServiceIdentity:
         assert ServiceMatch(cert_pattern=p, service_id=i) == rv[1]
 
 
-class TestContainsInstance:
-    def test_positive(self):
+PATTERNS_MIXED = [
+    DNSPattern.from_bytes(b"example.com"),
+    DNSPattern.from_bytes(b"*.example.com"),
+    DNSPattern.from_bytes(b"www.example.com"),
+    DNSPattern.from_bytes(b"f*.example.net"),
+    IPAddressPattern(ipaddress.ip_address("1.1.1.1")),
+    IPAddressPattern(ipaddress.ip_address("::1")),
+    URIPattern.from_bytes(b"sip:example.com"),
+    URIPattern.from_bytes(b"xmpp:example.net"),
+    SRVPattern.from_bytes(b"_mail.example.com"),
+    SRVPattern.from_bytes(b"_xmpp.example.org"),
+]
+
+SERVICE_IDS_MIXED = [
+    DNS_ID("example.com"),
+    DNS_ID("www.example.com"),
+    DNS_ID("foo.example.com"),
+    DNS_ID("xn--gtter-jua.example.com"),
+    DNS_ID("foo.bar.example.com"),
+    DNS_ID("foo.example.net"),
+    DNS_ID("example.org"),
+    IPAddress_ID("1.1.1.1"),
+    IPAddress_ID("::1"),
+    IPAddress_ID("1.1.1.2"),
+    URI_ID("sip:example.com"),
+    URI_ID("sip:example.net"),
+    URI_ID("xmpp:example.net"),
+    SRV_ID("_mail.example.com"),
+    SRV_ID("_mail.example.org"),
+    SRV_ID("_xmpp.example.org"),
+]
+
+
+def _verify_or_errors(verify, *args):
+    """
+    Call *verify* with *args* and return either its result or the errors of
+    the raised VerificationError.
+    """
+    try:
+        return verify(*args)
+    except VerificationError as e:
+        return e.errors
+
+
+class TestCertificateIdentity:
+    def test_no_cert_patterns(self):
+        """
+        Empty cert patterns raise a helpful CertificateError.
+        """
+        ci = CertificateIdentity.from_patterns([])
+
+        with pytest.raises(
+            CertificateError,
+            match="Certificate does not contain any `subjectAltName`s",
+        ):
+            ci.verify([], [])
+
+    @pytest.mark.parametrize("sid", SERVICE_IDS_MIXED)
+    def test_lookup_is_check_service_identity(self, sid):
+        """
+        lookup returns the same patterns in the same order as the linear
+        search.
+        """
+        ci = CertificateIdentity.from_patterns(PATTERNS_MIXED)
+
+        assert [
+            m.cert_pattern
+            for m in check_service_identity(
+                PATTERNS_MIXED, [sid], [], collect="all"
+            ).matches
+        ] == ci.lookup(sid)
+        assert bool(ci.lookup(sid)) is ci.matches(sid)
+
+    @pytest.mark.parametrize("sid", SERVICE_IDS_MIXED)
+    @pytest.mark.parametrize(
+        "patterns",
+        [PATTERNS_MIXED, DNS_IDS, extract_patterns(CERT_EVERYTHING)],
+    )
+    def test_verify_is_verify_service_identity(self, patterns, sid):
+        """
+        verify returns the same matches and raises the same errors as
+        verify_service_identity -- no matter whether an ID is obligatory or
+        optional.
+        """
+        ci = CertificateIdentity.from_patterns(patterns)
+
+        for obligatory_ids, optional_ids in [
+            ([sid], []),
+            ([], [sid]),
+            ([DNS_ID("www.example.com")], [sid]),
+            ([sid], SERVICE_IDS_MIXED),
+        ]:
+            assert _verify_or_errors(
+                verify_service_identity, patterns, obligatory_ids, optional_ids
+            ) == _verify_or_errors(ci.verify, obligatory_ids, optional_ids)
+
+    def test_unknown_service_id(self):
+        """
+        Service IDs that aren't known use their verify method.
+        """
+        p = FakeCertID()
+        ci = CertificateIdentity.from_patterns([FakeCertID(), p])
+
+        assert [p] == ci.lookup(Fake_ID(p))
+        assert not ci.matches(Fake_ID(object()))
+
+    def test_contains_pattern_class(self):
+        """
+        Pattern classes are detected including subclasses.
+        """
+        ci = CertificateIdentity.from_patterns(
+            [DNSPattern.from_bytes(b"example.com")]
+        )
+
+        assert ci.contains_pattern_class(DNSPattern)
+        assert ci.contains_pattern_class(object)
+        assert not ci.contains_pattern_class(SRVPattern)
+
+
+def _first_matches(patterns, service_ids):
+    """
+    The first match of each ID in *service_ids*, sorted for comparison.
+    """
+    rv = []
+    for sid in service_ids:
+        for p in patterns:
+            if sid.verify(p):
+                rv.append(ServiceMatch(service_id=sid, cert_pattern=p))
+                break
+
+    return sorted(rv, key=repr)
+
+
+class TestVerifyServiceIdentityIter:
+    def test_no_cert_patterns(self):
+        """
+        Empty cert patterns raise a helpful CertificateError.
+        """
+        with pytest.raises(
+            CertificateError,
+            match="Certificate does not contain any `subjectAltName`s",
+        ):
+            verify_service_identity_iter(iter([]), [], [])
+
+    @pytest.mark.parametrize("sid", SERVICE_IDS_MIXED)
+    @pytest.mark.parametrize(
+        "patterns",
+        [PATTERNS_MIXED, DNS_IDS, extract_patterns(CERT_EVERYTHING)],
+    )
+    def test_same_as_verify_service_identity(self, patterns, sid):
+        """
+        The same errors as verify_service_identity are raised and the first
+        match of every ID is returned.
+        """
+        for obligatory_ids, optional_ids in [
+            ([sid], []),
+            ([], [sid]),
+            (SERVICE_IDS_MIXED, [sid]),
+            ([sid], SERVICE_IDS_MIXED),
+        ]:
+            expected = _verify_or_errors(
+                verify_service_identity, patterns, obligatory_ids, optional_ids
+            )
+            rv = _verify_or_errors(
+                verify_service_identity_iter,
+                iter(patterns),
+                obligatory_ids,
+                optional_ids,
+            )
+
+            if expected and isinstance(expected[0], ServiceMatch):
+                assert _first_matches(
+                    patterns, [*obligatory_ids, *optional_ids]
+                ) == sorted(rv, key=repr)
+            else:
+                assert expected == rv
+
+    def test_stops_early(self):
+        """
+        Once all IDs are matched, no further patterns are consumed.
+        """
+        p = DNSPattern.from_bytes(b"example.com")
+
+        def patterns():
+            yield p
+            pytest.fail("Consumed too many patterns.")
+
+        assert [
+            ServiceMatch(service_id=DNS_ID("example.com"), cert_pattern=p)
+        ] == verify_service_identity_iter(
+            patterns(), [DNS_ID("example.com")], []
+        )
+
+    def test_unmatched_optional_id_consumes_all(self):
+        """
+        As long as an optional ID is not matched, a later pattern of its type
+        could make the verification fail.
+        """
+        patterns = iter(
+            [
+                DNSPattern.from_bytes(b"example.com"),
+                SRVPattern.from_bytes(b"_xmpp.example.com"),
+            ]
+        )
+
+        with pytest.raises(VerificationError) as ei:
+            verify_service_identity_iter(
+                patterns,
+                [DNS_ID("example.com")],
+                [SRV_ID("_mail.example.com")],
+            )
+
+        assert [
+            SRVMismatch(mismatched_id=SRV_ID("_mail.example.com"))
+        ] == ei.value.errors
+        assert [] == list(patterns)
+
+
+class TestCollect:
+    @pytest.mark.parametrize("sid", SERVICE_IDS_MIXED)
+    @pytest.mark.parametrize(
+        "patterns",
+        [PATTERNS_MIXED, DNS_IDS, extract_patterns(CERT_EVERYTHING)],
+    )
+    def test_modes(self, patterns, sid):
+        """
+        "first" returns the first match of every ID, "none" no matches, and
+        both raise the same errors as the default.
+        """
+        for obligatory_ids, optional_ids in [
+            ([sid], []),
+            ([], [sid]),
+            (SERVICE_IDS_MIXED, [sid]),
+            ([sid], SERVICE_IDS_MIXED),
+        ]:
+            expected = _verify_or_errors(
+                verify_service_identity, patterns, obligatory_ids, optional_ids
+            )
+            first = _verify_or_errors(
+                lambda *args: verify_service_identity(*args, collect="first"),
+                patterns,
+                obligatory_ids,
+                optional_ids,
+            )
+            none = _verify_or_errors(
+                lambda *args: verify_service_identity(*args, collect="none"),
+                patterns,
+                obligatory_ids,
+                optional_ids,
+            )
+
+            if expected and isinstance(expected[0], ServiceMatch):
+                assert _first_matches(
+                    patterns, [*obligatory_ids, *optional_ids]
+                ) == sorted(first, key=repr)
+                assert [] == none
+            else:
+                assert expected == first == none
+
+    @pytest.mark.parametrize("collect", ["first", "none"])
+    def test_stops_at_first_match(self, collect):
+        """
+        Once an ID is matched, the remaining patterns are not looked at.
+        """
+        p1 = FakeCertID()
+        p2 = FakeCertID()
+        sid = RecordingID(p1)
+
+        verify_service_identity([p1, p2], [sid], [], collect=collect)
+
+        assert [p1] == sid.seen
+
+    def test_all_keeps_duplicates(self):
+        """
+        The default returns every match -- including several for one ID.
+        """
+        rv = verify_service_identity(
+            [
+                DNSPattern.from_bytes(b"*.example.com"),
+                DNSPattern.from_bytes(b"www.example.com"),
+            ],
+            [DNS_ID("www.example.com")],
+            [],
+        )
+
+        assert 2 == len(rv)
+
+    def test_unknown(self):
+        """
+        Unknown modes raise a ValueError.
+        """
+        with pytest.raises(ValueError, match=r"Unknown collect mode 'some'\."):
+            verify_service_identity(
+                [DNSPattern.from_bytes(b"example.com")],
+                [DNS_ID("example.com")],
+                [],
+                collect="some",
+            )
+
+
+class TestCheckServiceIdentity:
+    def test_no_cert_patterns(self):
+        """
+        Empty cert patterns raise a helpful CertificateError.
+        """
+        with pytest.raises(
+            CertificateError,
+            match="Certificate does not contain any `subjectAltName`s",
+        ):
+            check_service_identity([], [], [])
+
+    @pytest.mark.parametrize("sid", SERVICE_IDS_MIXED)
+    @pytest.mark.parametrize("collect", ["all", "first", "none"])
+    def test_same_as_verify_service_identity(self, sid, collect):
+        """
+        The result has the same matches and errors as verify_service_identity.
+        """
+        for obligatory_ids, optional_ids in [
+            ([sid], []),
+            ([], [sid]),
+            (SERVICE_IDS_MIXED, [sid]),
+            ([sid], SERVICE_IDS_MIXED),
+        ]:
+            expected = _verify_or_errors(
+                lambda *args: verify_service_identity(*args, collect=collect),
+                PATTERNS_MIXED,
+                obligatory_ids,
+                optional_ids,
+            )
+            rv = check_service_identity(
+                PATTERNS_MIXED, obligatory_ids, optional_ids, collect=collect
+            )
+
+            assert expected == (rv.matches if rv.ok else rv.errors)
+            assert rv.ok is bool(rv)
+
+    def test_bitmasks(self):
         """
-        If the list contains an object of the type, return True.
+        Failed IDs are recorded as bits at their index.  Optional IDs without
+        patterns of their type don't fail.
         """
-        assert _contains_instance_of([object(), (), object()], tuple)
+        rv = check_service_identity(
+            PATTERNS_MIXED,
+            [DNS_ID("example.com"), DNS_ID("example.org")],
+            [SRV_ID("_xmpp.example.com"), URI_ID("sip:example.com")],
+        )
+
+        assert not rv.ok
+        assert 0b10 == rv.failed_obligatory
+        assert 0b01 == rv.failed_optional
+        assert [] == rv.matches
+        assert [
+            DNSMismatch(mismatched_id=DNS_ID("example.org")),
+            SRVMismatch(mismatched_id=SRV_ID("_xmpp.example.com")),
+        ] == rv.errors
 
-    def test_negative(self):
+    def test_errors_are_lazy(self):
         """
-        If the list does not contain an object of the type, return False.
+        Mismatches are only built when the errors are accessed.
         """
-        assert not _contains_instance_of([object(), [], {}], tuple)
+        sid = Fake_ID(object())
+
+        rv = check_service_identity([FakeCertID()], [sid], [])
+
+        assert not rv
+        with pytest.raises(AttributeError, match="error_on_mismatch"):
+            rv.errors
+
+
+def _reference_hostname_matches(cert_pattern, actual_hostname):
+    """
+    The RFC 6125 matching rules, applied by splitting the labels on every
+    call -- what DNS_ID.verify does with the labels that it precomputes.
+    """
+    if b"*" in cert_pattern:
+        if b"." not in actual_hostname:
+            return False
+        cert_head, cert_tail = cert_pattern.split(b".", 1)
+        actual_head, actual_tail = actual_hostname.split(b".", 1)
+        if cert_tail != actual_tail:
+            return False
+        # No patterns for IDNA
+        if actual_head.startswith(b"xn--"):
+            return False
+
+        return cert_head in (b"*", actual_head)
+
+    return cert_pattern == actual_hostname
 
 
 class TestDNS_ID:
@@ -269,13 +665,13 @@ class TestDNS_ID:
 
     def test_simple_match(self):
         """
-        Simple integration test with _hostname_matches with a match.
+        Simple integration test with a match.
         """
         assert DNS_ID("foo.com").verify(DNSPattern.from_bytes(b"foo.com"))
 
     def test_simple_mismatch(self):
         """
-        Simple integration test with _hostname_matches with a mismatch.
+        Simple integration test with a mismatch.
         """
         assert not DNS_ID("foo.com").verify(DNSPattern.from_bytes(b"bar.com"))
 
@@ -287,7 +683,7 @@ class TestDNS_ID:
             (b"www.example.com", b"www.example.com"),
             (b"*.example.com", b"www.example.com"),
         ]:
-            assert _hostname_matches(cert, actual)
+            assert DNS_ID(actual.decode()).verify(DNSPattern.from_bytes(cert))
 
     def test_mismatches(self):
         """
@@ -305,7 +701,70 @@ class TestDNS_ID:
             (b"*oo.bar.com", b"foo.bar.com"),
             (b"fo*oo.bar.com", b"fooooo.bar.com"),
         ]:
-            assert not _hostname_matches(cert, actual)
+            assert not DNS_ID(actual.decode()).verify(
+                DNSPattern.from_bytes(cert)
+            )
+
+    def test_precomputed(self):
+        """
+        The labels are split once and don't influence equality.
+        """
+        dns_id = DNS_ID("WWW.Example.com")
+        single = DNS_ID("localhost")
+
+        assert (b"www", b"example.com", False) == (
+            dns_id.head,
+            dns_id.tail,
+            dns_id.has_idna_head,
+        )
+        assert (b"localhost", None) == (single.head, single.tail)
+        assert DNS_ID("xn--gtter-jua.example.com").has_idna_head
+        assert "DNS_ID(hostname=b'localhost')" == repr(single)
+
+    @pytest.mark.parametrize(
+        ("cert", "actual"),
+        [
+            (b"www.example.com", "www.example.com"),
+            (b"*.example.com", "www.example.com"),
+            (b"xxx.example.com", "www.example.com"),
+            (b"*.example.com", "baa.foo.example.com"),
+            (b"f*.example.com", "baa.example.com"),
+            (b"*.bar.com", "bar.com"),
+            (b"*.example.com", "xn--gtter-jua.example.com"),
+            (b"x*.example.com", "xn--gtter-jua.example.com"),
+            (b"f*.example.com", "foo.example.com"),
+            (b"*oo.bar.com", "foo.bar.com"),
+            (b"*.example.com", "localhost"),
+        ],
+    )
+    def test_verify_like_reference(self, cert, actual):
+        """
+        verify uses the same rules as the reference implementation.
+        """
+        dns_id = DNS_ID(actual)
+
+        assert _reference_hostname_matches(
+            cert, dns_id.hostname
+        ) is dns_id.verify(DNSPattern.from_bytes(cert))
+
+    @given(
+        st.lists(st.sampled_from(["*", "w*", "www", "xn--www", "a", "b"])),
+        st.lists(st.sampled_from(["www", "xn--www", "a", "b"]), min_size=1),
+    )
+    def test_verify_like_reference_generated(self, cert, actual):
+        """
+        verify agrees with the reference implementation on generated
+        hostnames and patterns.
+        """
+        dns_id = DNS_ID(".".join(actual))
+        try:
+            pattern = DNSPattern.from_bytes(".".join(cert).encode())
+        except CertificateError:
+            return
+
+        assert _reference_hostname_matches(
+            pattern.pattern, dns_id.hostname
+        ) is dns_id.verify(pattern)
 
 
 class TestURI_ID:
@@ -451,6 +910,115 @@ class TestSRV_ID:
         )
 
 
+ID_CLASSES_AND_VALUES = [
+    (DNS_ID, "example.com"),
+    (IPAddress_ID, "1.1.1.1"),
+    (URI_ID, "http://example.com/"),
+    (SRV_ID, "_mail.example.com"),
+]
+
+
+class TestCachedIDs:
+    @pytest.fixture(autouse=True)
+    def _clear(self):
+        for cl, _ in ID_CLASSES_AND_VALUES:
+            cl.cache_clear()
+
+        yield
+
+        for cl, _ in ID_CLASSES_AND_VALUES:
+            cl.cache_clear()
+
+    @pytest.mark.parametrize(("cl", "value"), ID_CLASSES_AND_VALUES)
+    def test_immutable_and_hashable(self, cl, value):
+        """
+        Service IDs are immutable and equal IDs have equal hashes.
+        """
+        sid = cl(value)
+
+        assert hash(cl(value)) == hash(sid)
+        assert {sid} == {cl(value)}
+
+        with pytest.raises(AttributeError):
+            sid.foo = 42
+
+        field = attr.fields(cl)[0].name
+        with pytest.raises(attr.exceptions.FrozenInstanceError):
+            setattr(sid, field, getattr(sid, field))
+
+    @pytest.mark.parametrize(("cl", "value"), ID_CLASSES_AND_VALUES)
+    def test_cached(self, cl, value):
+        """
+        cached returns the same instance for the same value, equal to a newly
+        created one, and keeps statistics.
+        """
+        sid = cl.cached(value)
+
+        assert sid is cl.cached(value)
+        assert cl(value) == sid
+        assert (1, 1, 0, 1, 1024) == attr.astuple(cl.cache_info())
+
+    def test_per_class(self):
+        """
+        Each class has its own cache.
+        """
+        DNS_ID.cached("example.com")
+
+        assert 1 == DNS_ID.cache_info().size
+        assert 0 == IPAddress_ID.cache_info().size
+
+    def test_inner_dns_id_cached(self):
+        """
+        URI_ID and SRV_ID share their DNS_ID.
+        """
+        uri_id = URI_ID("http://example.com/")
+        srv_id = SRV_ID("_mail.example.com")
+
+        assert uri_id.dns_id is srv_id.dns_id
+        assert uri_id.dns_id is DNS_ID.cached("example.com")
+
+    def test_bounded(self, monkeypatch):
+        """
+        The least recently used instances are evicted once the cache is full.
+        """
+        monkeypatch.setattr(
+            DNS_ID, "_instances", service_identity._cache.LRUCache(2)
+        )
+
+        a = DNS_ID.cached("a.example.com")
+        DNS_ID.cached("b.example.com")
+        DNS_ID.cached("a.example.com")
+        DNS_ID.cached("c.example.com")
+
+        info = DNS_ID.cache_info()
+
+        assert (2, 1, 2) == (info.size, info.evictions, info.max_size)
+        assert a is DNS_ID.cached("a.example.com")
+        assert DNS_ID.cached("b.example.com") is not None
+        assert 2 == DNS_ID.cache_info().evictions
+
+    def test_invalid_not_cached(self):
+        """
+        Invalid values raise every time and are not cached.
+        """
+        for _ in range(2):
+            with pytest.raises(ValueError, match=r"Invalid DNS-ID\."):
+                DNS_ID.cached("host nam")
+
+        assert 0 == DNS_ID.cache_info().size
+
+    def test_cache_clear(self):
+        """
+        cache_clear removes all instances and resets the statistics.
+        """
+        DNS_ID.cached("example.com")
+        DNS_ID.cached("example.com")
+
+        DNS_ID.cache_clear()
+
+        assert (0, 0, 0, 0) == tuple(attr.astuple(DNS_ID.cache_info())[:4])
+
+
 class TestDNSPattern:
     def test_enforces_bytes(self):
         """
@@ -488,6 +1056,25 @@ class TestDNSPattern:
         with pytest.raises(CertificateError):
             DNSPattern.from_bytes(b"*.foo.*")
 
+    @pytest.mark.parametrize(
+        ("pattern", "is_wildcard", "head", "tail"),
+        [
+            (b"www.example.com", False, b"www", b"example.com"),
+            (b"*.Example.com", True, b"*", b"example.com"),
+            (b"f*.example.com", True, b"f*", b"example.com"),
+            (b"localhost", False, b"localhost", None),
+        ],
+    )
+    def test_precomputed(self, pattern, is_wildcard, head, tail):
+        """
+        The label structure is computed once and doesn't influence equality.
+        """
+        p = DNSPattern.from_bytes(pattern)
+
+        assert (is_wildcard, head, tail) == (p.is_wildcard, p.head, p.tail)
+        assert DNSPattern(pattern=p.pattern) == p
+        assert f"DNSPattern(pattern={p.pattern!r})" == repr(p)
+
 
 class TestURIPattern:
     def test_enforces_bytes(self):
@@ -535,6 +1122,117 @@ class TestSRVPattern:
             SRVPattern.from_bytes(b"sip:*.foo.com")
 
 
+PATTERNS = [
+    DNSPattern.from_bytes(b"*.example.com"),
+    IPAddressPattern.from_bytes(b"\x01\x01\x01\x01"),
+    URIPattern.from_bytes(b"https:example.com"),
+    SRVPattern.from_bytes(b"_xmpp.example.com"),
+]
+
+
+class TestFrozenPatterns:
+    @pytest.mark.parametrize("pattern", PATTERNS)
+    def test_immutable_and_hashable(self, pattern):
+        """
+        Patterns are immutable, and equal patterns have equal hashes.
+        """
+        same = copy.deepcopy(pattern)
+
+        assert same is not pattern
+        assert {pattern} == {same}
+
+        field = attr.fields(type(pattern))[0].name
+        with pytest.raises(attr.exceptions.FrozenInstanceError):
+            setattr(pattern, field, getattr(pattern, field))
+
+    def test_pickle(self):
+        """
+        Patterns survive pickling including their precomputed fields.
+        """
+        p = pickle.loads(pickle.dumps(DNSPattern.from_bytes(b"*.example.com")))
+
+        assert (True, b"*", b"example.com") == (p.is_wildcard, p.head, p.tail)
+
+
+class TestPatternInterner:
+    def test_shares_equal_patterns(self):
+        """
+        Equal patterns are replaced by the first one and counted.
+        """
+        pi = PatternInterner()
+        first = DNSPattern.from_bytes(b"*.example.com")
+        second = DNSPattern.from_bytes(b"*.example.com")
+
+        assert first is pi.intern(first)
+        assert first is pi.intern(second)
+        assert (1, 1, 1) == (pi.hits, pi.misses, len(pi))
+
+    def test_intern_all(self):
+        """
+        intern_all interns in order.
+        """
+        pi = PatternInterner()
+        shared = pi.intern_all(PATTERNS)
+
+        rv = pi.intern_all([copy.deepcopy(p) for p in PATTERNS])
+
+        assert PATTERNS == shared == rv
+        assert all(a is b for a, b in zip(shared, rv))
+        # The SRV pattern reuses the URI pattern's DNS pattern.
+        assert shared[2].dns_pattern is shared[3].dns_pattern
+        assert (5, 5, 5) == (pi.hits, pi.misses, len(pi))
+
+    @pytest.mark.parametrize(
+        "pattern",
+        [
+            URIPattern.from_bytes(b"https:example.com"),
+            SRVPattern.from_bytes(b"_xmpp.example.com"),
+        ],
+    )
+    def test_nested_dns_patterns(self, pattern):
+        """
+        The DNS patterns within URI and SRV patterns are shared, too.
+        """
+        pi = PatternInterner()
+        dns = pi.intern(DNSPattern.from_bytes(b"example.com"))
+
+        rv = pi.intern(pattern)
+
+        assert pattern == rv
+        assert dns is rv.dns_pattern
+        assert rv is pi.intern(copy.deepcopy(pattern))
+
+    def test_weak(self):
+        """
+        Patterns are dropped once nothing else references them.
+        """
+        pi = PatternInterner()
+        pattern = pi.intern(DNSPattern.from_bytes(b"example.com"))
+
+        assert 1 == len(pi)
+
+        del pattern
+        gc.collect()
+
+        assert 0 == len(pi)
+
+    def test_classes_kept_apart(self):
+        """
+        Patterns of different classes are never conflated.
+        """
+        pi = PatternInterner()
+
+        rv = pi.intern_all(
+            [
+                DNSPattern.from_bytes(b"example.com"),
+                URIPattern.from_bytes(b"http:example.com"),
+                SRVPattern.from_bytes(b"_http.example.com"),
+            ]
+        )
+
+        assert [DNSPattern, URIPattern, SRVPattern] == [type(p) for p in rv]
+
+
 class TestValidateDNSWildcardPattern:
     def test_allows_only_one_wildcard(self):
         """
@@ -607,6 +1305,8 @@ class Fake_ID:
     An ID that accepts exactly on object as pattern.
     """
 
+    pattern_class = FakeCertID
+
     def __init__(self, pattern):
         self._pattern = pattern
 
@@ -617,59 +1317,57 @@ class Fake_ID:
         return other is self._pattern
 
 
-class TestFindMatches:
-    def test_one_match(self):
+class RecordingID(Fake_ID):
+    """
+    A Fake_ID that records the patterns that it's been verified against.
+    """
+
+    def __init__(self, pattern):
+        super().__init__(pattern)
+        self.seen = []
+
+    def verify(self, other):
+        self.seen.append(other)
+
+        return super().verify(other)
+
+
+class TestCandidates:
+    def test_only_own_class(self):
         """
-        If there's a match, return a tuple of the certificate id and the
-        service id.
+        IDs are only compared to patterns of their pattern_class.
         """
-        valid_cert_id = FakeCertID()
-        valid_id = Fake_ID(valid_cert_id)
-        rv = _find_matches(
-            [FakeCertID(), valid_cert_id, FakeCertID()], [valid_id]
+        p = FakeCertID()
+        sid = RecordingID(p)
+
+        rv = check_service_identity(
+            [DNSPattern.from_bytes(b"example.com"), p],
+            [sid],
+            [],
+            collect="all",
         )
 
-        assert [
-            ServiceMatch(cert_pattern=valid_cert_id, service_id=valid_id)
-        ] == rv
+        assert [ServiceMatch(cert_pattern=p, service_id=sid)] == rv.matches
+        assert [p] == sid.seen
 
-    def test_no_match(self):
+    def test_subclasses_keep_order(self):
         """
-        If no valid certificate ids are found, return an empty list.
+        Patterns of several subclasses of an ID's pattern_class are matched
+        in their original order.
         """
-        rv = _find_matches(
-            [FakeCertID(), FakeCertID(), FakeCertID()], [Fake_ID(object())]
-        )
 
-        assert [] == rv
+        class SubCertID1(FakeCertID):
+            pass
 
-    def test_multiple_matches(self):
-        """
-        Return all matches.
-        """
-        valid_cert_id_1 = FakeCertID()
-        valid_cert_id_2 = FakeCertID()
-        valid_cert_id_3 = FakeCertID()
-        valid_id_1 = Fake_ID(valid_cert_id_1)
-        valid_id_2 = Fake_ID(valid_cert_id_2)
-        valid_id_3 = Fake_ID(valid_cert_id_3)
-        rv = _find_matches(
-            [
-                FakeCertID(),
-                valid_cert_id_1,
-                FakeCertID(),
-                valid_cert_id_3,
-                FakeCertID(),
-                valid_cert_id_2,
-            ],
-            [valid_id_1, valid_id_2, valid_id_3],
-        )
+        class SubCertID2(FakeCertID):
+            pass
 
-        assert [
-            ServiceMatch(cert_pattern=valid_cert_id_1, service_id=valid_id_1),
-            ServiceMatch(cert_pattern=valid_cert_id_2, service_id=valid_id_2),
-            ServiceMatch(cert_pattern=valid_cert_id_3, service_id=valid_id_3),
-        ] == rv
+        patterns = [SubCertID1(), SubCertID2(), SubCertID1()]
+        sid = RecordingID(None)
+
+        check_service_identity(patterns, [sid], [])
+
+        assert patterns == sid.seen
 
 
 class TestIsIPAddress:
@@ -710,6 +1408,175 @@ class TestIsIPAddress:
         assert _is_ip_address(not_ip) is False
 
 
+def _reference_classify(pattern):
+    """
+    The original, exception-based classification.
+    """
+    if isinstance(pattern, bytes):
+        try:
+            pattern = pattern.decode("ascii")
+        except UnicodeError:
+            return "DNS"
+
+    try:
+        int(pattern)
+    except ValueError:
+        pass
+    else:
+        return "numeric"
+
+    try:
+        ip = ipaddress.ip_address(pattern.replace("*", "1"))
+    except ValueError:
+        return "DNS"
+
+    return f"IPv{ip.version}"
+
+
+IP_ALPHABET = "0123456789abcdefABCDEFgz.:*%_+- \t\x1c"
+
+
+def ip_like():
+    """
+    Text that tends to be or resemble IP addresses.
+    """
+    addresses = st.ip_addresses().flatmap(
+        lambda ip: st.sampled_from(
+            [str(ip), ip.exploded, ip.compressed.upper()]
+        )
+    )
+    return st.one_of(
+        addresses,
+        addresses.flatmap(
+            lambda ip: st.integers(0, len(ip) - 1).map(
+                lambda i: ip[:i] + "*" + ip[i + 1 :]
+            )
+        ),
+        st.tuples(addresses, st.text(IP_ALPHABET, max_size=3)).map(
+            lambda t: t[0] + t[1]
+        ),
+        st.text(IP_ALPHABET, max_size=45),
+    )
+
+
+@pytest.mark.skipif(idna is None, reason="idna not installed")
+class TestIDNACache:
+    @pytest.fixture(autouse=True)
+    def _clear(self):
+        idna_cache_clear()
+
+        yield
+
+        idna_cache_clear()
+
+    def test_cached(self):
+        """
+        Non-ASCII hostnames are IDNA-encoded once and counted.
+        """
+        assert b"xn--f-5gaa.com" == DNS_ID("f\xf8\xf8.com").hostname
+        assert b"xn--f-5gaa.com" == DNS_ID("f\xf8\xf8.com").hostname
+
+        assert (1, 1, 0, 1, 4096) == attr.astuple(idna_cache_info())
+
+    def test_ascii_bypasses_cache(self, monkeypatch):
+        """
+        ASCII hostnames don't touch idna or the cache.
+        """
+        monkeypatch.setattr(service_identity.hazmat, "idna", None)
+
+        assert [b"Foo.com"] == encode_hostnames(["Foo.com"])
+        assert 0 == idna_cache_info().misses
+
+    def test_missing_idna_despite_cache(self, monkeypatch):
+        """
+        A missing idna is reported even for cached hostnames.
+        """
+        encode_hostnames(["f\xf8\xf8.com"])
+        monkeypatch.setattr(service_identity.hazmat, "idna", None)
+
+        with pytest.raises(ImportError):
+            DNS_ID("f\xf8\xf8.com")
+
+    def test_errors_not_cached(self):
+        """
+        Invalid hostnames raise every time and aren't cached.
+        """
+        for _ in range(2):
+            with pytest.raises(idna.IDNAError):
+                encode_hostnames(["f\xf8\xf8..com"])
+
+        assert 0 == idna_cache_info().size
+
+    def test_encode_hostnames(self):
+        """
+        encode_hostnames encodes in order and duplicates only once.
+        """
+        assert [
+            b"xn--f-5gaa.com",
+            b"example.com",
+            b"xn--f-5gaa.com",
+        ] == encode_hostnames(
+            ["f\xf8\xf8.com", "example.com", "f\xf8\xf8.com"]
+        )
+        assert (0, 1) == (idna_cache_info().hits, idna_cache_info().misses)
+
+
+class TestClassifyHost:
+    @pytest.mark.parametrize(
+        ("pattern", "expected"),
+        [
+            ("example.com", "DNS"),
+            (b"*.example.com", "DNS"),
+            ("bücher.example.com", "DNS"),
+            ("www1.bücher.example.com", "DNS"),
+            ("42", "numeric"),
+            (" -4_2 ", "numeric"),
+            ("٤٢", "numeric"),
+            ("127.0.0.1", "IPv4"),
+            (b"*.0.0.1", "IPv4"),
+            ("::1", "IPv6"),
+            ("*::1", "IPv6"),
+            # ipaddress accepts scope IDs since Python 3.9.
+            (
+                "fe80::1%eth0",
+                "IPv6" if sys.version_info >= (3, 9) else "DNS",
+            ),
+            ("::ffff:1.2.3.4", "IPv6"),
+            ("01.0.0.1", "DNS"),
+            ("1::2::3", "DNS"),
+            ("", "DNS"),
+        ],
+    )
+    def test_examples(self, pattern, expected):
+        """
+        Host names, integers, IPv4, and IPv6 addresses are told apart.
+        """
+        assert expected == _classify_host(pattern)
+
+    @given(st.one_of(ip_like(), st.text()))
+    @example("fe80::1%eth0")
+    @example("::1%")
+    @example("::1%1%2")
+    @example("127.0.0.1%1")
+    def test_same_as_reference_text(self, pattern):
+        """
+        Classifies text exactly like the exception-based reference.
+        """
+        assert _reference_classify(pattern) == _classify_host(pattern)
+
+    @given(
+        st.one_of(
+            ip_like().map(lambda s: s.encode("ascii", "replace")),
+            st.binary(),
+        )
+    )
+    def test_same_as_reference_bytes(self, pattern):
+        """
+        Classifies bytes exactly like the exception-based reference.
+        """
+        assert _reference_classify(pattern) == _classify_host(pattern)
+
+
 class TestVerificationError:
     def test_repr_str(self):
         """
@@ -740,3 +1607,637 @@ class TestVerificationError:
         # Exceptions can't be compared.
         assert exc.__class__ == new_exc.__class__
         assert exc.__dict__ == new_exc.__dict__
+
+
+class DelegatingID:
+    """
+    An ID that isn't a known service ID class, but verifies like *sid*.
+    """
+
+    def __init__(self, sid):
+        self._sid = sid
+
+    def verify(self, pattern):
+        return self._sid.verify(pattern)
+
+
+class TestPatternTable:
+    def test_patterns(self):
+        """
+        The patterns of each certificate are materialized in order.
+        """
+        pt = PatternTable()
+
+        assert 0 == pt.add_certificate(PATTERNS_MIXED)
+        assert 1 == pt.add_certificate([])
+        assert 2 == pt.add_certificate(PATTERNS)
+
+        assert PATTERNS_MIXED == pt.patterns(0)
+        assert [] == pt.patterns(1)
+        assert PATTERNS == pt.patterns(2)
+        assert (len(PATTERNS_MIXED) + len(PATTERNS), 3) == (
+            len(pt),
+            pt.certificates,
+        )
+
+    @pytest.mark.parametrize("sid", SERVICE_IDS_MIXED)
+    def test_find_same_as_verify(self, sid):
+        """
+        find returns the certificates that have a pattern that the service
+        ID verifies -- whether it's searched for directly or not.
+        """
+        pt = PatternTable()
+        for p in PATTERNS_MIXED:
+            pt.add_certificate([p])
+
+        expected = [i for i, p in enumerate(PATTERNS_MIXED) if sid.verify(p)]
+
+        assert expected == pt.find(sid)
+        assert expected == pt.find(DelegatingID(sid))
+
+    @pytest.mark.parametrize(
+        ("pattern", "sid"),
+        [
+            (DNSPattern.from_bytes(b"www.example.com"), DNS_ID("example.com")),
+            (DNSPattern.from_bytes(b"example.com"), DNS_ID("example.co")),
+            (URIPattern.from_bytes(b"sip:example.com"), DNS_ID("example.com")),
+            (
+                SRVPattern.from_bytes(b"_sip.example.com"),
+                DNS_ID("example.com"),
+            ),
+            (
+                IPAddressPattern(ipaddress.ip_address("10.1.1.1")),
+                IPAddress_ID("1.1.1.1"),
+            ),
+        ],
+    )
+    def test_find_whole_values_only(self, pattern, sid):
+        """
+        Values that merely contain the searched one don't match.
+        """
+        pt = PatternTable()
+        pt.add_certificate([pattern])
+
+        assert [] == pt.find(sid)
+
+    def test_verify(self):
+        """
+        verify uses the patterns of the certificate.
+        """
+        pt = PatternTable()
+        pt.add_certificate(PATTERNS_MIXED)
+
+        assert verify_service_identity(
+            PATTERNS_MIXED, [DNS_ID("www.example.com")], []
+        ) == pt.verify(0, [DNS_ID("www.example.com")], [])
+
+        with pytest.raises(VerificationError):
+            pt.verify(0, [DNS_ID("example.org")], [])
+
+    def test_remove_and_compact(self):
+        """
+        Removed certificates aren't found anymore and compact frees their
+        space while the indexes of the others stay the same.
+        """
+        pt = PatternTable()
+        for p in PATTERNS_MIXED:
+            pt.add_certificate([p, p])
+        pt.add_certificate(PATTERNS_MIXED)
+
+        pt.remove(0)
+        pt.remove(4)
+        nbytes = pt.nbytes
+
+        assert [1, 2, 10] == pt.find(DNS_ID("www.example.com"))
+        assert [1, 10] == pt.find(DNS_ID("foo.example.com"))
+        assert [10] == pt.find(IPAddress_ID("1.1.1.1"))
+
+        assert 0 < pt.compact()
+        assert nbytes > pt.nbytes
+        assert (len(PATTERNS_MIXED) * 3 - 4, 9) == (len(pt), pt.certificates)
+        assert [1, 2, 10] == pt.find(DNS_ID("www.example.com"))
+        assert [PATTERNS_MIXED[2]] * 2 == pt.patterns(2)
+        assert PATTERNS_MIXED == pt.patterns(10)
+
+        # Removed certificates don't come back.
+        assert 11 == pt.add_certificate(PATTERNS)
+
+    def test_find_after_growth_and_compaction(self):
+        """
+        find stays the same as verifying every pattern while the hash table
+        grows, certificates are removed, and the table is compacted.
+        """
+        pt = PatternTable()
+        certs = {}
+        for i in range(300):
+            patterns = [
+                DNSPattern.from_bytes(b"*.example.com"),
+                DNSPattern.from_bytes(f"h{i % 50}.example.net".encode()),
+            ]
+            certs[pt.add_certificate(patterns)] = patterns
+        sids = [
+            DNS_ID("www.example.com"),
+            DNS_ID("h7.example.net"),
+            DNS_ID("h50.example.net"),
+        ]
+
+        def expected(sid):
+            return [
+                i
+                for i, patterns in certs.items()
+                if any(sid.verify(p) for p in patterns)
+            ]
+
+        for i in range(0, 300, 3):
+            pt.remove(i)
+            del certs[i]
+
+        for sid in sids:
+            assert expected(sid) == pt.find(sid)
+
+        pt.compact()
+        certs[pt.add_certificate(PATTERNS_MIXED)] = PATTERNS_MIXED
+
+        for sid in sids:
+            assert expected(sid) == pt.find(sid)
+
+    def test_kinds_are_separate(self):
+        """
+        Values of different kinds with the same bytes don't match each
+        other.
+        """
+        pt = PatternTable()
+        pt.add_certificate([DNSPattern.from_bytes(b"a.bc")])
+        pt.add_certificate([IPAddressPattern(ipaddress.ip_address(b"a.bc"))])
+
+        assert [0] == pt.find(DNS_ID("a.bc"))
+        assert [1] == pt.find(IPAddress_ID("97.46.98.99"))
+
+    @pytest.mark.parametrize("cert_index", [-1, 1, 2])
+    def test_unknown_certificate(self, cert_index):
+        """
+        Unknown and removed certificates raise a KeyError.
+        """
+        pt = PatternTable()
+        pt.add_certificate(PATTERNS)
+        pt.add_certificate(PATTERNS)
+        pt.remove(1)
+
+        with pytest.raises(KeyError):
+            pt.patterns(cert_index)
+        with pytest.raises(KeyError):
+            pt.remove(cert_index)
+
+    def test_ip_networks(self):
+        """
+        IP networks survive the table, but never match addresses.
+        """
+        network = IPAddressPattern(ipaddress.ip_network("10.0.0.0/8"))
+        pt = PatternTable()
+        pt.add_certificate([network])
+
+        assert [network] == pt.patterns(0)
+        assert [] == pt.find(IPAddress_ID("10.0.0.0"))
+
+
+INDEXED_CERTS = {
+    "mixed": PATTERNS_MIXED,
+    "wildcard": [DNSPattern.from_bytes(b"*.example.com")],
+    "exact": [
+        DNSPattern.from_bytes(b"www.example.com"),
+        DNSPattern.from_bytes(b"www.example.com"),
+    ],
+    "partial": [DNSPattern.from_bytes(b"f*.example.com")],
+    "idna": [DNSPattern.from_bytes(b"xn--gtter-jua.example.com")],
+    "uri-only": [URIPattern.from_bytes(b"sip:example.com")],
+    "empty": [],
+}
+
+
+class TestIdentityIndex:
+    @pytest.mark.parametrize("sid", SERVICE_IDS_MIXED[:7])
+    def test_same_as_verify(self, sid):
+        """
+        lookup returns each certificate that has a DNS pattern that
+        DNS_ID.verify accepts once.
+        """
+        ii = IdentityIndex()
+        for handle, patterns in INDEXED_CERTS.items():
+            ii.insert(handle, patterns)
+
+        expected = {
+            handle
+            for handle, patterns in INDEXED_CERTS.items()
+            if any(
+                sid.verify(p) for p in patterns if isinstance(p, DNSPattern)
+            )
+        }
+
+        rv = ii.lookup(sid)
+
+        assert expected == set(rv)
+        assert len(expected) == len(rv)
+
+    def test_exact_matches_first(self):
+        """
+        Exact matches are returned before wildcard matches.
+        """
+        ii = IdentityIndex()
+        ii.insert("wildcard", [DNSPattern.from_bytes(b"*.example.com")])
+        ii.insert("exact", [DNSPattern.from_bytes(b"www.example.com")])
+        ii.insert(
+            "both",
+            [
+                DNSPattern.from_bytes(b"*.example.com"),
+                DNSPattern.from_bytes(b"www.example.com"),
+            ],
+        )
+
+        assert ["exact", "both", "wildcard"] == ii.lookup(
+            DNS_ID("www.example.com")
+        )
+        assert ["wildcard", "both"] == ii.lookup(DNS_ID("foo.example.com"))
+
+    def test_insert_replaces_and_remove(self):
+        """
+        Inserting a handle again replaces its patterns, removing it drops
+        them, and the memory use follows.
+        """
+        ii = IdentityIndex()
+        empty = ii.nbytes
+        ii.insert(1, [DNSPattern.from_bytes(b"example.com")])
+        ii.insert(1, [DNSPattern.from_bytes(b"example.net")])
+
+        assert 1 in ii
+        assert 1 == len(ii)
+        assert [] == ii.lookup(DNS_ID("example.com"))
+        assert [1] == ii.lookup(DNS_ID("example.net"))
+        assert empty < ii.nbytes
+
+        nbytes = ii.nbytes
+        ii.remove(1)
+
+        assert 1 not in ii
+        assert 0 == len(ii)
+        assert [] == ii.lookup(DNS_ID("example.net"))
+        assert nbytes > ii.nbytes
+
+        with pytest.raises(KeyError):
+            ii.remove(1)
+
+    def test_remove_keeps_order(self):
+        """
+        Removing a handle that shares a name with others keeps the insertion
+        order of the remaining ones.
+        """
+        ii = IdentityIndex()
+        for handle in range(5):
+            ii.insert(handle, [DNSPattern.from_bytes(b"example.com")])
+
+        ii.remove(2)
+        ii.remove(0)
+
+        assert [1, 3, 4] == ii.lookup(DNS_ID("example.com"))
+
+    def test_lookup_returns_copies(self):
+        """
+        Changing the result of a lookup doesn't change the index.
+        """
+        ii = IdentityIndex()
+        ii.insert("exact", [DNSPattern.from_bytes(b"example.com")])
+
+        ii.lookup(DNS_ID("example.com")).append("bogus")
+
+        assert ["exact"] == ii.lookup(DNS_ID("example.com"))
+
+    def test_ip_addresses(self):
+        """
+        IP address patterns are indexed, too.
+        """
+        ii = IdentityIndex()
+        for handle, patterns in INDEXED_CERTS.items():
+            ii.insert(handle, patterns)
+
+        assert ["mixed"] == ii.lookup(IPAddress_ID("::1"))
+        assert [] == ii.lookup(IPAddress_ID("1.1.1.2"))
+
+        ii.remove("mixed")
+
+        assert [] == ii.lookup(IPAddress_ID("::1"))
+
+    def test_copy(self):
+        """
+        Changing a copy doesn't change the original.
+        """
+        ii = IdentityIndex()
+        ii.insert("a", [DNSPattern.from_bytes(b"*.example.com")])
+        ii.insert("b", [DNSPattern.from_bytes(b"*.example.com")])
+
+        copy = ii.copy()
+        copy.remove("a")
+        copy.insert("c", [IPAddressPattern(ipaddress.ip_address("::1"))])
+
+        assert ["a", "b"] == ii.lookup(DNS_ID("www.example.com"))
+        assert [] == ii.lookup(IPAddress_ID("::1"))
+        assert ["b"] == copy.lookup(DNS_ID("www.example.com"))
+        assert ["c"] == copy.lookup(IPAddress_ID("::1"))
+
+    def test_copy_original_changes(self):
+        """
+        Changing the original after copying it doesn't change the copy --
+        also for names that neither has changed before.
+        """
+        ii = IdentityIndex()
+        ii.insert("a", [DNSPattern.from_bytes(b"*.example.com")])
+        ii.insert("b", [DNSPattern.from_bytes(b"www.example.com")])
+        copy = ii.copy()
+        copy.insert("c", [DNSPattern.from_bytes(b"*.example.com")])
+
+        ii.remove("b")
+        ii.insert("d", [DNSPattern.from_bytes(b"*.example.com")])
+        copy2 = copy.copy()
+        copy.remove("a")
+
+        assert ["a", "d"] == ii.lookup(DNS_ID("www.example.com"))
+        assert ["c"] == copy.lookup(DNS_ID("foo.example.com"))
+        assert ["b", "a", "c"] == copy2.lookup(DNS_ID("www.example.com"))
+
+
+class TestSNISelector:
+    def test_select(self):
+        """
+        The first certificate that is valid for the server name is selected
+        or the default.
+        """
+        ii = IdentityIndex()
+        ii.insert("wildcard", [DNSPattern.from_bytes(b"*.example.com")])
+        ii.insert("exact", [DNSPattern.from_bytes(b"www.example.com")])
+        ii.insert("ip", [IPAddressPattern(ipaddress.ip_address("::1"))])
+        sel = SNISelector(ii, default="default")
+
+        assert "exact" == sel.select("www.example.com")
+        assert "wildcard" == sel.select(b"foo.example.com")
+        assert "ip" == sel.select("::1")
+        assert "default" == sel.select("example.com")
+        assert "default" == sel.select(None)
+        assert None is SNISelector(ii).select("example.com")
+
+    @pytest.mark.parametrize(
+        "server_name", ["", "1.2.3", "exa mple.com", b"b\xc3\xbccher.de"]
+    )
+    def test_invalid(self, server_name):
+        """
+        Invalid server names get the default.
+        """
+        sel = SNISelector(IdentityIndex(), default="default")
+
+        assert "default" == sel.select(server_name)
+
+    def test_negative_cache(self):
+        """
+        Server names without a certificate are cached until the index
+        changes.
+        """
+        ii = IdentityIndex()
+        sel = SNISelector(ii, negative_cache_size=1)
+
+        assert None is sel.select("example.com")
+        assert None is sel.select("example.com")
+        assert (1, 1, 1) == (
+            sel.negative_cache_info().hits,
+            sel.negative_cache_info().misses,
+            sel.negative_cache_info().size,
+        )
+
+        ii.insert("cert", [DNSPattern.from_bytes(b"example.com")])
+
+        assert "cert" == sel.select("example.com")
+        assert 0 == sel.negative_cache_info().size
+
+    def test_index_callable(self):
+        """
+        If index is a callable, the index it returns when selecting is used,
+        and replacing it clears the negative cache -- even if the new index
+        has the same generation.
+        """
+        old = IdentityIndex()
+        old.insert("old", [DNSPattern.from_bytes(b"example.com")])
+        new = IdentityIndex()
+        new.insert("new", [DNSPattern.from_bytes(b"example.net")])
+        current = [old]
+        sel = SNISelector(lambda: current[0])
+
+        assert None is sel.select("example.net")
+        assert 1 == sel.negative_cache_info().size
+        assert old is sel.index
+
+        current[0] = new
+
+        assert new is sel.index
+        assert "new" == sel.select("example.net")
+        assert None is sel.select("example.com")
+
+
+@pytest.fixture(name="index_path")
+def _index_path(tmp_path):
+    path = tmp_path / "certs.sidx"
+    write_identity_index(path, INDEXED_CERTS.items())
+
+    return path
+
+
+class TestMappedIdentityIndex:
+    @pytest.mark.parametrize("sid", SERVICE_IDS_MIXED)
+    def test_lookup_same_as_verify(self, index_path, sid):
+        """
+        lookup returns the certificates that have a pattern that the service
+        ID verifies once -- whether it's looked up directly or not.
+        """
+        expected = {
+            name
+            for name, patterns in INDEXED_CERTS.items()
+            if any(sid.verify(p) for p in patterns)
+        }
+
+        with MappedIdentityIndex(index_path) as mii:
+            rv = mii.lookup(sid)
+
+            assert expected == set(rv)
+            assert len(expected) == len(rv)
+            assert expected == set(mii.lookup(DelegatingID(sid)))
+
+    def test_same_as_identity_index(self, index_path):
+        """
+        DNS and IP address lookups return the same as IdentityIndex, in the
+        same order.
+        """
+        ii = IdentityIndex()
+        for handle, patterns in INDEXED_CERTS.items():
+            ii.insert(handle, patterns)
+
+        with MappedIdentityIndex(index_path) as mii:
+            for sid in SERVICE_IDS_MIXED[:10]:
+                assert ii.lookup(sid) == mii.lookup(sid)
+
+    def test_exact_matches_first(self, tmp_path):
+        """
+        Exact matches are returned before wildcard matches.
+        """
+        path = tmp_path / "certs.sidx"
+        write_identity_index(
+            path,
+            [
+                ("wildcard", [DNSPattern.from_bytes(b"*.example.com")]),
+                ("exact", [DNSPattern.from_bytes(b"www.example.com")]),
+            ],
+        )
+
+        with MappedIdentityIndex(path) as mii:
+            assert ["exact", "wildcard"] == mii.lookup(
+                DNS_ID("www.example.com")
+            )
+
+    def test_patterns(self, tmp_path, index_path):
+        """
+        The patterns of each certificate survive the file in order --
+        including duplicates and IP networks.
+        """
+        network = IPAddressPattern(ipaddress.ip_network("10.0.0.0/8"))
+        path = tmp_path / "network.sidx"
+        write_identity_index(path, [("network", [network])])
+
+        with MappedIdentityIndex(index_path) as mii:
+            assert len(INDEXED_CERTS) == len(mii)
+            for name, patterns in INDEXED_CERTS.items():
+                assert patterns == mii.patterns(name)
+
+            with pytest.raises(KeyError):
+                mii.patterns("nope")
+
+        with MappedIdentityIndex(path) as mii:
+            assert [network] == mii.patterns("network")
+            assert [] == mii.lookup(IPAddress_ID("10.0.0.0"))
+
+    def test_empty(self, tmp_path):
+        """
+        An index without certificates can be written and opened.
+        """
+        path = tmp_path / "empty.sidx"
+        write_identity_index(path, [])
+
+        with MappedIdentityIndex(path) as mii:
+            assert 0 == len(mii)
+            assert [] == mii.lookup(DNS_ID("example.com"))
+            assert mii.nbytes == path.stat().st_size
+
+    def test_duplicate_name(self, tmp_path):
+        """
+        Names must be unique and nothing is written if they aren't.
+        """
+        path = tmp_path / "certs.sidx"
+
+        with pytest.raises(ValueError, match="Duplicate certificate name"):
+            write_identity_index(path, [("a", []), ("a", [])])
+
+        assert [] == list(tmp_path.iterdir())
+
+    def test_concurrent_writers(self, tmp_path):
+        """
+        Writers in several threads don't clobber each other's temporary
+        files, the result is always a complete index, and no temporary files
+        are left behind.
+        """
+        path = tmp_path / "certs.sidx"
+        names = [f"t{i}" for i in range(4)]
+        errors = []
+
+        def write(name):
+            try:
+                for _ in range(20):
+                    write_identity_index(path, [(name, PATTERNS_MIXED)])
+            except Exception as e:  # noqa: BLE001
+                errors.append(e)
+
+        threads = [threading.Thread(target=write, args=(n,)) for n in names]
+        for t in threads:
+            t.start()
+        for t in threads:
+            t.join()
+
+        assert [] == errors
+        with MappedIdentityIndex(path) as mii:
+            (name,) = mii.lookup(DNS_ID("example.com"))
+
+            assert name in names
+            assert PATTERNS_MIXED == mii.patterns(name)
+        assert [path] == list(tmp_path.iterdir())
+
+    @pytest.mark.skipif(
+        sys.platform == "win32", reason="POSIX permissions only."
+    )
+    def test_keeps_permissions(self, index_path):
+        """
+        Rewriting an index keeps its permissions.
+        """
+        index_path.chmod(0o640)
+
+        write_identity_index(index_path, [])
+
+        assert 0o640 == stat.S_IMODE(index_path.stat().st_mode)
+
+    def test_replace_while_open(self, index_path):
+        """
+        Writing the index again doesn't disturb processes that have the old
+        one open.
+        """
+        with MappedIdentityIndex(index_path) as mii:
+            write_identity_index(index_path, [])
+
+            assert ["mixed"] == mii.lookup(IPAddress_ID("::1"))
+
+        with MappedIdentityIndex(index_path) as mii:
+            assert 0 == len(mii)
+
+    @pytest.mark.parametrize("data", [b"", b"SIDX", b"nope" * 20])
+    def test_not_an_index(self, tmp_path, data):
+        """
+        Files that aren't an index are rejected.
+        """
+        path = tmp_path / "bogus.sidx"
+        path.write_bytes(data)
+
+        with pytest.raises(ValueError, match="Not a service-identity index"):
+            MappedIdentityIndex(path)
+
+    def test_unsupported_version(self, index_path):
+        """
+        Files with another version are rejected.
+        """
+        data = bytearray(index_path.read_bytes())
+        data[4] = 42
+        index_path.write_bytes(data)
+
+        with pytest.raises(ValueError, match="Unsupported index version 42"):
+            MappedIdentityIndex(index_path)
+
+    def test_corrupt(self, index_path):
+        """
+        Flipped bits are caught by the checksum unless it's not verified.
+        """
+        data = bytearray(index_path.read_bytes())
+        data[-1] ^= 0xFF
+        index_path.write_bytes(data)
+
+        with pytest.raises(ValueError, match="Corrupt service-identity index"):
+            MappedIdentityIndex(index_path)
+
+        MappedIdentityIndex(index_path, verify_checksum=False).close()
+
+    def test_truncated(self, index_path):
+        """
+        Truncated files are rejected even without checking the checksum.
+        """
+        index_path.write_bytes(index_path.read_bytes()[:-1])
+
+        with pytest.raises(ValueError, match="Corrupt service-identity index"):
+            MappedIdentityIndex(index_path, verify_checksum=False)
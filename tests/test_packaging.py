@@ -1,3 +1,7 @@
+import importlib
+import subprocess
+import sys
+
 from importlib import metadata
 
 import pytest
@@ -24,3 +28,109 @@ class TestLegacyMetadataHack:
             match="module service_identity has no attribute __yolo__",
         ):
             service_identity.__yolo__
+
+
+def _loaded_after(code):
+    """
+    Run *code* in a fresh interpreter and return the names of all modules
+    that are loaded afterwards.
+    """
+    return set(
+        subprocess.run(  # noqa: S603
+            [
+                sys.executable,
+                "-c",
+                f"import sys; {code}; print(' '.join(sys.modules))",
+            ],
+            check=True,
+            capture_output=True,
+            text=True,
+        ).stdout.split()
+    )
+
+
+class TestLazyImports:
+    def test_bare_import(self):
+        """
+        Importing service_identity only loads the exceptions -- no
+        submodules and no third-party packages besides attrs.
+        """
+        loaded = _loaded_after("import service_identity")
+
+        assert {"service_identity", "service_identity.exceptions"} == {
+            m for m in loaded if m.startswith("service_identity")
+        }
+        assert not {"cryptography", "OpenSSL", "idna"} & loaded
+
+    def test_hazmat(self):
+        """
+        Importing hazmat neither loads cryptography nor idna.
+        """
+        loaded = _loaded_after("import service_identity.hazmat")
+
+        assert (
+            not {
+                "cryptography",
+                "OpenSSL",
+                "idna",
+                "service_identity.cryptography",
+                "service_identity.pyopenssl",
+                "service_identity._mapped",
+                "service_identity._table",
+                "mmap",
+            }
+            & loaded
+        )
+
+    def test_mapped_on_first_use(self):
+        """
+        The mapped identity index is imported once it's accessed.
+        """
+        assert "service_identity._mapped" in _loaded_after(
+            "from service_identity.hazmat import MappedIdentityIndex"
+        )
+
+    def test_idna_on_first_use(self):
+        """
+        idna is imported once the first non-ASCII hostname is encoded.
+        """
+        pytest.importorskip("idna")
+
+        assert "idna" in _loaded_after(
+            "from service_identity.hazmat import DNS_ID; DNS_ID('bücher.de')"
+        )
+
+    def test_ssl(self):
+        """
+        Importing the ssl helpers loads neither cryptography nor pyOpenSSL.
+        """
+        loaded = _loaded_after("import service_identity.ssl")
+
+        assert not {"cryptography", "OpenSSL"} & loaded
+
+    @pytest.mark.parametrize(
+        "name", ["cryptography", "hazmat", "pyopenssl", "ssl"]
+    )
+    def test_submodules(self, name):
+        """
+        Submodules are imported on first attribute access and show up in
+        dir().
+        """
+        assert importlib.import_module(f"service_identity.{name}") is getattr(
+            service_identity, name
+        )
+        assert name in dir(service_identity)
+
+    def test_public_api(self):
+        """
+        The public API is importable from the package.
+        """
+        from service_identity import (  # noqa: PLC0415
+            CertificateError,
+            VerificationError,
+            cryptography,
+        )
+
+        assert issubclass(VerificationError, Exception)
+        assert issubclass(CertificateError, Exception)
+        assert cryptography.verify_certificate_hostname
@@ -1,7 +1,11 @@
+import contextlib
 import ipaddress
 
 import pytest
 
+from cryptography.x509 import DNSName
+
+from service_identity.cryptography import PatternCache, VerificationCache
 from service_identity.exceptions import (
     DNSMismatch,
     IPAddressMismatch,
@@ -10,13 +14,19 @@ from service_identity.exceptions import (
 from service_identity.hazmat import (
     DNS_ID,
     DNSPattern,
+    IdentityIndex,
     IPAddress_ID,
     IPAddressPattern,
     URIPattern,
 )
 from service_identity.pyopenssl import (
+    check_hostname,
+    check_ip_address,
     extract_ids,
     extract_patterns,
+    iter_patterns,
+    match_hostnames,
+    set_sni_callback,
     verify_hostname,
     verify_ip_address,
 )
@@ -26,11 +36,15 @@ from .certificates import (
     PEM_DNS_ONLY,
     PEM_EVERYTHING,
     PEM_OTHER_NAME,
+    make_certificate,
+    write_pem_files,
 )
+from .test_cryptography import CERT_VALID
 
 
 if pytest.importorskip("OpenSSL"):
-    from OpenSSL.crypto import FILETYPE_PEM, load_certificate
+    from OpenSSL import SSL
+    from OpenSSL.crypto import FILETYPE_PEM, X509, load_certificate
 
 
 CERT_DNS_ONLY = load_certificate(FILETYPE_PEM, PEM_DNS_ONLY)
@@ -99,6 +113,97 @@ class TestPublicAPI:
             IPAddressMismatch(mismatched_id=IPAddress_ID(ip))
         ] == ei.value.errors
 
+    def test_check_hostname(self):
+        """
+        check_hostname returns the result instead of raising.
+        """
+
+        class FakeConnection:
+            def get_peer_certificate(self):
+                return CERT_DNS_ONLY
+
+        assert check_hostname(FakeConnection(), "twistedmatrix.com")
+
+        rv = check_hostname(FakeConnection(), "google.com")
+
+        assert not rv
+        assert [DNSMismatch(mismatched_id=DNS_ID("google.com"))] == rv.errors
+
+    def test_check_ip_address(self):
+        """
+        check_ip_address returns the result instead of raising.
+        """
+
+        class FakeConnection:
+            def get_peer_certificate(self):
+                return CERT_EVERYTHING
+
+        assert check_ip_address(FakeConnection(), "1.1.1.1")
+
+        rv = check_ip_address(FakeConnection(), "1.1.1.2")
+
+        assert not rv
+        assert [
+            IPAddressMismatch(mismatched_id=IPAddress_ID("1.1.1.2"))
+        ] == rv.errors
+
+    def test_match_hostnames(self):
+        """
+        match_hostnames returns the hostnames that the certificate is valid
+        for and passes the cache.
+        """
+
+        class FakeConnection:
+            def get_peer_certificate(self):
+                return CERT_DNS_ONLY
+
+        cache = PatternCache()
+
+        assert ["twistedmatrix.com", "www.twistedmatrix.com"] == (
+            match_hostnames(
+                FakeConnection(),
+                ["google.com", "twistedmatrix.com", "www.twistedmatrix.com"],
+                cache=cache,
+            )
+        )
+        assert 1 == cache.misses
+
+
+class TestVerificationCache:
+    def test_verify_hostname(self):
+        """
+        verify_hostname uses the cache.
+        """
+
+        class FakeConnection:
+            def get_peer_certificate(self):
+                return X509.from_cryptography(CERT_VALID)
+
+        cache = VerificationCache()
+
+        verify_hostname(FakeConnection(), "example.com", cache=cache)
+        verify_hostname(FakeConnection(), "example.com", cache=cache)
+        with pytest.raises(VerificationError):
+            verify_hostname(FakeConnection(), "example.net", cache=cache)
+
+        assert (1, 2) == (cache.hits, cache.misses)
+
+    def test_verify_ip_address(self):
+        """
+        verify_ip_address uses the cache.
+        """
+
+        class FakeConnection:
+            def get_peer_certificate(self):
+                return X509.from_cryptography(CERT_VALID)
+
+        cache = VerificationCache()
+
+        verify_ip_address(FakeConnection(), "10.0.0.1", cache=cache)
+        verify_ip_address(FakeConnection(), "10.0.0.1", cache=cache)
+
+        assert (1, 1) == (cache.hits, cache.misses)
+
 
 class TestExtractPatterns:
     def test_dns(self):
@@ -145,6 +250,33 @@ class TestExtractPatterns:
             IPAddressPattern(pattern=ipaddress.IPv6Address("2a00:1c38::53")),
         ] == rv
 
+    def test_cache(self):
+        """
+        A PatternCache can be passed.
+        """
+        cache = PatternCache()
+
+        assert extract_patterns(CERT_EVERYTHING, cache=cache) == tuple(
+            extract_patterns(CERT_EVERYTHING)
+        )
+        extract_patterns(CERT_EVERYTHING, cache=cache)
+
+        assert (1, 1) == (cache.hits, cache.misses)
+
+    def test_iter_patterns(self):
+        """
+        iter_patterns returns the same patterns as extract_patterns and
+        passes the pattern classes.
+        """
+        assert sorted(extract_patterns(CERT_EVERYTHING), key=repr) == sorted(
+            iter_patterns(CERT_EVERYTHING), key=repr
+        )
+        assert extract_patterns(
+            CERT_EVERYTHING, pattern_classes={IPAddressPattern}
+        ) == list(
+            iter_patterns(CERT_EVERYTHING, pattern_classes={IPAddressPattern})
+        )
+
     def test_extract_ids_deprecated(self):
         """
         `extract_ids` raises a DeprecationWarning with correct stacklevel.
@@ -159,3 +291,78 @@ class TestExtractPatterns:
             == w.message.args[0]
         )
         assert __file__ == w.filename
+
+
+def _server_context(tmp_path, cert):
+    ctx = SSL.Context(SSL.TLS_SERVER_METHOD)
+    cert_path, key_path = write_pem_files(tmp_path, cert)
+    ctx.use_certificate_file(cert_path)
+    ctx.use_privatekey_file(key_path)
+
+    return ctx
+
+
+def _handshake(server_ctx, server_name):
+    """
+    Handshake with *server_ctx* through memory BIOs and return the
+    certificate that the server presented.
+    """
+    client = SSL.Connection(SSL.Context(SSL.TLS_CLIENT_METHOD), None)
+    client.set_connect_state()
+    if server_name is not None:
+        client.set_tlsext_host_name(server_name)
+    server = SSL.Connection(server_ctx, None)
+    server.set_accept_state()
+
+    done = set()
+    while len(done) < 2:
+        for side, conn in (("client", client), ("server", server)):
+            if side in done:
+                continue
+            try:
+                conn.do_handshake()
+                done.add(side)
+            except SSL.WantReadError:
+                pass
+        for src, dst in ((client, server), (server, client)):
+            with contextlib.suppress(SSL.WantReadError):
+                dst.bio_write(src.bio_read(65536))
+
+    return client.get_peer_certificate().to_cryptography()
+
+
+class TestSetSNICallback:
+    def test_selects_context(self, tmp_path):
+        """
+        Connections switch to the context whose certificate is valid for the
+        server name or to the default.
+        """
+        first = make_certificate([DNSName("first.example.com")])
+        example = make_certificate([DNSName("*.example.com")])
+        fallback = make_certificate([DNSName("fallback.example.com")])
+        ctx = _server_context(tmp_path, first)
+        index = IdentityIndex()
+        index.insert(
+            _server_context(tmp_path, example),
+            [DNSPattern.from_bytes(b"*.example.com")],
+        )
+
+        selector = set_sni_callback(
+            ctx, index, default=_server_context(tmp_path, fallback)
+        )
+
+        assert example == _handshake(ctx, b"foo.example.com")
+        assert fallback == _handshake(ctx, b"example.org")
+        assert fallback == _handshake(ctx, b"example.org")
+        assert 1 == selector.negative_cache_info().hits
+
+    def test_no_default(self, tmp_path):
+        """
+        Without a default, connections keep using the server context.
+        """
+        first = make_certificate([DNSName("first.example.com")])
+        ctx = _server_context(tmp_path, first)
+
+        set_sni_callback(ctx, IdentityIndex())
+
+        assert first == _handshake(ctx, b"example.org")
@@ -0,0 +1,84 @@
+import ssl
+
+from cryptography.x509 import DNSName, load_der_x509_certificate
+
+from service_identity.cryptography import extract_patterns
+from service_identity.hazmat import IdentityIndex
+from service_identity.ssl import set_sni_callback
+
+from .certificates import make_certificate, write_pem_files
+
+
+def _server_context(tmp_path, cert):
+    ctx = ssl.SSLContext(ssl.PROTOCOL_TLS_SERVER)
+    ctx.load_cert_chain(*write_pem_files(tmp_path, cert))
+
+    return ctx
+
+
+def _handshake(server_ctx, server_name):
+    """
+    Handshake with *server_ctx* through memory BIOs and return the
+    certificate that the server presented.
+    """
+    client_ctx = ssl.SSLContext(ssl.PROTOCOL_TLS_CLIENT)
+    client_ctx.check_hostname = False
+    client_ctx.verify_mode = ssl.CERT_NONE
+
+    c_in, c_out, s_in, s_out = (ssl.MemoryBIO() for _ in range(4))
+    client = client_ctx.wrap_bio(c_in, c_out, server_hostname=server_name)
+    server = server_ctx.wrap_bio(s_in, s_out, server_side=True)
+
+    done = set()
+    while len(done) < 2:
+        for side, obj in (("client", client), ("server", server)):
+            if side in done:
+                continue
+            try:
+                obj.do_handshake()
+                done.add(side)
+            except ssl.SSLWantReadError:
+                pass
+        s_in.write(c_out.read())
+        c_in.write(s_out.read())
+
+    return load_der_x509_certificate(client.getpeercert(binary_form=True))
+
+
+class TestSetSNICallback:
+    def test_selects_context(self, tmp_path):
+        """
+        Connections switch to the context whose certificate is valid for the
+        server name or fall back to the default.
+        """
+        default = make_certificate([DNSName("default.example.com")])
+        example = make_certificate([DNSName("*.example.com")])
+        other = make_certificate([DNSName("www.example.net")])
+        ctx = _server_context(tmp_path, default)
+        index = IdentityIndex()
+        for cert in (example, other):
+            index.insert(
+                _server_context(tmp_path, cert), extract_patterns(cert)
+            )
+
+        selector = set_sni_callback(ctx, index)
+
+        assert example == _handshake(ctx, "foo.example.com")
+        assert other == _handshake(ctx, "www.example.net")
+        assert default == _handshake(ctx, "example.org")
+        assert default == _handshake(ctx, None)
+        assert 1 == selector.negative_cache_info().size
+
+    def test_default(self, tmp_path):
+        """
+        If passed, the default context is used for unknown server names.
+        """
+        first = make_certificate([DNSName("first.example.com")])
+        fallback = make_certificate([DNSName("fallback.example.com")])
+        ctx = _server_context(tmp_path, first)
+
+        set_sni_callback(
+            ctx, IdentityIndex(), default=_server_context(tmp_path, fallback)
+        )
+
+        assert fallback == _handshake(ctx, "example.com")
@@ -7,8 +7,9 @@ It is NOT intended to be executed.
 from __future__ import annotations
 
 import socket
+import ssl
 
-from typing import Sequence
+from typing import Iterator, Sequence
 
 from cryptography.hazmat.backends import default_backend
 from cryptography.x509 import load_pem_x509_certificate
@@ -26,6 +27,79 @@ c_ids: Sequence[service_identity.hazmat.CertificatePattern] = (
 service_identity.cryptography.verify_certificate_hostname(
     c_cert, "example.com"
 )
+pattern_cache = service_identity.cryptography.PatternCache(
+    max_entries=10, max_bytes=None, key="subject_alt_names"
+)
+c_ci: service_identity.hazmat.CertificateIdentity = pattern_cache.identity(
+    c_cert
+)
+c_dns_ci: service_identity.hazmat.CertificateIdentity = pattern_cache.identity(
+    c_cert, pattern_classes=[service_identity.hazmat.DNSPattern]
+)
+c_dns_ids: Sequence[service_identity.hazmat.CertificatePattern] = (
+    pattern_cache.extract_patterns(
+        c_cert, pattern_classes={service_identity.hazmat.DNSPattern}
+    )
+)
+c_ids = service_identity.cryptography.extract_patterns_from_der(
+    memoryview(b"")
+)
+c_ids = service_identity.cryptography.extract_patterns_from_der(b"")
+c_ids = service_identity.cryptography.extract_patterns_from_der(
+    b"", pattern_classes={service_identity.hazmat.IPAddressPattern}
+)
+c_digest: bytes = service_identity.cryptography.subject_alt_name_digest(c_cert)
+c_ids = service_identity.cryptography.extract_patterns(
+    c_cert, cache=pattern_cache
+)
+c_ids = service_identity.cryptography.extract_patterns(
+    c_cert,
+    pattern_classes=[
+        service_identity.hazmat.URIPattern,
+        service_identity.hazmat.SRVPattern,
+    ],
+)
+c_hits: int = pattern_cache.hits
+c_it: Iterator[service_identity.hazmat.CertificatePattern] = (
+    service_identity.cryptography.iter_patterns(
+        c_cert, pattern_classes={service_identity.hazmat.DNSPattern}
+    )
+)
+c_matches: list[service_identity.hazmat.ServiceMatch] = (
+    service_identity.hazmat.verify_service_identity_iter(
+        c_it, [service_identity.hazmat.DNS_ID("example.com")], []
+    )
+)
+c_collect: service_identity.hazmat.Collect = "first"
+c_result: service_identity.hazmat.VerificationResult = (
+    service_identity.cryptography.check_certificate_hostname(
+        c_cert, "example.com"
+    )
+)
+c_result = service_identity.cryptography.check_certificate_ip_address(
+    c_cert, "127.0.0.1"
+)
+c_result = service_identity.hazmat.check_service_identity(
+    c_ids, [service_identity.hazmat.DNS_ID("example.com")], [], collect="first"
+)
+c_ok: bool = c_result.ok or bool(c_result)
+c_failed: int = c_result.failed_obligatory | c_result.failed_optional
+c_errors: list[service_identity.exceptions.Mismatch] = c_result.errors
+c_matches = service_identity.hazmat.verify_service_identity(
+    c_ids, [service_identity.hazmat.DNS_ID("example.com")], [], collect="none"
+)
+verification_cache = service_identity.cryptography.VerificationCache(
+    max_entries=10,
+    max_age=60.0,
+    pattern_cache=pattern_cache,
+    key="fingerprint",
+)
+service_identity.cryptography.verify_certificate_hostname(
+    c_cert, "example.com", cache=verification_cache
+)
+service_identity.cryptography.verify_certificate_ip_address(
+    c_cert, "127.0.0.1", cache=verification_cache
+)
 service_identity.cryptography.verify_certificate_ip_address(
     c_cert, "127.0.0.1"
 )
@@ -39,5 +113,137 @@ assert p_cert
 p_ids: Sequence[service_identity.hazmat.CertificatePattern] = (
     service_identity.pyopenssl.extract_patterns(p_cert)
 )
+p_ids = service_identity.pyopenssl.extract_patterns(
+    p_cert, cache=pattern_cache
+)
+p_ids = service_identity.pyopenssl.extract_patterns(
+    p_cert, pattern_classes={service_identity.hazmat.DNSPattern}
+)
+p_it: Iterator[service_identity.hazmat.CertificatePattern] = (
+    service_identity.pyopenssl.iter_patterns(p_cert)
+)
 service_identity.pyopenssl.verify_hostname(conn, "example.com")
+p_result: service_identity.hazmat.VerificationResult = (
+    service_identity.pyopenssl.check_hostname(conn, "example.com")
+)
+p_result = service_identity.pyopenssl.check_ip_address(conn, "127.0.0.1")
 service_identity.pyopenssl.verify_ip_address(conn, "127.0.0.1")
+service_identity.pyopenssl.verify_hostname(
+    conn, "example.com", cache=verification_cache
+)
+service_identity.pyopenssl.verify_ip_address(
+    conn, "127.0.0.1", cache=verification_cache
+)
+
+ci = service_identity.hazmat.CertificateIdentity.from_patterns(c_ids)
+ci.verify([service_identity.hazmat.DNS_ID("example.com")], [])
+c_matched: bool = ci.matches(service_identity.hazmat.DNS_ID("example.com"))
+
+dns_id: service_identity.hazmat.DNS_ID = service_identity.hazmat.DNS_ID.cached(
+    "example.com"
+)
+ip_id: service_identity.hazmat.IPAddress_ID = (
+    service_identity.hazmat.IPAddress_ID.cached("127.0.0.1")
+)
+id_info: service_identity.hazmat.CacheInfo = (
+    service_identity.hazmat.URI_ID.cache_info()
+)
+id_hits: int = id_info.hits
+service_identity.hazmat.SRV_ID.cache_clear()
+
+dns_tail: bytes | None = dns_id.tail
+dns_pattern = service_identity.hazmat.DNSPattern.from_bytes(b"*.example.com")
+is_wildcard: bool = dns_pattern.is_wildcard
+dns_head: bytes = dns_pattern.head
+
+encoded: list[bytes] = service_identity.hazmat.encode_hostnames(
+    ["example.com"]
+)
+idna_info: service_identity.hazmat.CacheInfo = (
+    service_identity.hazmat.idna_cache_info()
+)
+service_identity.hazmat.idna_cache_clear()
+
+interner = service_identity.hazmat.PatternInterner()
+interned_dns: service_identity.hazmat.DNSPattern = interner.intern(dns_pattern)
+interned: list[service_identity.hazmat.CertificatePattern] = (
+    interner.intern_all(c_ids)
+)
+interning_cache = service_identity.cryptography.PatternCache(interner=interner)
+
+table: service_identity.hazmat.PatternTable = (
+    service_identity.cryptography.extract_pattern_table(
+        [c_cert], pattern_classes={service_identity.hazmat.DNSPattern}
+    )
+)
+cert_index: int = table.add_certificate(c_ids)
+table_patterns: list[service_identity.hazmat.CertificatePattern] = (
+    table.patterns(cert_index)
+)
+found: list[int] = table.find(dns_id)
+table.remove(cert_index)
+freed: int = table.compact()
+
+covered: list[str] = service_identity.cryptography.match_hostnames(
+    c_cert, ["example.com", "example.net"], cache=interning_cache
+)
+covered = service_identity.pyopenssl.match_hostnames(conn, ["example.com"])
+
+index: service_identity.hazmat.IdentityIndex[str] = (
+    service_identity.hazmat.IdentityIndex()
+)
+index.insert("cert.pem", c_ids)
+handles: list[str] = index.lookup(dns_id)
+index.remove("cert.pem")
+index_size: int = index.nbytes
+
+ip_handles: list[str] = index.lookup(ip_id)
+
+ctx_index: service_identity.hazmat.IdentityIndex[SSL.Context] = (
+    service_identity.hazmat.IdentityIndex()
+)
+ossl_selector: service_identity.hazmat.SNISelector[SSL.Context] = (
+    service_identity.pyopenssl.set_sni_callback(ctx, ctx_index, default=ctx)
+)
+selected: SSL.Context | None = ossl_selector.select(b"example.com")
+sni_info: service_identity.hazmat.CacheInfo = (
+    ossl_selector.negative_cache_info()
+)
+
+std_ctx = ssl.SSLContext(ssl.PROTOCOL_TLS_SERVER)
+std_index: service_identity.hazmat.IdentityIndex[ssl.SSLContext] = (
+    service_identity.hazmat.IdentityIndex()
+)
+std_selector = service_identity.ssl.set_sni_callback(std_ctx, std_index)
+std_selected: ssl.SSLContext | None = std_selector.select("example.com")
+std_provided = service_identity.ssl.set_sni_callback(
+    std_ctx, lambda: std_index
+)
+current_index: service_identity.hazmat.IdentityIndex[ssl.SSLContext] = (
+    std_provided.index
+)
+
+index_copy: service_identity.hazmat.IdentityIndex[str] = index.copy()
+
+cert_dir = service_identity.cryptography.CertificateDirectory(
+    "/etc/certs", suffixes=[".pem"]
+)
+refreshed: service_identity.cryptography.RefreshResult = cert_dir.refresh()
+refreshed_paths: tuple[str, ...] = refreshed.added + refreshed.changed
+dir_index: service_identity.hazmat.IdentityIndex[str] = cert_dir.index
+dir_paths: list[str] = cert_dir.lookup(dns_id)
+dir_patterns: Sequence[service_identity.hazmat.CertificatePattern] = (
+    cert_dir.patterns("/etc/certs/example.pem")
+)
+
+service_identity.hazmat.write_identity_index(
+    "/var/cache/certs.sidx", [("example.pem", c_ids)]
+)
+with service_identity.hazmat.MappedIdentityIndex(
+    "/var/cache/certs.sidx", verify_checksum=False
+) as mapped:
+    mapped_names: list[str] = mapped.lookup(dns_id)
+    mapped_patterns: list[service_identity.hazmat.CertificatePattern] = (
+        mapped.patterns("example.pem")
+    )
+    mapped_size: int = mapped.nbytes + len(mapped)